@@ -5,12 +5,42 @@ BUDUN Sigorta Poliçe Takip Web Sitesi
 Flask Backend + Supabase Database
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, \
+    stream_with_context, g
 from werkzeug.security import check_password_hash, generate_password_hash
-from supabase import create_client, Client
+from supabase import Client
+from supabase_config import get_database_client
+from supabase_repository import SupabaseRepository
+from markupsafe import Markup
+from collections import OrderedDict
+from static_assets import load_manifest, ENCODINGS, DIST_DIR
+from renewal_dispatcher import RenewalReminderDispatcher, sink_from_env
+from report_engine import ProductionReportEngine, REPORT_DIMENSIONS, is_period
+from query_executor import GuardedClient, RepositoryError, QueryTimeoutError, set_request_deadline
+from renewal_analytics import RenewalAnalytics, COHORT_DIMENSIONS
+from cross_sell_recommender import CrossSellRecommender
+from request_profiler import StackSampler, should_profile
+from structured_logging import configure_logging, set_request_id, log_stats
+import functools
+import mimetypes
 import os
 from datetime import datetime
+import hashlib
 import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli opsiyonel; yoksa yalnızca gzip kullanılır
+    brotli = None
+
+# Loglar kuyruk üzerinden arka plan iş parçacığında JSON olarak yazılır
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Flask uygulaması oluştur
 app = Flask(__name__)
@@ -21,12 +51,284 @@ SUPABASE_URL = os.environ.get('SUPABASE_URL', 'https://your-project.supabase.co'
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY', 'your-supabase-key')
 
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("Supabase baglantisi basarili!")
+    supabase: Client = GuardedClient(get_database_client(SUPABASE_URL, SUPABASE_KEY))
+    logger.info("Supabase baglantisi basarili!")
 except Exception as e:
-    print(f"Supabase baglanti hatasi: {e}")
+    logger.error("Supabase baglanti hatasi: %s", e)
     supabase = None
 
+# Repository katmanı - ilk kullanımda oluşturulur (indeksler instance ömrü boyunca tutulur)
+_repository = None
+
+def get_repository() -> SupabaseRepository:
+    """Paylaşılan SupabaseRepository örneğini döndür"""
+    global _repository
+    if _repository is None:
+        _repository = SupabaseRepository()
+    return _repository
+
+_report_engine = None
+
+def get_report_engine() -> ProductionReportEngine:
+    """Paylaşılan rapor motorunu döndür (sonuçlar şirket/dönem bazında önbelleklenir)"""
+    global _report_engine
+    if _report_engine is None:
+        repository = get_repository()
+        _report_engine = ProductionReportEngine(repository, ttl=int(os.environ.get('REPORT_CACHE_TTL', '300')),
+                                                cache=repository.cache)
+    return _report_engine
+
+_recommender = None
+
+def get_recommender() -> CrossSellRecommender:
+    """Paylaşılan çapraz satış öneri motorunu döndür (birliktelik sayıları örnek ömrü boyunca tutulur)"""
+    global _recommender
+    if _recommender is None:
+        _recommender = CrossSellRecommender(get_repository(),
+                                            min_support=int(os.environ.get('CROSS_SELL_MIN_SUPPORT', '5')))
+    return _recommender
+
+# Referans listeleri (şirketler, satışçılar) için tarayıcı önbellek süresi (saniye)
+REFERENCE_CACHE_MAX_AGE = int(os.environ.get('REFERENCE_CACHE_MAX_AGE', '60'))
+
+def conditional_jsonify(payload, max_age=REFERENCE_CACHE_MAX_AGE):
+    """İçerik hash'inden ETag üreten JSON yanıtı; If-None-Match eşleşirse 304 döner"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest()[:32])
+    # Yanıt oturuma bağlı: paylaşılan önbellekler (edge) saklamamalı
+    response.headers['Cache-Control'] = f'private, max-age={max_age}, must-revalidate'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+# Statik dosyalar: hash'li dosya adları (python static_assets.py ile üretilir)
+ASSET_MANIFEST = load_manifest(app.static_folder)
+IMMUTABLE_MAX_AGE = 31536000
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename=...) çağrılarını manifest'teki hash'li dosyaya yönlendir"""
+    if endpoint == 'static' and values.get('filename') in ASSET_MANIFEST:
+        values['filename'] = ASSET_MANIFEST[values['filename']]
+
+def serve_static(filename):
+    """Hash'li dosyaları önceden sıkıştırılmış haliyle ve immutable olarak sun"""
+    if not filename.startswith(DIST_DIR + '/'):
+        return app.send_static_file(filename)
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+# Yanıt sıkıştırma: bu boyutun altındaki JSON yanıtları sıkıştırılmaz (byte)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def _negotiate_encoding():
+    """İstemcinin kabul ettiği en iyi sıkıştırmayı seç"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def _new_compressor(encoding):
+    """(compress, flush) fonksiyon çifti döndür"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def _compress_stream(chunks, encoding, request_id=None):
+    """Akış halindeki gövdeyi parça parça sıkıştır (tamponlamadan).
+
+    Başlıklar gövdeden önce gittiği için maliyet Server-Timing ile bildirilemez; akış bitince
+    isteğin kimliğiyle bir "compress" log kaydı yazılır (loadtest.py --server-log ile okur).
+    """
+    compress, flush = _new_compressor(encoding)
+    elapsed = 0.0
+    size_in = size_out = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        started = time.perf_counter()
+        data = compress(chunk)
+        elapsed += time.perf_counter() - started
+        size_in, size_out = size_in + len(chunk), size_out + len(data)
+        if data:
+            yield data
+    started = time.perf_counter()
+    data = flush()
+    elapsed += time.perf_counter() - started
+    # İstek bağlamı akışın sonunda kapanmış olur; kayıt isteğin kimliğiyle yazılır
+    set_request_id(request_id)
+    logger.info("compress", extra={'compress_ms': round(elapsed * 1000, 2), 'encoding': encoding,
+                                   'bytes_in': size_in, 'bytes_out': size_out + len(data)})
+    set_request_id(None)
+    yield data
+
+@app.after_request
+def compress_response(response):
+    """Büyük JSON yanıtlarını Accept-Encoding'e göre gzip/brotli ile sıkıştır"""
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or request.method == 'HEAD'
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, g.get('request_id'))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        started = time.perf_counter()
+        compress, flush = _new_compressor(encoding)
+        compressed = compress(data) + flush()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        response.set_data(compressed)
+        # Yük testi aracı oran ve CPU maliyetini bu başlıktan okur
+        response.headers['Server-Timing'] = f'compress;dur={elapsed_ms:.2f};desc="{len(data)}/{len(compressed)}"'
+    
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Sorgu süre bütçesi: platform zaman aşımından önce yanıt dönebilmek için (saniye)
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '8'))
+CRON_REQUEST_DEADLINE = float(os.environ.get('CRON_REQUEST_DEADLINE', '55'))
+# Akış yanıtlarında her satır grubu okuması için ayrı süre; 200 gönderildikten sonra tüm gövdeyi
+# tek bütçeyle sınırlamak yanıtı ortasından keserdi
+STREAM_CHUNK_DEADLINE = float(os.environ.get('STREAM_CHUNK_DEADLINE', str(REQUEST_DEADLINE)))
+
+@app.before_request
+def start_request_deadline():
+    """Bu istekteki tüm Supabase sorguları ortak bir süre sınırını paylaşır"""
+    budget = CRON_REQUEST_DEADLINE if request.path.startswith('/api/cron/') else REQUEST_DEADLINE
+    set_request_deadline(budget)
+
+@app.teardown_request
+def clear_request_deadline(error=None):
+    set_request_deadline(None)
+
+@app.before_request
+def bind_request_id():
+    """İsteğin tüm log kayıtlarına ortak korelasyon kimliği (gelen X-Request-ID korunur)"""
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    set_request_id(g.request_id)
+
+@app.after_request
+def add_request_id_header(response):
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def clear_request_id(error=None):
+    set_request_id(None)
+
+# Profil: PROFILE_SAMPLE_RATE ile rastgele, ya da admin oturumunda "X-Profile: 1" başlığıyla
+profiler = StackSampler()
+
+@app.before_request
+def start_profiling():
+    """Seçilen isteğin iş parçacığını yığın örnekleyicisine kaydet"""
+    if should_profile(request.headers.get('X-Profile') == '1', session.get('is_admin', False)):
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        profiler.begin(f"{request.method} {route}")
+        g.profiling = True
+
+@app.teardown_request
+def stop_profiling(error=None):
+    if g.get('profiling'):
+        profiler.end()
+
+def api_errors(message):
+    """API görünümündeki beklenmeyen hatayı loglayıp JSON 500 döndür.
+
+    RepositoryError yakalanmaz; repository_unavailable 503/504 ile yanıtlar.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                return view(*args, **kwargs)
+            except RepositoryError:
+                raise
+            except Exception as e:
+                logger.error("%s: %s", message, e, extra={'site': f'{__name__}:{view.__name__}'})
+                return jsonify({'error': str(e)}), 500
+        return wrapper
+    return decorate
+
+@app.errorhandler(RepositoryError)
+def repository_unavailable(error):
+    """Veritabanı yavaş ya da erişilemezse boş veri yerine açık hata döndür"""
+    status = 504 if isinstance(error, QueryTimeoutError) else 503
+    logger.error("Veritabanı hatası (%s): %s", type(error).__name__, error,
+                 extra={'error_type': type(error).__name__, 'path': request.path, 'status': status})
+    if request.path.startswith('/api/'):
+        return jsonify({'error': str(error), 'type': type(error).__name__}), status
+    return 'Veritabanına şu anda ulaşılamıyor, lütfen daha sonra tekrar deneyin.', status
+
+# Oturumdaki yetki özetinin en fazla bu kadar süre kullanılması (saniye);
+# paylaşılmayan (memory) önbellekte sürüm artışı görülmese bile bayatlık sınırlı kalır
+PERMISSION_SNAPSHOT_TTL = int(os.environ.get('PERMISSION_SNAPSHOT_TTL', '900'))
+
+def load_permission_snapshot(username):
+    """Kullanıcının verilen yetkilerini sürümüyle birlikte (imzalı) oturum çerezine yaz"""
+    repository = get_repository()
+    # Sürüm yetkilerden önce okunur: arada yapılan bir değişiklik bir sonraki kontrolde yenilemeye yol açar
+    version = repository.get_permission_version(username)
+    permissions = repository.get_user_permissions(username)
+    if permissions is None:
+        # Yetkiler okunamadı: boş özet TTL boyunca tutulmaz, bir sonraki kontrolde yeniden yüklenir
+        permissions, version = {}, None
+    session['permissions'] = {
+        'v': version,
+        'at': int(time.time()),
+        'granted': sorted(name for name, value in permissions.items() if value)
+    }
+    return session['permissions']
+
+def has_permission(permission_name):
+    """Yetki kontrolü - oturumdaki özetten, veritabanına gitmeden (özet bayatsa yenilenir)"""
+    if session.get('is_admin', False):
+        return True
+    username = session.get('username')
+    if not username:
+        return False
+    snapshot = session.get('permissions')
+    if (snapshot is None or snapshot.get('v') is None
+            or time.time() - snapshot.get('at', 0) > PERMISSION_SNAPSHOT_TTL
+            or snapshot['v'] != get_repository().get_permission_version(username)):
+        snapshot = load_permission_snapshot(username)
+    return permission_name in snapshot['granted']
+
 # Ana sayfa
 @app.route('/')
 def index():
@@ -56,6 +358,10 @@ def login():
                 
                 # Şifre kontrolü (basit hash kontrolü)
                 if user.get('password') == password:  # Gerçek uygulamada hash kullanılmalı
+                    # Yetki özeti oturum açılmadan önce yüklenir: hata olursa yarım oturum kalmaz
+                    session.clear()
+                    if not user.get('is_admin', False):
+                        load_permission_snapshot(user['username'])
                     session['user_id'] = user['id']
                     session['username'] = user['username']
                     session['is_admin'] = user.get('is_admin', False)
@@ -69,7 +375,8 @@ def login():
                 flash('Kullanıcı bulunamadı!', 'error')
                 
         except Exception as e:
-            print(f"Giriş hatası: {e}")
+            logger.error("Giriş hatası: %s", e)
+            session.clear()
             flash('Giriş sırasında hata oluştu!', 'error')
     
     return render_template('login.html')
@@ -101,11 +408,9 @@ def dashboard():
     company_name = "Bilinmeyen Şirket"
     if user_info['company_id']:
         try:
-            company_result = supabase.table('companies').select('name').eq('id', user_info['company_id']).execute()
-            if company_result.data:
-                company_name = company_result.data[0]['name']
+            company_name = get_repository().get_company_name(user_info['company_id']) or company_name
         except Exception as e:
-            print(f"Şirket bilgisi alınamadı: {e}")
+            logger.error("Şirket bilgisi alınamadı: %s", e)
     elif user_info['is_admin']:
         company_name = "Super Admin"
     
@@ -113,117 +418,504 @@ def dashboard():
                          user=user_info, 
                          company_name=company_name)
 
+# Poliçe satırı parça önbelleği: (poliçe id, updated_at) -> render edilmiş <tr>
+POLICIES_PAGE_SIZE = 50
+ROW_FRAGMENT_CACHE_SIZE = int(os.environ.get('ROW_FRAGMENT_CACHE_SIZE', '20000'))
+_row_fragment_cache = OrderedDict()
+_row_fragment_lock = threading.Lock()
+
+def render_policy_rows(policies):
+    """Poliçe satırlarını render et; değişmemiş satırlar önbellekten gelir"""
+    template = app.jinja_env.get_template('policy_row.html')
+    parts = []
+    for policy in policies:
+        key = (policy.get('id'), policy.get('updated_at') or policy.get('created_at'))
+        with _row_fragment_lock:
+            fragment = _row_fragment_cache.get(key)
+            if fragment is not None:
+                _row_fragment_cache.move_to_end(key)
+        if fragment is None:
+            fragment = template.render(policy=policy)
+            with _row_fragment_lock:
+                _row_fragment_cache[key] = fragment
+                if len(_row_fragment_cache) > ROW_FRAGMENT_CACHE_SIZE:
+                    _row_fragment_cache.popitem(last=False)
+        parts.append(fragment)
+    return Markup('\n'.join(parts))
+
+def _session_policy_scope():
+    """(izinli mi, şirket id) - Admin için şirket id None (tüm şirketler)"""
+    if session.get('is_admin', False):
+        return True, None
+    company_id = session.get('company_id')
+    return bool(company_id), company_id
+
 # Poliçeler sayfası
 @app.route('/policies')
 def policies():
-    """Poliçe yönetimi - Kullanıcı girişi gerekli"""
+    """Poliçe yönetimi - Kullanıcı girişi gerekli (yalnızca ilk sayfa sunucuda render edilir)"""
     if 'user_id' not in session:
         flash('Giriş yapmanız gerekiyor!', 'error')
         return redirect(url_for('login'))
     
-    # Kullanıcının şirketindeki poliçeleri al
-    company_id = session.get('company_id')
-    is_admin = session.get('is_admin', False)
+    allowed, company_id = _session_policy_scope()
+    if allowed:
+        rows, next_cursor = get_repository().get_policy_page(company_id, limit=POLICIES_PAGE_SIZE)
+    else:
+        rows, next_cursor = [], None
+    
+    return render_template('policies.html', rows_html=render_policy_rows(rows),
+                           next_cursor=next_cursor, user=session)
+
+# Poliçe satırları (sonsuz kaydırma için HTML parçası)
+@app.route('/policies/rows')
+def policy_rows():
+    """Sonraki poliçe sayfasını <tr> parçaları olarak döndür; sonraki imleç X-Next-Cursor başlığında"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
     
+    allowed, company_id = _session_policy_scope()
+    after_id = request.args.get('after', type=int)
+    if not allowed or after_id is None:
+        return '', 204
+    
+    rows, next_cursor = get_repository().get_policy_page(company_id, after_id, POLICIES_PAGE_SIZE)
+    response = app.response_class(render_policy_rows(rows), mimetype='text/html')
+    response.headers['X-Next-Cursor'] = str(next_cursor or '')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# API: Poliçe listesi
+@app.route('/api/policies', methods=['GET'])
+def list_policies():
+    """Poliçe listesi API - Satırlar parça parça okunup akış olarak gönderilir"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    allowed, company_id = _session_policy_scope()
+    if not allowed:
+        return jsonify({'policies': []})
+    
+    rows = get_repository().iter_policies(company_id)
+    return app.response_class(stream_with_context(_stream_json_list('policies', rows)), mimetype='application/json')
+
+def _stream_json_list(key, rows):
+    """``{"<key>": [...], "complete": true}`` gövdesini satır satır üret.
+
+    Her sonraki satır (gerekirse yeni bir sorgu parçası) kendi STREAM_CHUNK_DEADLINE süresiyle okunur.
+    Akış ortasında hata olursa durum kodu artık değiştirilemez; gövde ``"complete": false`` ve
+    ``"error"`` ile kapatılır, böylece istemci eksik listeyi tam sanmaz.
+    """
+    yield '{"%s":[' % key
+    rows = iter(rows)
+    first = True
     try:
-        if is_admin:
-            # Admin tüm poliçeleri görebilir
-            policies_result = supabase.table('policies').select('*').execute()
-        else:
-            # Normal kullanıcı sadece kendi şirketinin poliçelerini görebilir
-            if company_id:
-                policies_result = supabase.table('policies').select('*').eq('company_id', company_id).execute()
-            else:
-                policies_result = {'data': []}
-        
-        policies = policies_result.data if policies_result.data else []
-        
+        while True:
+            set_request_deadline(STREAM_CHUNK_DEADLINE)
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            yield ('' if first else ',') + json.dumps(row, ensure_ascii=False, default=str)
+            first = False
     except Exception as e:
-        print(f"Poliçeler alınamadı: {e}")
-        policies = []
-    
-    return render_template('policies.html', policies=policies, user=session)
+        logger.error("Akış yanıtı yarıda kesildi (%s): %s", type(e).__name__, e,
+                     extra={'error_type': type(e).__name__, 'path': request.path})
+        yield '],"complete":false,"error":%s}' % json.dumps({'error': str(e), 'type': type(e).__name__},
+                                                            ensure_ascii=False)
+        return
+    yield '],"complete":true}'
 
 # API: Yeni poliçe ekle
 @app.route('/api/policies', methods=['POST'])
+@api_errors("Poliçe ekleme hatası")
 def add_policy():
     """Yeni poliçe ekleme API"""
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    try:
-        data = request.get_json()
-        
-        # Poliçe verilerini hazırla
-        policy_data = {
-            'customer_name': data.get('customer_name'),
-            'customer_tc': data.get('customer_tc'),
-            'plate_number': data.get('plate_number'),
-            'policy_number': data.get('policy_number'),
-            'product': data.get('product'),
-            'insurance_company': data.get('insurance_company'),
-            'salesperson': data.get('salesperson'),
-            'gross_premium': data.get('gross_premium'),
-            'end_date': data.get('end_date'),
-            'notes': data.get('notes'),
-            'company_id': session.get('company_id'),
-            'created_at': datetime.now().isoformat()
-        }
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Geçersiz istek'}), 400
+    
+    # Alanlar depoda beyaz listeyle DB kolonlarına çevrilir (ürün/satışçı adları ID'ye)
+    policy_data = dict(data, company_id=session.get('company_id'), created_at=datetime.now().isoformat())
+    
+    # Supabase'e ekle (tekrar kontrolü yapılır, müşteri indeksi de güncellenir)
+    result = get_repository().add_policies([policy_data])
+    if result['errors'] and result['errors'][0]['index'] is not None:
+        return jsonify({'error': result['errors'][0]['error']}), 400
+    if result['rejected']:
+        return jsonify({'error': 'Bu poliçe zaten kayıtlı!', 'duplicate': result['rejected'][0]}), 409
+    if result['inserted']:
+        # Paylaşılan önbellekteki raporlar diğer örneklerde de geçersiz olmalı
+        get_report_engine().invalidate(policy_data['company_id'])
+        response = {'success': True, 'message': 'Poliçe başarıyla eklendi!'}
+        if result['flagged']:
+            response['possible_duplicate'] = result['flagged'][0]
+        return jsonify(response)
+    else:
+        return jsonify({'error': 'Poliçe eklenemedi!'}), 500
         
-        # Supabase'e ekle
-        result = supabase.table('policies').insert(policy_data).execute()
+
+# API: Toplu poliçe ekleme
+@app.route('/api/policies/batch', methods=['POST'])
+@api_errors("Toplu poliçe ekleme hatası")
+def add_policy_batch():
+    """Toplu poliçe aktarımı API - tekrar eden poliçeler atlanır ve raporlanır"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json() or {}
+    policies = data.get('policies')
+    if not isinstance(policies, list) or not policies:
+        return jsonify({'error': 'policies listesi gereklidir!'}), 400
+    
+    company_id = session.get('company_id')
+    if not session.get('is_admin', False):
+        if not company_id:
+            return jsonify({'error': 'Forbidden'}), 403
+        policies = [dict(policy, company_id=company_id) if isinstance(policy, dict) else policy
+                    for policy in policies]
+    
+    # Alan beyaz listesi ve doğrulama depoda yapılır; geçersiz satırlar 'errors' içinde döner
+    result = get_repository().add_policies(policies)
+    if result['inserted']:
+        for scope in {policy.get('company_id') for policy in policies if isinstance(policy, dict)}:
+            get_report_engine().invalidate(scope)
+    return jsonify(result), 200 if result['success'] else 500
+
+# API: Müşteri listesi
+@app.route('/api/customers')
+@api_errors("Müşteriler alınamadı")
+def get_customers():
+    """Müşteri listesi API - Sayfalı ve önek aramalı"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    prefix = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    
+    customers, total = get_repository().search_customers(
+        session['username'], prefix, (page - 1) * per_page, per_page)
+    return jsonify({
+        'customers': [{'customer_name': name, 'customer_tc_vkn': tc_vkn} for name, tc_vkn in customers],
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    })
+
+# API: Müşteri kartı (360°)
+@app.route('/api/customers/<tc_vkn>')
+@api_errors("Müşteri kartı alınamadı")
+def get_customer_overview(tc_vkn):
+    """Tek müşterinin poliçeleri, cari hareketleri, çapraz satış fırsatları ve hatırlatmaları"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    allowed, company_id = _session_policy_scope()
+    if not allowed:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    overview = get_repository().get_customer_overview(tc_vkn, company_id)
+    if not overview['policies'] and not overview['cross_selling']:
+        return jsonify({'error': 'Müşteri bulunamadı!'}), 404
+
+    # Kimlik alanları: en güncel poliçeden, eksikse fırsat kayıtlarından
+    rows = overview['policies'][::-1] + overview['cross_selling']
+    overview['customer'] = {
+        field: next((row[field] for row in rows if row.get(field)), None)
+        for field in ('customer_name', 'phone', 'email')
+    }
+    overview['customer']['customer_tc_vkn'] = tc_vkn
+    return jsonify(overview)
+
+# API: Toplu muhasebe kaydı
+@app.route('/api/accounts/batch', methods=['POST'])
+@api_errors("Toplu muhasebe kaydı hatası")
+def add_account_batch():
+    """Toplu tahsilat/borç kaydı API - Idempotency-Key ile tekrar gönderime dayanıklı"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json() or {}
+    transactions = data.get('transactions')
+    if not isinstance(transactions, list) or not transactions:
+        return jsonify({'error': 'transactions listesi gereklidir!'}), 400
+    
+    company_id = session.get('company_id')
+    if not session.get('is_admin', False) and not company_id:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    result = get_repository().add_account_transactions(
+        transactions, None if session.get('is_admin', False) else company_id, idempotency_key)
+    
+    if result['success']:
+        return jsonify(result)
+    if result['duplicate']:
+        # Aynı anahtarlı parti başka bir istekte hâlâ işleniyor
+        return jsonify(result), 409
+    return jsonify(result), 400 if result['posted'] == 0 else 500
+
+# API: Toplu yenileme durumu
+@app.route('/api/renewals/status', methods=['GET', 'POST'])
+@api_errors("Yenileme durumu hatası")
+def renewal_statuses():
+    """Yenileme durumları API - GET ?ids=1,2,3 okur, POST {"statuses": {"id": "durum"}} toplu günceller"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    allowed, company_id = _session_policy_scope()
+    if not allowed:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        repository = get_repository()
+        if request.method == 'GET':
+            ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+            ids = repository.filter_policy_ids(ids, company_id)
+            return jsonify({'statuses': repository.get_renewal_statuses(ids)})
         
-        if result.data:
-            return jsonify({'success': True, 'message': 'Poliçe başarıyla eklendi!'})
+        data = request.get_json() or {}
+        if 'statuses' in data:
+            requested = {int(pid): status for pid, status in data['statuses'].items()}
         else:
-            return jsonify({'error': 'Poliçe eklenemedi!'}), 500
-            
-    except Exception as e:
-        print(f"Poliçe ekleme hatası: {e}")
-        return jsonify({'error': str(e)}), 500
+            # Aynı durumu birden çok poliçeye uygula: {"policy_ids": [...], "status": "contacted"}
+            requested = {int(pid): data.get('status') for pid in data.get('policy_ids', [])}
+        if not requested or not all(requested.values()):
+            return jsonify({'error': 'Poliçe ve durum bilgisi gereklidir!'}), 400
+        
+        # Yalnızca kullanıcının şirketine ait poliçeler güncellenir
+        permitted = set(repository.filter_policy_ids(list(requested), company_id))
+        rejected = [pid for pid in requested if pid not in permitted]
+        updated = repository.update_renewal_statuses({pid: s for pid, s in requested.items() if pid in permitted})
+        return jsonify({'success': updated == len(permitted), 'updated': updated, 'rejected': rejected})
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Geçersiz istek!'}), 400
+
+# API: Yaklaşan hatırlatmalar
+@app.route('/api/reminders/next')
+@api_errors("Hatırlatmalar alınamadı")
+def next_reminders():
+    """Sıradaki açık çapraz satış hatırlatmaları - ?assigned_to=<id>&limit=10"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    reminders = get_repository().get_next_due_reminders(
+        session['username'], request.args.get('assigned_to', type=int), limit)
+    keys = ('id', 'cross_selling_id', 'reminder_date', 'reminder_type', 'notes', 'completed', 'created_at')
+    return jsonify({'reminders': [dict(zip(keys, reminder)) for reminder in reminders]})
+
+# API: Üretim raporu
+@app.route('/api/reports/production')
+@api_errors("Üretim raporu hatası")
+def production_report():
+    """Prim ve komisyon toplamları - ?from=2024-01&to=2024-12&group_by=salesperson,month"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    allowed, company_id = _session_policy_scope()
+    repository = get_repository()
+    if not allowed or not has_permission('reports_view'):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    today = datetime.now()
+    date_from = request.args.get('from', f'{today.year}-01')
+    date_to = request.args.get('to', today.strftime('%Y-%m'))
+    group_by = [d for d in request.args.get('group_by', 'salesperson').split(',') if d]
+    if not (is_period(date_from) and is_period(date_to)) or date_from > date_to \
+            or any(d not in REPORT_DIMENSIONS for d in group_by):
+        return jsonify({'error': 'Geçersiz dönem veya gruplama!'}), 400
+    
+    rows = get_report_engine().production(company_id, date_from, date_to, group_by)
+    names = {
+        'salesperson_id': repository.get_name_lookup('salespeople') if 'salesperson' in group_by else {},
+        'product_id': repository.get_name_lookup('products') if 'product' in group_by else {},
+        'company_id': repository.get_name_lookup('companies') if 'company' in group_by else {},
+    }
+    report = []
+    for row in rows:
+        row = dict(row)
+        for column, lookup in names.items():
+            if column in row:
+                row[column.replace('_id', '_name')] = lookup.get(row[column], '')
+        report.append(row)
+    return jsonify({'from': date_from, 'to': date_to, 'group_by': group_by, 'rows': report})
+
+def _month_range(count, end=None):
+    """Bitiş ayı dahil geriye doğru 'YYYY-MM' listesi (eskiden yeniye)"""
+    end = end or datetime.now()
+    year, month = end.year, end.month
+    months = []
+    for _ in range(count):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+# API: Yenileme dönüşüm raporu
+@app.route('/api/reports/renewals')
+@api_errors("Yenileme raporu hatası")
+def renewal_conversion_report():
+    """Vade ayı kohortlarına göre yenileme hunisi - ?months=6&dimension=salesperson_id"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    allowed, company_id = _session_policy_scope()
+    repository = get_repository()
+    if not allowed or not has_permission('reports_view'):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    dimension = request.args.get('dimension', 'all')
+    if dimension not in COHORT_DIMENSIONS:
+        return jsonify({'error': 'Geçersiz boyut!'}), 400
+    months = _month_range(min(max(request.args.get('months', 6, type=int), 1), 36))
+    
+    return jsonify({'months': months, 'dimension': dimension,
+                    'rows': RenewalAnalytics(repository).funnel(company_id, months, dimension)})
+
+# API: Borçlu müşteriler
+@app.route('/api/accounts/debtors')
+@api_errors("Borçlu müşteriler alınamadı")
+def get_debtors():
+    """Borcu olan müşteriler API - Şirket bazlı, sayfalı"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    
+    debtors, total = get_repository().get_customers_with_debt(
+        session['username'], (page - 1) * per_page, per_page)
+    return jsonify({
+        'debtors': [{'customer_name': name, 'customer_tc_vkn': tc_vkn, 'balance': balance}
+                    for name, tc_vkn, balance in debtors],
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    })
+
+# API: Log istatistikleri (yalnızca admin)
+@app.route('/api/admin/log-stats')
+def get_log_stats():
+    """Hata noktası bazında sayaçlar ve dolu kuyruk nedeniyle atılan kayıt sayısı"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not session.get('is_admin', False):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(log_stats())
+
+# API: Birleştirilen eşzamanlı okumalar (yalnızca admin)
+@app.route('/api/admin/coalescing-stats')
+def get_coalescing_stats():
+    """Repository metodu bazında çağrı, çalıştırılan sorgu ve paylaşılan sonuç sayıları"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not session.get('is_admin', False):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(get_repository().single_flight.stats())
+
+# API: Okuma replikası tazeliği (yalnızca admin)
+@app.route('/api/admin/replica-status')
+def get_replica_status():
+    """Tablo ve kapsam bazında son senkrondan bu yana geçen süre ve watermark"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not session.get('is_admin', False):
+        return jsonify({'error': 'Forbidden'}), 403
+    replica = get_repository().replica
+    if replica is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'ready': replica.ready, 'max_lag': replica.max_lag, 'tables': replica.freshness()})
 
 # API: Şirketler listesi
 @app.route('/api/companies')
+@api_errors("Şirketler alınamadı")
 def get_companies():
     """Şirketler listesi API"""
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    try:
-        result = supabase.table('companies').select('*').eq('active', True).execute()
-        companies = result.data if result.data else []
-        return jsonify({'companies': companies})
-    except Exception as e:
-        print(f"Şirketler alınamadı: {e}")
-        return jsonify({'error': str(e)}), 500
+    companies = get_repository().get_active_companies() or []
+    return conditional_jsonify({'companies': companies})
 
 # API: Satışçılar listesi
 @app.route('/api/salespeople')
+@api_errors("Satışçılar alınamadı")
 def get_salespeople():
     """Satışçılar listesi API - Şirket bazlı filtreleme"""
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    try:
-        company_id = session.get('company_id')
-        is_admin = session.get('is_admin', False)
-        
-        if is_admin:
-            # Admin tüm satışçıları görebilir
-            result = supabase.table('salespeople').select('*').eq('active', True).execute()
-        else:
-            # Normal kullanıcı sadece kendi şirketinin satışçılarını görebilir
-            if company_id:
-                result = supabase.table('salespeople').select('*').eq('company_id', company_id).eq('active', True).execute()
-            else:
-                result = {'data': []}
-        
-        salespeople = result.data if result.data else []
-        return jsonify({'salespeople': salespeople})
-        
-    except Exception as e:
-        print(f"Satışçılar alınamadı: {e}")
-        return jsonify({'error': str(e)}), 500
+    company_id = session.get('company_id')
+    is_admin = session.get('is_admin', False)
+    
+    if is_admin:
+        # Admin tüm satışçıları görebilir
+        salespeople = get_repository().get_active_salespeople(None)
+    elif company_id:
+        # Normal kullanıcı sadece kendi şirketinin satışçılarını görebilir
+        salespeople = get_repository().get_active_salespeople(company_id)
+    else:
+        salespeople = []
+    
+    salespeople = salespeople or []
+    return conditional_jsonify({'salespeople': salespeople})
+    
+
+# Zamanlanmış görev: Yenileme hatırlatmaları (Vercel Cron)
+@app.route('/api/cron/renewal-reminders')
+@api_errors("Yenileme hatırlatma hatası")
+def renewal_reminders_cron():
+    """Vercel Cron tarafından çağrılır - Authorization: Bearer <CRON_SECRET> gerekli"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret or request.headers.get('Authorization') != f'Bearer {cron_secret}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    dispatcher = RenewalReminderDispatcher(
+        get_repository(), sink_from_env(),
+        days=int(os.environ.get('RENEWAL_REMINDER_DAYS', '30')),
+        renotify_after_days=int(os.environ.get('RENEWAL_RENOTIFY_DAYS', '30')))
+    return jsonify(dispatcher.run())
+
+# Zamanlanmış görev: Yenileme dönüşüm kohortları (Vercel Cron)
+@app.route('/api/cron/renewal-analytics')
+@api_errors("Yenileme analizi hatası")
+def renewal_analytics_cron():
+    """Her gece yalnızca son aylar (TRAILING_MONTHS) ve hiç hesaplanmamış aylar yeniden hesaplanır"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret or request.headers.get('Authorization') != f'Bearer {cron_secret}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    months = _month_range(int(os.environ.get('RENEWAL_COHORT_MONTHS', '12')))
+    return jsonify({'saved': RenewalAnalytics(get_repository()).refresh(months)})
+
+# Zamanlanmış görev: Çapraz satış önerileri (Vercel Cron)
+@app.route('/api/cron/cross-sell-recommendations')
+@api_errors("Çapraz satış önerisi hesaplama hatası")
+def cross_sell_recommendations_cron():
+    """Saklanan sayılardan devam edip yalnızca yeni poliçeleri işler; ?full=1 tüm portföyü yeniden sayar"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret or request.headers.get('Authorization') != f'Bearer {cron_secret}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(get_recommender().refresh(full=request.args.get('full') == '1'))
+
+# Zamanlanmış görev: Okuma replikasının ısıtılması (Vercel Cron)
+@app.route('/api/cron/replica-sync')
+@api_errors("Replika senkron hatası")
+def replica_sync_cron():
+    """İlk tam kopya ve artımlı senkron istek dışında yapılır; yarıda kalırsa sonraki çalıştırma devam eder"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret or request.headers.get('Authorization') != f'Bearer {cron_secret}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    replica = get_repository().replica
+    if replica is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'copied': replica.warm(), 'ready': replica.ready})
 
 # Hata sayfaları
 @app.errorhandler(404)
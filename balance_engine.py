@@ -0,0 +1,136 @@
+# Balance Engine - accounts defterinden poliçe ve müşteri bazlı bakiye takibi
+import threading
+from typing import Optional, List, Tuple, Dict, Iterable, Any
+from customer_index import customer_key, name_key
+
+# accounts.transaction_type değerleri (transaction_type_key ile normalize edilmiş hâlleri)
+# Alacak (tahsilat) yazan türler; 'tahsılat' / 'ıade' ASCII büyük harfle girilmiş TAHSILAT / IADE'dir
+CREDIT_TRANSACTION_TYPES = {'tahsilat', 'tahsılat', 'ödeme', 'odeme', 'alacak', 'iade', 'ıade'}
+# Borç yazan türler; bu iki kümede olmayan kayıtlı türler de borç sayılır ama bildirilir
+DEBIT_TRANSACTION_TYPES = {'borç', 'borc', 'tahakkuk'}
+
+
+def transaction_type_key(transaction_type: str) -> str:
+    """Turkish-aware case-insensitive form of a transaction type ('TAHSİLAT' -> 'tahsilat')."""
+    return name_key((transaction_type or '').strip())
+
+
+def is_known_transaction_type(transaction_type: str) -> bool:
+    key = transaction_type_key(transaction_type)
+    return key in CREDIT_TRANSACTION_TYPES or key in DEBIT_TRANSACTION_TYPES
+
+
+def signed_amount(transaction_type: str, amount: Any) -> float:
+    """Debits are positive, credits negative."""
+    value = float(amount or 0)
+    if transaction_type_key(transaction_type) in CREDIT_TRANSACTION_TYPES:
+        return -value
+    return value
+
+
+class BalanceEngine:
+    """Running per-policy and per-customer balances, one book per company.
+
+    A company (``None`` for the admin-wide view) is warmed once from its
+    policies and ledger, then ``apply`` keeps it current as transactions
+    are written, so lookups are plain dict reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._policy_balances: Dict[Optional[int], Dict[int, float]] = {}
+        self._customer_balances: Dict[Optional[int], Dict[str, float]] = {}
+        self._policy_customers: Dict[Optional[int], Dict[int, str]] = {}
+        self._customer_names: Dict[Optional[int], Dict[str, str]] = {}
+        self._debtors: Dict[Optional[int], Optional[List[Tuple[str, float]]]] = {}
+        self._unknown_types: Dict[Optional[int], set] = {}
+
+    def is_warm(self, company_id: Optional[int]) -> bool:
+        return company_id in self._policy_balances
+
+    def knows_policy(self, company_id: Optional[int], policy_id: int) -> bool:
+        return policy_id in self._policy_customers.get(company_id, {})
+
+    def load(self, company_id: Optional[int], policies: Iterable[Dict[str, Any]],
+             transactions: Iterable[Dict[str, Any]]) -> None:
+        """Build a company's book from policy rows and ledger rows."""
+        policy_customers: Dict[int, str] = {}
+        customer_names: Dict[str, str] = {}
+        for policy in policies:
+            key = customer_key(policy.get('customer_name'), policy.get('customer_tc_vkn'))
+            policy_customers[policy['id']] = key
+            customer_names[key] = policy.get('customer_name') or ''
+
+        policy_balances: Dict[int, float] = {}
+        customer_balances: Dict[str, float] = {}
+        unknown_types = set()
+        for tx in transactions:
+            if not is_known_transaction_type(tx.get('transaction_type')):
+                unknown_types.add(tx.get('transaction_type'))
+            delta = signed_amount(tx.get('transaction_type'), tx.get('amount'))
+            policy_id = tx.get('policy_id')
+            policy_balances[policy_id] = policy_balances.get(policy_id, 0.0) + delta
+            key = policy_customers.get(policy_id)
+            if key is not None:
+                customer_balances[key] = customer_balances.get(key, 0.0) + delta
+
+        with self._lock:
+            self._policy_customers[company_id] = policy_customers
+            self._customer_names[company_id] = customer_names
+            self._policy_balances[company_id] = policy_balances
+            self._customer_balances[company_id] = customer_balances
+            self._debtors[company_id] = None
+            self._unknown_types[company_id] = unknown_types
+
+    def unknown_transaction_types(self, company_id: Optional[int]) -> List[str]:
+        """Stored transaction types outside the known vocabulary (booked as debits) seen when warming."""
+        return sorted(str(t) for t in self._unknown_types.get(company_id, ()))
+
+    def register_policy(self, company_id: Optional[int], policy_id: int,
+                        customer_name: str, customer_tc_vkn: Optional[str]) -> None:
+        """Teach warm books which customer a policy belongs to."""
+        key = customer_key(customer_name, customer_tc_vkn)
+        with self._lock:
+            for scope in {company_id, None}:
+                if scope in self._policy_customers:
+                    self._policy_customers[scope][policy_id] = key
+                    self._customer_names[scope].setdefault(key, customer_name or '')
+
+    def apply(self, company_id: Optional[int], policy_id: int, transaction_type: str, amount: Any) -> None:
+        """Post one written transaction to every warm book it belongs to."""
+        delta = signed_amount(transaction_type, amount)
+        with self._lock:
+            for scope in {company_id, None}:
+                if scope not in self._policy_balances:
+                    continue  # Henüz yüklenmemiş; ilk okumada defterden hesaplanacak
+                balances = self._policy_balances[scope]
+                balances[policy_id] = balances.get(policy_id, 0.0) + delta
+                key = self._policy_customers[scope].get(policy_id)
+                if key is not None:
+                    customers = self._customer_balances[scope]
+                    customers[key] = customers.get(key, 0.0) + delta
+                self._debtors[scope] = None
+
+    def policy_balance(self, company_id: Optional[int], policy_id: int) -> float:
+        return round(self._policy_balances.get(company_id, {}).get(policy_id, 0.0), 2)
+
+    def customer_balance(self, company_id: Optional[int], name: str, tc_vkn: Optional[str]) -> float:
+        key = customer_key(name, tc_vkn)
+        return round(self._customer_balances.get(company_id, {}).get(key, 0.0), 2)
+
+    def debtors(self, company_id: Optional[int], offset: int = 0,
+                limit: int = 50) -> Tuple[List[Tuple[str, Optional[str], float]], int]:
+        """Return ``([(customer_name, customer_tc_vkn, balance), ...], total)`` by balance, largest first."""
+        with self._lock:
+            ranked = self._debtors.get(company_id)
+            if ranked is None:
+                # Sıralama yalnızca bakiye değiştikten sonraki ilk okumada yenilenir
+                ranked = sorted(((k, b) for k, b in self._customer_balances.get(company_id, {}).items()
+                                 if round(b, 2) > 0), key=lambda item: -item[1])
+                self._debtors[company_id] = ranked
+            names = self._customer_names.get(company_id, {})
+            items = []
+            for key, balance in ranked[offset:offset + limit]:
+                tc_vkn = None if key.startswith('ad:') else key
+                items.append((names.get(key, ''), tc_vkn, round(balance, 2)))
+            return items, len(ranked)
@@ -0,0 +1,233 @@
+# Cache Backend - sunucusuz örnekler arasında paylaşılabilen önbellek katmanı
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Any, Callable
+
+try:
+    import redis
+except ImportError:  # Redis opsiyonel; yalnızca CACHE_BACKEND=redis için gerekir
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Bu boyutun üzerindeki değerler zlib ile sıkıştırılır (byte)
+COMPRESS_THRESHOLD = 512
+SIGNATURE_SIZE = 16
+DEFAULT_TTL = 300
+
+
+class CacheSerializer:
+    """Pickle + optional zlib, signed with HMAC so a shared store cannot inject objects.
+
+    Layout: 16-byte signature | 1-byte flag (b'z' compressed, b'p' plain) | payload
+    """
+
+    def __init__(self, secret: str):
+        self._secret = secret.encode('utf-8')
+
+    def _sign(self, data: bytes) -> bytes:
+        return hmac.new(self._secret, data, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+    def dumps(self, value: Any) -> bytes:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > COMPRESS_THRESHOLD:
+            body = b'z' + zlib.compress(payload, 6)
+        else:
+            body = b'p' + payload
+        return self._sign(body) + body
+
+    def loads(self, data: bytes) -> Any:
+        signature, body = data[:SIGNATURE_SIZE], data[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, self._sign(body)):
+            raise ValueError('Cache entry signature mismatch')
+        payload = zlib.decompress(body[1:]) if body[:1] == b'z' else body[1:]
+        return pickle.loads(payload)
+
+
+class MemoryCache:
+    """Per-process LRU with expiry (default; not shared between instances)."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+
+class SQLiteCache:
+    """Local-file store shared by every process on the same host (or volume)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        self._connection().execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                                   (key, value, time.time() + ttl if ttl else None))
+
+    def delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def incr(self, key: str) -> int:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, NULL)',
+                         (key, str(value).encode()))
+            conn.execute('COMMIT')
+            return value
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class RedisCache:
+    """Redis (or any RESP-compatible server) shared by every instance."""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis için "redis" paketi gereklidir')
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        self._client.set(key, value, ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+class SharedCache:
+    """Namespaced, versioned cache on top of a byte-store backend.
+
+    Keys look like ``budun:<namespace>:c<company>:v<version>:<key>``;
+    ``invalidate`` bumps the company's version so every old key is
+    orphaned at once (and left to expire). Backend failures are treated
+    as misses so the cache can never take a request down.
+    """
+
+    def __init__(self, backend, serializer: CacheSerializer, prefix: str = 'budun'):
+        self.backend = backend
+        self.serializer = serializer
+        self.prefix = prefix
+
+    def _version_key(self, namespace: str, company_id: Optional[int]) -> str:
+        return f"{self.prefix}:{namespace}:c{company_id if company_id is not None else 'all'}:version"
+
+    def _key(self, namespace: str, company_id: Optional[int], key: str) -> str:
+        raw = self.backend.get(self._version_key(namespace, company_id))
+        version = int(raw) if raw else 0
+        return f"{self.prefix}:{namespace}:c{company_id if company_id is not None else 'all'}:v{version}:{key}"
+
+    def get_or_load(self, namespace: str, company_id: Optional[int], key: str,
+                    loader: Callable[[], Any], ttl: int = DEFAULT_TTL) -> Any:
+        try:
+            full_key = self._key(namespace, company_id, key)
+            data = self.backend.get(full_key)
+            if data is not None:
+                return self.serializer.loads(data)
+        except Exception as e:
+            logger.warning("Cache read error: %s", e)
+            full_key = None
+
+        value = loader()
+        if full_key is not None:
+            try:
+                self.backend.set(full_key, self.serializer.dumps(value), ttl)
+            except Exception as e:
+                logger.warning("Cache write error: %s", e)
+        return value
+
+    def version(self, namespace: str, company_id: Optional[int] = None) -> Optional[int]:
+        """Current invalidation version, or ``None`` if the backend cannot be read."""
+        try:
+            raw = self.backend.get(self._version_key(namespace, company_id))
+            return int(raw) if raw else 0
+        except Exception as e:
+            logger.warning("Cache version read error: %s", e)
+            return None
+
+    def invalidate(self, namespace: str, company_id: Optional[int] = None) -> None:
+        try:
+            self.backend.incr(self._version_key(namespace, company_id))
+        except Exception as e:
+            logger.warning("Cache invalidation error: %s", e)
+
+
+def cache_from_env() -> SharedCache:
+    """CACHE_BACKEND=memory|sqlite|redis ve CACHE_URL ortam değişkenlerinden önbellek oluştur
+
+    Paylaşılan backend'lerde (sqlite, redis) girişler pickle ile okunduğundan imza
+    anahtarı gizli olmalıdır: SECRET_KEY tanımlı değilse başlatılmaz.
+    """
+    backend_name = os.environ.get('CACHE_BACKEND', 'memory')
+    secret = os.environ.get('SECRET_KEY')
+    if backend_name in ('redis', 'sqlite') and not secret:
+        raise RuntimeError(f'CACHE_BACKEND={backend_name} için SECRET_KEY tanımlanmalıdır')
+    if backend_name == 'redis':
+        backend = RedisCache(os.environ.get('CACHE_URL', 'redis://localhost:6379/0'))
+    elif backend_name == 'sqlite':
+        backend = SQLiteCache(os.environ.get('CACHE_URL', '/tmp/budun_cache.sqlite'))
+    else:
+        backend = MemoryCache()
+    # Bellek içi önbellek süreç dışına çıkmaz; anahtar yoksa süreç başına rastgele anahtar yeterli
+    serializer = CacheSerializer(secret or os.urandom(32).hex())
+    return SharedCache(backend, serializer)
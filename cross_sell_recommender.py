@@ -0,0 +1,220 @@
+# Cross-Sell Recommender - portföyde birlikte tutulan ürünlerden çapraz satış önerileri
+"""
+Müşteri x ürün matrisi seyrek (koordinat) biçimde tutulur: her satır müşterinin (TC/VKN, yoksa ad)
+sahip olduğu bir ürünü gösterir. Ürün birlikteliği X^T X, müşteri grupları içinde vektörel öz-eşleme
+ve ``np.bincount`` ile hesaplanır; buradan her ürün çifti için destek, güven ve lift çıkar.
+Sonuç ``product_recommendations`` tablosuna yazılır; fırsat üreticisi ve öneri listesi bu tablodan okur.
+Birliktelik sayıları ``cross_sell_state`` tablosunda saklanır; böylece soğuk başlayan bir cron da yalnızca
+yeni poliçeleri işler.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple, Dict, Any, Iterable, Sequence
+
+import numpy as np
+
+from customer_index import customer_key
+
+# Bir ürün çiftinin öneri sayılması için birlikte görüldüğü en az müşteri sayısı
+MIN_SUPPORT = 5
+# Ürün başına saklanan öneri sayısı
+RULES_PER_PRODUCT = 5
+
+
+def incidence(pairs: Iterable[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray, List[str], np.ndarray]:
+    """Deduplicated ``(customer, product)`` coordinates: ``(customer_codes, product_codes, customers, product_ids)``."""
+    customers: Dict[str, int] = {}
+    customer_codes, product_ids = [], []
+    for customer, product_id in pairs:
+        customer_codes.append(customers.setdefault(customer, len(customers)))
+        product_ids.append(product_id)
+    customer_codes = np.asarray(customer_codes, dtype=np.int64)
+    products, product_codes = np.unique(np.asarray(product_ids, dtype=np.int64), return_inverse=True)
+    product_codes = product_codes.ravel()
+    if customer_codes.size:
+        flat = np.unique(customer_codes * products.size + product_codes)
+        customer_codes, product_codes = flat // products.size, flat % products.size
+    return customer_codes, product_codes, list(customers), products
+
+
+def cooccurrence(customer_codes: np.ndarray, product_codes: np.ndarray, n_products: int) -> np.ndarray:
+    """Sparse X^T X: how many customers hold each product pair (diagonal = holders per product)."""
+    if customer_codes.size == 0:
+        return np.zeros((n_products, n_products), dtype=np.int64)
+    order = np.lexsort((product_codes, customer_codes))
+    customer_codes, product_codes = customer_codes[order], product_codes[order]
+
+    starts = np.flatnonzero(np.r_[True, customer_codes[1:] != customer_codes[:-1]])
+    sizes = np.diff(np.r_[starts, customer_codes.size])
+    # Her kayıt kendi müşteri grubundaki her kayıtla eşlenir (grup başına k*k çift)
+    pairs_per_entry = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(customer_codes.size), pairs_per_entry)
+    first_pair = np.cumsum(pairs_per_entry) - pairs_per_entry
+    offsets = np.arange(left.size) - np.repeat(first_pair, pairs_per_entry)
+    right = np.repeat(np.repeat(starts, sizes), pairs_per_entry) + offsets
+
+    flat = product_codes[left] * n_products + product_codes[right]
+    return np.bincount(flat, minlength=n_products * n_products).reshape(n_products, n_products)
+
+
+def association_rules(cooc: np.ndarray, products: np.ndarray, n_customers: int,
+                      min_support: int = MIN_SUPPORT, per_product: int = RULES_PER_PRODUCT,
+                      computed_at: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Top rules ``product -> suggested product`` by lift (only pairs with lift > 1 and enough support)."""
+    if n_customers == 0 or products.size < 2:
+        return []
+    holders = np.diag(cooc).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        confidence = cooc / holders[:, None]
+        lift = confidence / (holders[None, :] / n_customers)
+    eligible = (cooc >= min_support) & ~np.eye(products.size, dtype=bool) & (lift > 1)
+    ranked = np.argsort(-np.where(eligible, lift, -np.inf), axis=1, kind='stable')[:, :per_product]
+
+    computed_at = computed_at or datetime.now(timezone.utc).isoformat()
+    rows = []
+    for a in range(products.size):
+        for rank, b in enumerate(b for b in ranked[a] if eligible[a, b]):
+            rows.append({
+                'product_id': int(products[a]),
+                'suggested_product_id': int(products[b]),
+                'rank': rank + 1,
+                'support': int(cooc[a, b]),
+                'confidence': round(float(confidence[a, b]), 4),
+                'lift': round(float(lift[a, b]), 4),
+                'computed_at': computed_at,
+            })
+    return rows
+
+
+def rules_by_product(rows: Iterable[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """Stored rule rows grouped per antecedent product, best first."""
+    rules: Dict[int, List[Dict[str, Any]]] = {}
+    for row in sorted(rows, key=lambda r: (r['product_id'], r['rank'])):
+        rules.setdefault(row['product_id'], []).append(row)
+    return rules
+
+
+def recommend(held: Sequence[int], rules: Dict[int, List[Dict[str, Any]]], limit: int = 3) -> List[Tuple[int, float]]:
+    """Products the customer does not hold, ranked by the best lift from any product they do hold."""
+    held = set(held)
+    scores: Dict[int, float] = {}
+    for product_id in held:
+        for rule in rules.get(product_id, []):
+            suggested = rule['suggested_product_id']
+            if suggested not in held and rule['lift'] > scores.get(suggested, 0):
+                scores[suggested] = rule['lift']
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class CrossSellRecommender:
+    """Portfolio-wide co-occurrence counts, persisted and extended incrementally.
+
+    The counts, the customer count and the highest policy ID seen are kept
+    in ``cross_sell_state``. The first ``refresh`` (or ``full=True``) scans
+    every policy; later ones only read policies above the stored ID, look up
+    what their customers already held, and add the new product pairs. Rules
+    are recomputed from the counts and saved to ``product_recommendations``
+    whenever they changed. Policies committed out of ID order after a run
+    are only seen by a full refresh.
+    """
+
+    def __init__(self, repository, min_support: int = MIN_SUPPORT):
+        self.repository = repository
+        self.min_support = min_support
+        self._lock = threading.Lock()
+        self._products = np.zeros(0, dtype=np.int64)
+        self._cooc = np.zeros((0, 0), dtype=np.int64)
+        self._customers = 0
+        self._last_policy_id: Optional[int] = None
+
+    def _scan(self, after_id: Optional[int]):
+        filters = [('gt', 'id', after_id)] if after_id is not None else None
+        for policy in self.repository.iter_policies(columns='customer_name, customer_tc_vkn, product_id',
+                                                    filters=filters):
+            self._last_policy_id = max(self._last_policy_id or 0, policy['id'])
+            if policy.get('product_id') and (policy.get('customer_tc_vkn') or (policy.get('customer_name') or '').strip()):
+                yield customer_key(policy.get('customer_name'), policy.get('customer_tc_vkn')), policy['product_id']
+
+    def _rebuild(self) -> None:
+        self._last_policy_id = None
+        customer_codes, product_codes, customers, products = incidence(self._scan(None))
+        self._products = products
+        self._cooc = cooccurrence(customer_codes, product_codes, products.size)
+        self._customers = len(customers)
+
+    def _load(self) -> bool:
+        """Restore the persisted counts; ``False`` when there are none yet."""
+        state = self.repository.get_cross_sell_state()
+        if not state:
+            return False
+        self._products = np.asarray(state['products'], dtype=np.int64)
+        self._cooc = np.asarray(state['cooccurrence'], dtype=np.int64).reshape(self._products.size,
+                                                                               self._products.size)
+        self._customers = state['customers']
+        self._last_policy_id = state['last_policy_id']
+        return True
+
+    def _state(self, computed_at: str) -> Dict[str, Any]:
+        return {'products': self._products.tolist(), 'cooccurrence': self._cooc.tolist(),
+                'customers': self._customers, 'last_policy_id': self._last_policy_id, 'computed_at': computed_at}
+
+    def _index(self, product_id: int) -> int:
+        position = int(np.searchsorted(self._products, product_id))
+        if position < self._products.size and self._products[position] == product_id:
+            return position
+        self._products = np.insert(self._products, position, product_id)
+        self._cooc = np.insert(np.insert(self._cooc, position, 0, axis=0), position, 0, axis=1)
+        return position
+
+    def _apply(self, pairs: Iterable[Tuple[str, int]], held: Dict[str, set]) -> int:
+        """Add newly held products to the counts, given what each customer held before (updated in place);
+        returns how many (customer, product) pairs were new."""
+        added = 0
+        for customer, product_id in pairs:
+            products = held.setdefault(customer, set())
+            if product_id in products:
+                continue
+            if not products:
+                self._customers += 1
+            # Önce hepsi dizine eklenir: araya eklenen bir ürün daha önce alınmış konumları kaydırır
+            for p in products | {product_id}:
+                self._index(p)
+            new = self._index(product_id)
+            others = [self._index(p) for p in products]
+            self._cooc[new, others] += 1
+            self._cooc[others, new] += 1
+            self._cooc[new, new] += 1
+            products.add(product_id)
+            added += 1
+        return added
+
+    def _update(self) -> int:
+        """Count policies added since the stored ID; returns how many new (customer, product) pairs they brought."""
+        previous = self._last_policy_id
+        pairs = list(self._scan(previous))
+        if not pairs:
+            return 0
+        held = {}
+        if previous is not None:
+            held = self.repository.get_customer_products({customer for customer, _ in pairs}, previous)
+        return self._apply(pairs, held)
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """Bring the counts up to date and store the resulting rules."""
+        with self._lock:
+            if not full and self._load():
+                last_seen = self._last_policy_id
+                changed = self._update() > 0
+            else:
+                last_seen = None
+                self._rebuild()
+                changed = True
+            computed_at = datetime.now(timezone.utc).isoformat()
+            rows = association_rules(self._cooc, self._products, self._customers, self.min_support,
+                                     computed_at=computed_at)
+            saved = self.repository.save_product_recommendations(rows, computed_at) if changed else 0
+            # Yeni çift getirmeyen poliçeler de bir sonraki çalıştırmada tekrar okunmasın
+            if changed or self._last_policy_id != last_seen:
+                self.repository.save_cross_sell_state(self._state(computed_at))
+            return {'customers': self._customers, 'products': int(self._products.size),
+                    'rules': len(rows), 'saved': saved}
@@ -0,0 +1,113 @@
+# Customer Index - policies tablosundan türetilen, şirket bazlı müşteri dizini
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Optional, List, Tuple, Dict, Iterable
+
+
+def name_key(name: str) -> str:
+    """Case-insensitive sort/search key for customer names (Turkish aware)."""
+    return (name or '').replace('İ', 'i').replace('I', 'ı').casefold()
+
+
+def customer_key(name: str, tc_vkn: Optional[str]) -> str:
+    """Identity of a customer: TC/VKN, or the name when no TC/VKN is recorded."""
+    return tc_vkn if tc_vkn else f"ad:{name}"
+
+
+class CustomerIndex:
+    """Incremental per-company customer index keyed by TC/VKN.
+
+    Each company (``None`` for the admin-wide view) is warmed from the
+    policies table and then kept current through ``add``. A warm company is
+    reloaded once its shared version (bumped by writes on any instance)
+    changes or it is older than ``ttl``. Two sorted lists back prefix
+    search: one by customer name, one by TC/VKN.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._customers: Dict[Optional[int], Dict[str, str]] = {}
+        self._by_name: Dict[Optional[int], List[Tuple[str, str]]] = {}
+        self._by_tc: Dict[Optional[int], List[str]] = {}
+        self._loaded: Dict[Optional[int], Tuple[float, Optional[int]]] = {}
+
+    def is_warm(self, company_id: Optional[int], version: Optional[int] = None,
+                ttl: Optional[float] = None) -> bool:
+        """Loaded, at ``version`` (when given) and younger than ``ttl`` seconds (when given)."""
+        loaded = self._loaded.get(company_id)
+        if loaded is None:
+            return False
+        loaded_at, loaded_version = loaded
+        if version is not None and loaded_version != version:
+            return False
+        return ttl is None or time.monotonic() - loaded_at < ttl
+
+    def set_version(self, company_id: Optional[int], version: Optional[int]) -> None:
+        """Record that a warm company already reflects ``version`` (after this instance's own write)."""
+        with self._lock:
+            if company_id in self._loaded:
+                self._loaded[company_id] = (self._loaded[company_id][0], version)
+
+    def load(self, company_id: Optional[int], rows: Iterable[Tuple[str, Optional[str]]],
+             version: Optional[int] = None) -> None:
+        """Build a company's index from ``(customer_name, customer_tc_vkn)`` rows."""
+        customers: Dict[str, str] = {}
+        for name, tc_vkn in rows:
+            if name and name.strip():
+                customers[customer_key(name, tc_vkn)] = name
+        with self._lock:
+            self._customers[company_id] = customers
+            self._by_name[company_id] = sorted((name_key(n), k) for k, n in customers.items())
+            self._by_tc[company_id] = sorted(customers)
+            self._loaded[company_id] = (time.monotonic(), version)
+
+    def add(self, company_id: Optional[int], name: str, tc_vkn: Optional[str]) -> None:
+        """Record a newly inserted policy's customer in every warm scope."""
+        if not name or not name.strip():
+            return
+        key = customer_key(name, tc_vkn)
+        with self._lock:
+            for scope in {company_id, None}:
+                customers = self._customers.get(scope)
+                if customers is None:
+                    continue  # Henüz yüklenmemiş; ilk listelemede zaten okunacak
+                old_name = customers.get(key)
+                if old_name == name:
+                    continue
+                by_name = self._by_name[scope]
+                if old_name is None:
+                    insort(self._by_tc[scope], key)
+                else:
+                    by_name.pop(bisect_left(by_name, (name_key(old_name), key)))
+                customers[key] = name
+                insort(by_name, (name_key(name), key))
+
+    def page(self, company_id: Optional[int], prefix: str = '', offset: int = 0,
+             limit: Optional[int] = 50) -> Tuple[List[Tuple[str, Optional[str]]], int]:
+        """Return ``([(customer_name, customer_tc_vkn), ...], total_matches)``.
+
+        Digit-only prefixes match TC/VKN, anything else matches the name;
+        ``limit=None`` returns every match after ``offset``.
+        """
+        with self._lock:
+            customers = self._customers.get(company_id, {})
+            prefix = (prefix or '').strip()
+            if prefix.isdigit():
+                keys = self._by_tc.get(company_id, [])
+                lo = bisect_left(keys, prefix)
+                hi = bisect_left(keys, prefix + '\uffff')
+                matched = keys[lo:hi]
+            else:
+                entries = self._by_name.get(company_id, [])
+                needle = name_key(prefix)
+                lo = bisect_left(entries, (needle,))
+                hi = bisect_left(entries, (needle + '\uffff',))
+                matched = [key for _, key in entries[lo:hi]]
+
+            items = []
+            end = None if limit is None else offset + limit
+            for key in matched[offset:end]:
+                tc_vkn = None if key.startswith('ad:') else key
+                items.append((customers[key], tc_vkn))
+            return items, len(matched)
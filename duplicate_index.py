@@ -0,0 +1,122 @@
+# Duplicate Index - poliçe eklemede tekrar (çift tıklama, yeniden deneme) tespiti
+import threading
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+# Eşleşme sonucu: 'reject' eklenmez, 'flag' eklenir ama olası tekrar olarak bildirilir
+REJECT = 'reject'
+FLAG = 'flag'
+
+
+def normalize(value: Any) -> str:
+    """Case- and whitespace-insensitive form of a policy number, TC/VKN or plate."""
+    return ''.join(str(value or '').split()).upper()
+
+
+def duplicate_keys(policy: Dict[str, Any]) -> Tuple[Optional[str], Optional[tuple]]:
+    """``(policy_number key, (tc_vkn, plate, product_id) key)``; a key is ``None`` when a part is missing.
+
+    Policies without a plate (DASK, konut, sağlık...) get no holding key: a
+    customer can legitimately hold several of the same product.
+    """
+    number = normalize(policy.get('policy_number')) or None
+    tc_vkn, plate = normalize(policy.get('customer_tc_vkn')), normalize(policy.get('plate'))
+    product_id = policy.get('product_id')
+    holding = (tc_vkn, plate, product_id) if tc_vkn and plate and product_id else None
+    return number, holding
+
+
+class PolicyDuplicateIndex:
+    """Per-company hash index of policy numbers and (TC/VKN, plate, product) holdings.
+
+    A company is warmed once from its policies; ``claim`` then checks and
+    records a new policy under one lock, so two concurrent submissions of
+    the same policy cannot both pass. A claim is pending (ID ``None``) until
+    ``confirm`` records the inserted ID, or ``release`` drops it when the
+    insert fails. Same policy number, or same holding with the same end
+    date, is rejected; same holding with another end date (a renewal or an
+    overlapping cover) is only flagged. The index is per process; other
+    instances see a policy once they warm after it was inserted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._numbers: Dict[Optional[int], Dict[str, Optional[int]]] = {}
+        self._holdings: Dict[Optional[int], Dict[tuple, Dict[Optional[str], Optional[int]]]] = {}
+        self._warm_locks: Dict[Optional[int], threading.Lock] = {}
+
+    def is_warm(self, company_id: Optional[int]) -> bool:
+        return company_id in self._numbers
+
+    def warm_lock(self, company_id: Optional[int]) -> threading.Lock:
+        """Lock to hold while loading a company, so it is loaded once."""
+        with self._lock:
+            return self._warm_locks.setdefault(company_id, threading.Lock())
+
+    def load(self, company_id: Optional[int], policies: Iterable[Dict[str, Any]]) -> None:
+        """Build a company's index from policy rows (``id`` plus the key columns and ``end_date``).
+
+        Keys already in the index (pending claims, confirmed inserts) are kept
+        over the loaded ones.
+        """
+        numbers: Dict[str, Optional[int]] = {}
+        holdings: Dict[tuple, Dict[Optional[str], Optional[int]]] = {}
+        for policy in policies:
+            number, holding = duplicate_keys(policy)
+            if number:
+                numbers.setdefault(number, policy['id'])
+            if holding:
+                holdings.setdefault(holding, {}).setdefault(policy.get('end_date'), policy['id'])
+        with self._lock:
+            numbers.update(self._numbers.get(company_id, {}))
+            for holding, held in self._holdings.get(company_id, {}).items():
+                holdings.setdefault(holding, {}).update(held)
+            self._numbers[company_id] = numbers
+            self._holdings[company_id] = holdings
+
+    def claim(self, company_id: Optional[int], policy: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Check a policy about to be inserted and, unless rejected, reserve its keys.
+
+        Returns ``None`` for a new policy, otherwise ``{'action', 'reason',
+        'policy_id'}`` (``policy_id`` is ``None`` while the match is still
+        being inserted).
+        """
+        number, holding = duplicate_keys(policy)
+        end_date = policy.get('end_date')
+        with self._lock:
+            numbers = self._numbers.setdefault(company_id, {})
+            holdings = self._holdings.setdefault(company_id, {})
+            if number and number in numbers:
+                return {'action': REJECT, 'reason': 'policy_number', 'policy_id': numbers[number]}
+            held = holdings.get(holding, {}) if holding else {}
+            if end_date in held:
+                return {'action': REJECT, 'reason': 'same_holding_and_end_date', 'policy_id': held[end_date]}
+
+            match = None
+            if held:
+                match = {'action': FLAG, 'reason': 'same_holding', 'policy_id': next(iter(held.values()))}
+            if number:
+                numbers[number] = None
+            if holding:
+                holdings.setdefault(holding, {})[end_date] = None
+            return match
+
+    def confirm(self, company_id: Optional[int], policy: Dict[str, Any], policy_id: int) -> None:
+        number, holding = duplicate_keys(policy)
+        with self._lock:
+            if number and self._numbers.get(company_id, {}).get(number, policy_id) is None:
+                self._numbers[company_id][number] = policy_id
+            held = self._holdings.get(company_id, {}).get(holding) if holding else None
+            if held is not None and held.get(policy.get('end_date'), policy_id) is None:
+                held[policy.get('end_date')] = policy_id
+
+    def release(self, company_id: Optional[int], policy: Dict[str, Any]) -> None:
+        number, holding = duplicate_keys(policy)
+        with self._lock:
+            numbers = self._numbers.get(company_id, {})
+            if number and number in numbers and numbers[number] is None:
+                del numbers[number]
+            held = self._holdings.get(company_id, {}).get(holding) if holding else None
+            if held is not None and policy.get('end_date') in held and held[policy.get('end_date')] is None:
+                del held[policy.get('end_date')]
+                if not held:
+                    del self._holdings[company_id][holding]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Basit yük testi aracı
+Uç noktalara eşzamanlı istek atar; gecikme, aktarılan byte, sıkıştırma oranı ve
+sunucu tarafı sıkıştırma CPU maliyetini (Server-Timing) raporlar.
+
+Akış yanıtları (ör. /api/policies) başlıklar gövdeden önce gittiği için Server-Timing taşımaz;
+sunucu bunların maliyetini isteğin X-Request-ID'siyle "compress" log kaydı olarak yazar.
+--server-log ile sunucunun JSON log dosyası verilirse bu kayıtlar da okunur; verilmezse
+akış yanıtlarının "cpu ms" sütunu "-" kalır.
+
+Kullanım:
+    python loadtest.py --base-url http://localhost:5000 --cookie "session=..." \\
+        --requests 100 --concurrency 10 --server-log app.log /api/policies /api/salespeople
+"""
+
+import argparse
+import json
+import re
+import statistics
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SERVER_TIMING_RE = re.compile(r'compress;dur=([\d.]+)')
+
+
+def decode_body(raw: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return zlib.decompress(raw, 31)
+    if encoding == 'br' and brotli is not None:
+        return brotli.decompress(raw)
+    return raw
+
+
+def fetch(session: requests.Session, url: str, accept_encoding: str) -> dict:
+    request_id = uuid.uuid4().hex[:16]
+    started = time.perf_counter()
+    response = session.get(url, headers={'Accept-Encoding': accept_encoding, 'X-Request-ID': request_id},
+                           stream=True)
+    raw = response.raw.read(decode_content=False)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    encoding = response.headers.get('Content-Encoding', '')
+    match = SERVER_TIMING_RE.search(response.headers.get('Server-Timing', ''))
+    return {
+        'request_id': request_id,
+        'status': response.status_code,
+        'latency_ms': elapsed_ms,
+        'wire_bytes': len(raw),
+        'body_bytes': len(decode_body(raw, encoding)),
+        'encoding': encoding or 'identity',
+        'compress_ms': float(match.group(1)) if match else None,
+    }
+
+
+def stream_compress_times(log_path: str) -> dict:
+    """``{request_id: compress ms}`` from the server's "compress" log records (streamed responses)."""
+    times = {}
+    with open(log_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get('msg') == 'compress' and entry.get('request_id'):
+                times[entry['request_id']] = entry.get('compress_ms')
+    return times
+
+
+def run(base_url: str, path: str, total: int, concurrency: int, cookie: str, accept_encoding: str,
+        server_log: str = None) -> dict:
+    session = requests.Session()
+    if cookie:
+        session.headers['Cookie'] = cookie
+    url = base_url.rstrip('/') + path
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(session, url, accept_encoding), range(total)))
+
+    if server_log:
+        # Kayıtlar sunucunun log kuyruğundan kısa bir gecikmeyle düşer
+        time.sleep(0.5)
+        logged = stream_compress_times(server_log)
+        for r in results:
+            if r['compress_ms'] is None:
+                r['compress_ms'] = logged.get(r['request_id'])
+
+    latencies = sorted(r['latency_ms'] for r in results)
+    wire = sum(r['wire_bytes'] for r in results)
+    body = sum(r['body_bytes'] for r in results)
+    compress_times = [r['compress_ms'] for r in results if r['compress_ms'] is not None]
+    return {
+        'path': path,
+        'requests': total,
+        'errors': sum(1 for r in results if r['status'] >= 400),
+        'encoding': results[-1]['encoding'] if results else '-',
+        'p50_ms': statistics.median(latencies) if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+        'wire_kb': wire / 1024,
+        'body_kb': body / 1024,
+        'ratio': (body / wire) if wire else 0,
+        'compress_ms_avg': statistics.mean(compress_times) if compress_times else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BUDUN yük testi')
+    parser.add_argument('paths', nargs='+', help='Test edilecek yollar, örn. /api/policies')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--cookie', default='', help='Oturum çerezi (session=...)')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--accept-encoding', default='br, gzip')
+    parser.add_argument('--server-log', help='Sunucunun JSON log dosyası (akış yanıtlarının sıkıştırma maliyeti için)')
+    args = parser.parse_args()
+
+    print(f"{'path':<28}{'enc':<10}{'req':>5}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'wire KB':>10}{'body KB':>10}{'ratio':>7}{'cpu ms':>8}")
+    for path in args.paths:
+        r = run(args.base_url, path, args.requests, args.concurrency, args.cookie, args.accept_encoding,
+                args.server_log)
+        cpu = f"{r['compress_ms_avg']:.2f}" if r['compress_ms_avg'] is not None else '-'
+        print(f"{r['path']:<28}{r['encoding']:<10}{r['requests']:>5}{r['errors']:>5}{r['p50_ms']:>9.1f}"
+              f"{r['p95_ms']:>9.1f}{r['wire_kb']:>10.1f}{r['body_kb']:>10.1f}{r['ratio']:>7.2f}{cpu:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+# Postgres Client - PostgREST sorgu oluşturucusunun doğrudan Postgres üzerinde çalışan karşılığı
+"""
+SupabaseRepository'nin kullandığı ``client.table(...)`` / ``client.rpc(...)`` arayüzünü
+bağlantı havuzlu psycopg 3 ile uygular; böylece repository HTTP katmanı olmadan çalışır.
+
+- Her sorgu sabit metinli, parametreli SQL'dir ve sunucuda hazırlanır (prepared statement);
+  ``in_`` filtreleri ``= any(%s)`` ile tek parametreye indirgenir.
+- ``tablo!inner(kolonlar)`` gömülü kaynakları yabancı anahtar üzerinden sunucu tarafı join'e çevrilir.
+- ``COPY_MIN_ROWS`` ve üzeri satırlı insert'ler ``COPY`` ile geçici tabloya yüklenip tek
+  ``insert ... select ... returning`` ile hedefe aktarılır.
+- Sunucunun reddettiği sorgular (kısıt ihlali vb.) supabase-py ile aynı şekilde
+  ``postgrest.exceptions.APIError`` olarak yükseltilir; bağlantı hataları olduğu gibi geçer.
+"""
+import os
+import re
+import threading
+from typing import Optional, List, Dict, Any, Tuple
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.json import Jsonb
+    from psycopg.types.numeric import FloatLoader
+    from psycopg.types.string import TextLoader
+    from psycopg_pool import ConnectionPool
+except ImportError:  # Yalnızca DATABASE_BACKEND=postgres için gerekir
+    psycopg = None
+
+from postgrest.exceptions import APIError
+
+from query_executor import QUERY_TIMEOUT
+
+# Bu sayıdan fazla satırlık insert'ler COPY ile yazılır
+COPY_MIN_ROWS = int(os.environ.get('POSTGRES_COPY_MIN_ROWS', '100'))
+POOL_MIN_SIZE = int(os.environ.get('POSTGRES_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.environ.get('POSTGRES_POOL_MAX_SIZE', '10'))
+# Sunucu tarafı sorgu süresi sınırı (ms); istemci zaman aşımından sonra sorgunun (ve onu bekleyen
+# sorgu iş parçacığının) sürmesini engeller. Varsayılan QUERY_TIMEOUT'tur
+STATEMENT_TIMEOUT_MS = int(os.environ.get('POSTGRES_STATEMENT_TIMEOUT_MS', str(int(QUERY_TIMEOUT * 1000))))
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_EMBED = re.compile(r'^(\w+)(!inner)?\((.*)\)$')
+_OPERATORS = {'eq': '=', 'neq': '<>', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+_IS_VALUES = {'null': 'null', 'true': 'true', 'false': 'false'}
+
+
+def quote(identifier: str) -> str:
+    if not _IDENTIFIER.match(identifier):
+        raise ValueError(f'Geçersiz tanımlayıcı: {identifier!r}')
+    return f'"{identifier}"'
+
+
+def split_columns(columns: str) -> List[str]:
+    """Split a PostgREST select list on top-level commas."""
+    parts, depth, current = [], 0, ''
+    for char in columns:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def adapt(value: Any) -> Any:
+    return Jsonb(value) if isinstance(value, (dict, list)) else value
+
+
+class PostgresResult:
+    """Mirrors the ``data`` attribute of a postgrest APIResponse."""
+
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+        self.count = None
+
+
+class PostgresQuery:
+    """Builder for one statement; method names and semantics follow postgrest-py."""
+
+    def __init__(self, client: 'PostgresClient', table: str):
+        self._client = client
+        self._table = table
+        self._operation = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    def select(self, columns: str = '*', **kwargs):
+        self._columns = columns
+        return self
+
+    def insert(self, payload):
+        self._operation, self._payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = 'id', ignore_duplicates: bool = False, **kwargs):
+        self._operation, self._payload, self._on_conflict = 'upsert', payload, on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self._operation, self._payload = 'update', values
+        return self
+
+    def delete(self):
+        self._operation = 'delete'
+        return self
+
+    def _filter(self, operator: str, column: str, value: Any):
+        self._filters.append((operator, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # SQL üretimi
+    def _column_ref(self, column: str, embeds: Dict[str, str]) -> str:
+        if '.' in column:
+            embedded, name = column.split('.', 1)
+            if embedded not in embeds:
+                raise ValueError(f'{embedded} seçimde gömülü değil')
+            return f'{embeds[embedded]}.{quote(name)}'
+        return f't.{quote(column)}'
+
+    def _where(self, embeds: Dict[str, str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for operator, column, value in self._filters:
+            ref = self._column_ref(column, embeds)
+            if operator == 'in':
+                clauses.append(f'{ref} = any(%s)')
+                params.append(value)
+            elif operator == 'is':
+                clauses.append(f'{ref} is {_IS_VALUES[str(value).lower()]}')
+            else:
+                clauses.append(f'{ref} {_OPERATORS[operator]} %s')
+                params.append(adapt(value))
+        return (' where ' + ' and '.join(clauses)) if clauses else '', params
+
+    def _select_sql(self) -> Tuple[str, List[Any]]:
+        select, joins, embeds = [], [], {}
+        for part in split_columns(self._columns):
+            match = _EMBED.match(part)
+            if match is None:
+                select.append('t.*' if part == '*' else f't.{quote(part)}')
+                continue
+            embedded, inner, embedded_columns = match.group(1), bool(match.group(2)), match.group(3)
+            alias = f'e{len(embeds)}'
+            embeds[embedded] = alias
+            local, remote = self._client.foreign_key(self._table, embedded)
+            joins.append(f"{'join' if inner else 'left join'} {quote(embedded)} {alias} "
+                         f"on {alias}.{quote(remote)} = t.{quote(local)}")
+            fields = ', '.join(f"'{c}', {alias}.{quote(c)}" for c in split_columns(embedded_columns))
+            select.append(f'case when {alias}.{quote(remote)} is null then null '
+                          f'else jsonb_build_object({fields}) end as {quote(embedded)}')
+
+        where, params = self._where(embeds)
+        sql = f"select {', '.join(select)} from {quote(self._table)} t {' '.join(joins)}{where}"
+        if self._order:
+            sql += ' order by ' + ', '.join(
+                f"{self._column_ref(column, embeds)} {'desc' if desc else 'asc'}" for column, desc in self._order)
+        if self._limit is not None:
+            sql += ' limit %s'
+            params.append(self._limit)
+        if self._offset is not None:
+            sql += ' offset %s'
+            params.append(self._offset)
+        return sql, params
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        if self._payload is None:
+            return []
+        return [self._payload] if isinstance(self._payload, dict) else list(self._payload)
+
+    def _insert_sql(self, rows: List[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        columns = list(dict.fromkeys(c for row in rows for c in row))
+        placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        sql = (f"insert into {quote(self._table)} as t ({', '.join(map(quote, columns))}) "
+               f"values {', '.join([placeholders] * len(rows))}")
+        params = [adapt(row.get(c)) for row in rows for c in columns]
+        if self._operation == 'upsert':
+            conflict = [c.strip() for c in self._on_conflict.split(',')]
+            updates = [] if self._ignore_duplicates else [c for c in columns if c not in conflict]
+            sql += f" on conflict ({', '.join(map(quote, conflict))}) "
+            sql += ('do update set ' + ', '.join(f'{quote(c)} = excluded.{quote(c)}' for c in updates)
+                    if updates else 'do nothing')
+        return sql + ' returning *', params
+
+    def execute(self) -> PostgresResult:
+        if self._operation == 'select':
+            return PostgresResult(self._client.fetch(*self._select_sql()))
+        if self._operation in ('insert', 'upsert'):
+            rows = self._rows()
+            if not rows:
+                return PostgresResult([])
+            if self._operation == 'insert' and len(rows) >= COPY_MIN_ROWS:
+                return PostgresResult(self._client.copy_insert(self._table, rows))
+            return PostgresResult(self._client.fetch(*self._insert_sql(rows)))
+
+        where, params = self._where({})
+        if self._operation == 'update':
+            columns = list(self._payload)
+            assignments = ', '.join(f'{quote(c)} = %s' for c in columns)
+            sql = f"update {quote(self._table)} t set {assignments}{where} returning *"
+            return PostgresResult(self._client.fetch(sql, [adapt(self._payload[c]) for c in columns] + params))
+        return PostgresResult(self._client.fetch(f"delete from {quote(self._table)} t{where} returning *", params))
+
+
+class PostgresRpc:
+    def __init__(self, client: 'PostgresClient', fn: str, params: Dict[str, Any]):
+        self._client = client
+        self._fn = fn
+        self._params = params
+
+    def execute(self) -> PostgresResult:
+        arguments = ', '.join(f'{quote(name)} => %s' for name in self._params)
+        rows = self._client.fetch(f'select * from {quote(self._fn)}({arguments})',
+                                  [adapt(v) for v in self._params.values()])
+        # setof jsonb / skaler dönen fonksiyonlarda PostgREST gibi değerin kendisini döndür
+        if rows and len(rows[0]) == 1 and self._fn in rows[0]:
+            return PostgresResult([row[self._fn] for row in rows])
+        return PostgresResult(rows)
+
+
+class PostgresClient:
+    """Pooled direct-Postgres stand-in for a supabase ``Client`` (``table`` and ``rpc`` only)."""
+
+    def __init__(self, conninfo: str, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE):
+        if psycopg is None:
+            raise RuntimeError('DATABASE_BACKEND=postgres için "psycopg[binary,pool]" paketi gereklidir')
+        self.pool = ConnectionPool(conninfo, min_size=min_size, max_size=max_size, configure=self._configure,
+                                   open=True,
+                                   kwargs={'row_factory': dict_row, 'connect_timeout': max(1, int(QUERY_TIMEOUT)),
+                                           'options': f'-c statement_timeout={STATEMENT_TIMEOUT_MS}'})
+        self._foreign_keys: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _configure(conn) -> None:
+        # PostgREST JSON'u ile aynı tipler: tarih/zaman metin, numeric float
+        for type_name in ('date', 'timestamp', 'timestamptz', 'time'):
+            conn.adapters.register_loader(type_name, TextLoader)
+        conn.adapters.register_loader('numeric', FloatLoader)
+
+    def table(self, name: str) -> PostgresQuery:
+        return PostgresQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None) -> PostgresRpc:
+        return PostgresRpc(self, fn, params or {})
+
+    def fetch(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        try:
+            with self.pool.connection(timeout=QUERY_TIMEOUT) as conn:
+                cursor = conn.execute(sql, params, prepare=True)
+                return cursor.fetchall() if cursor.description else []
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            raise
+        except psycopg.Error as e:
+            raise self._api_error(e) from e
+
+    def copy_insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """COPY rows into a temp table and move them into ``table`` with one ``insert ... returning``."""
+        columns = list(dict.fromkeys(c for row in rows for c in row))
+        column_list = ', '.join(map(quote, columns))
+        try:
+            with self.pool.connection(timeout=QUERY_TIMEOUT) as conn:
+                with conn.transaction():
+                    # Yalnızca verilen kolonlar: id/default değerleri hedef tabloda üretilir
+                    conn.execute(f'create temp table _copy_rows on commit drop as '
+                                 f'select {column_list} from {quote(table)} with no data')
+                    with conn.cursor() as cursor:
+                        with cursor.copy(f'copy _copy_rows ({column_list}) from stdin') as copy:
+                            for row in rows:
+                                copy.write_row([adapt(row.get(c)) for c in columns])
+                    cursor = conn.execute(f'insert into {quote(table)} ({column_list}) '
+                                          f'select {column_list} from _copy_rows returning *')
+                    return cursor.fetchall()
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            raise
+        except psycopg.Error as e:
+            raise self._api_error(e) from e
+
+    def foreign_key(self, table: str, embedded: str) -> Tuple[str, str]:
+        """``(local column, referenced column)`` of the many-to-one FK from ``table`` to ``embedded``."""
+        key = (table, embedded)
+        with self._lock:
+            if key in self._foreign_keys:
+                return self._foreign_keys[key]
+        rows = self.fetch(
+            "select a.attname as local, af.attname as remote "
+            "from pg_constraint c "
+            "join pg_attribute a on a.attrelid = c.conrelid and a.attnum = c.conkey[1] "
+            "join pg_attribute af on af.attrelid = c.confrelid and af.attnum = c.confkey[1] "
+            "where c.contype = 'f' and c.conrelid = %s::regclass and c.confrelid = %s::regclass",
+            [table, embedded])
+        if not rows:
+            raise APIError({'message': f'{table} ile {embedded} arasında ilişki bulunamadı', 'code': 'PGRST200'})
+        with self._lock:
+            self._foreign_keys[key] = (rows[0]['local'], rows[0]['remote'])
+        return self._foreign_keys[key]
+
+    @staticmethod
+    def _api_error(error) -> APIError:
+        diag = getattr(error, 'diag', None)
+        return APIError({
+            'message': str(error).strip(),
+            'code': getattr(error, 'sqlstate', None),
+            'details': getattr(diag, 'message_detail', None),
+            'hint': getattr(diag, 'message_hint', None),
+        })
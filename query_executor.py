@@ -0,0 +1,232 @@
+# Query Executor - Supabase sorguları için süre sınırı, yeniden deneme ve devre kesici
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Optional
+
+from request_profiler import attributed
+
+try:
+    from postgrest.exceptions import APIError
+except ImportError:
+    APIError = ()
+
+# Tek sorgu için üst süre sınırı (saniye); istek bütçesinden kalan süre daha azsa o kullanılır
+QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', '5'))
+# Okuma sorgularında en fazla yeniden deneme sayısı ve taban bekleme süresi
+READ_RETRIES = int(os.environ.get('QUERY_READ_RETRIES', '2'))
+RETRY_BASE_DELAY = 0.1
+# Art arda bu kadar hatada devre açılır ve COOLDOWN süresince istekler hemen reddedilir
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '30'))
+
+# Yazma içeren sorgu zincirleri yeniden denenmez
+WRITE_METHODS = {'insert', 'update', 'upsert', 'delete'}
+# Benzersiz kısıt ihlalinin SQLSTATE kodu (PostgREST ve psycopg aynen iletir)
+UNIQUE_VIOLATION = '23505'
+
+
+class RepositoryError(Exception):
+    """Base class for backend failures surfaced by the repository."""
+
+
+class QueryTimeoutError(RepositoryError):
+    """The query did not finish within the remaining request deadline."""
+
+
+class BackendUnavailableError(RepositoryError):
+    """The circuit breaker is open; the backend is not being called."""
+
+
+class QueryFailedError(RepositoryError):
+    """The backend returned an error (after retries, for reads).
+
+    ``code`` is the server's error code when it answered (the SQLSTATE,
+    e.g. ``UNIQUE_VIOLATION``), ``None`` for transport failures.
+    """
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('query_deadline', default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Bound every query started inside the block by a shared monotonic deadline."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def set_request_deadline(seconds: Optional[float]):
+    """Set (or clear, with ``None``) the deadline for the current context; returns a reset token."""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def remaining_time() -> float:
+    deadline = _deadline.get()
+    if deadline is None:
+        return QUERY_TIMEOUT
+    return min(QUERY_TIMEOUT, deadline - time.monotonic())
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> one half-open probe after the cooldown."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._probe_thread: Optional[int] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown and not self._probing:
+                self._probing = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """End this thread's half-open probe without a verdict (e.g. the request deadline ran out first)."""
+        with self._lock:
+            if self._probing and self._probe_thread == threading.get_ident():
+                self._probing = False
+
+
+class QueryExecutor:
+    """Runs ``builder.execute()`` on a worker thread under the request deadline."""
+
+    def __init__(self, max_workers: int = 8, breaker: Optional[CircuitBreaker] = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='supabase-query')
+        self.breaker = breaker or CircuitBreaker()
+
+    def execute(self, builder, idempotent: bool = True):
+        attempts = 1 + (READ_RETRIES if idempotent else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise BackendUnavailableError('Veritabanı geçici olarak erişilemez (devre açık)')
+            timeout = remaining_time()
+            if timeout <= 0:
+                self.breaker.release_probe()
+                raise QueryTimeoutError('İstek süresi doldu')
+
+            future = self._pool.submit(attributed(builder.execute))
+            try:
+                result = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # Çalışan çağrı iptal edilemez; istemci zaman aşımı (QUERY_TIMEOUT) iş parçacığını serbest bırakır
+                future.cancel()
+                if timeout >= QUERY_TIMEOUT:
+                    # Yalnızca tam süreyi aşan sorgu arka ucun yavaşladığını gösterir; istek bütçesinin
+                    # bitmesiyle kısalan bekleme devreyi açmaya sayılmaz
+                    self.breaker.record_failure()
+                else:
+                    # Sonuçsuz kalan yarı açık deneme bırakılır; yoksa devre hiç kapanmaz
+                    self.breaker.release_probe()
+                raise QueryTimeoutError(f'Sorgu {timeout:.2f} sn içinde tamamlanmadı')
+            except APIError as e:
+                # Sunucu yanıt verdi (ör. kısıt ihlali): arka uç sağlıklı, yeniden deneme anlamsız
+                self.breaker.record_success()
+                raise QueryFailedError(str(e), getattr(e, 'code', None)) from e
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise QueryFailedError(str(e)) from e
+                # Tam jitter'lı üstel bekleme; kalan süreyi aşmaz
+                delay = random.uniform(0, RETRY_BASE_DELAY * (2 ** attempt))
+                if delay >= remaining_time():
+                    raise QueryFailedError(str(e)) from e
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+
+_fanout_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='supabase-fanout')
+
+
+def gather(*calls):
+    """Run independent calls concurrently under the caller's deadline; results in call order."""
+    futures = [_fanout_pool.submit(contextvars.copy_context().run, attributed(call)) for call in calls]
+    return [future.result() for future in futures]
+
+
+class _GuardedBuilder:
+    """Proxies a postgrest request builder, routing ``execute()`` through the executor."""
+
+    def __init__(self, builder, executor: QueryExecutor, idempotent: bool = True):
+        self._builder = builder
+        self._executor = executor
+        self._idempotent = idempotent
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+        idempotent = self._idempotent and name not in WRITE_METHODS
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _GuardedBuilder(result, self._executor, idempotent)
+            return result
+        return chained
+
+    def execute(self):
+        return self._executor.execute(self._builder, self._idempotent)
+
+
+class GuardedClient:
+    """Drop-in wrapper for a supabase ``Client`` whose queries are deadline- and breaker-aware."""
+
+    def __init__(self, client, executor: Optional[QueryExecutor] = None):
+        self._client = client
+        self.executor = executor or QueryExecutor()
+
+    def table(self, name: str):
+        return _GuardedBuilder(self._client.table(name), self.executor)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, idempotent: bool = False):
+        # RPC'ler yan etki içerebilir; salt okunur olduğu bildirilmedikçe yeniden denenmez
+        return _GuardedBuilder(self._client.rpc(fn, params or {}), self.executor, idempotent=idempotent)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,345 @@
+# Read Replica - poliçe ve referans tablolarının yerel SQLite kopyası
+"""
+Sık okunan, yavaş değişen listeler (zenginleştirilmiş poliçe listesi, vade pencereleri, müşteri listesi)
+Supabase yerine yerel bir SQLite dosyasından indeksli SQL ile okunur.
+
+Her tablo ``(updated_at, id)`` sırasıyla, son görülen değerden (watermark) itibaren artımlı çekilir;
+poliçeler şirket (tenant) bazında, referans tabloları bütün olarak senkronlanır. ``updated_at`` trigger'da
+``now()`` (transaction başlangıcı) olduğundan geç commit edilen satırlar watermark'ın gerisinde kalabilir;
+bu yüzden her senkron watermark'tan ``READ_REPLICA_SAFETY_MARGIN`` saniye geriden okur ve yerelde aynı
+damgayla bulunan satırları atlar.
+
+İlk (tam) kopya istek içinde çekilmez: açılışta arka planda, ``/api/cron/replica-sync`` ya da bu betikle
+ısıtılır; tüm tablolar bir kez kopyalanana kadar (``ready``) repository doğrudan Supabase'den okur.
+Sonrasında okuma anında kapsamın son senkronu ``READ_REPLICA_MAX_LAG`` saniyeden eskiyse önce artımlı
+senkron yapılır; senkron başarısız olursa eldeki kopya sunulur ve gecikme ``freshness()`` ile raporlanır.
+Kaynakta silinen satırlar replikadan düşmez (poliçeler silinmez; silinen ürün/şirket adları yalnızca
+eşleşmeyen join'lerde kalır).
+
+Kullanım (ön ısıtma / cron):
+    READ_REPLICA_PATH=/tmp/budun-replica.sqlite3 python read_replica.py
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple, Dict, Any, Iterable
+
+from customer_index import customer_key, name_key
+
+logger = logging.getLogger(__name__)
+
+# Son senkrondan bu kadar saniye geçmişse okuma öncesi artımlı senkron yapılır
+REPLICA_MAX_LAG = int(os.environ.get('READ_REPLICA_MAX_LAG', '60'))
+# Watermark'tan bu kadar saniye geriden yeniden okunur (uzun süren transaction'ların geç görünen satırları)
+REPLICA_SAFETY_MARGIN = int(os.environ.get('READ_REPLICA_SAFETY_MARGIN', '120'))
+# Senkronda tek istekte çekilen satır sayısı (PostgREST max-rows)
+SYNC_CHUNK_SIZE = 1000
+ALL_SCOPE = 'all'
+
+# Kaynak tablo -> replikaya çekilen kolonlar
+SYNC_COLUMNS = {
+    'policies': ['id', 'company_id', 'end_date', 'customer_name', 'customer_tc_vkn', 'plate', 'doc_serial',
+                 'note', 'premium', 'product_id', 'salesperson_id', 'policy_number', 'last_notified_on',
+                 'updated_at'],
+    'products': ['id', 'name', 'commission_percent', 'updated_at'],
+    'salespeople': ['id', 'name', 'company_id', 'updated_at'],
+    'companies': ['id', 'name', 'updated_at'],
+}
+REFERENCE_TABLES = ('products', 'salespeople', 'companies')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS policies (
+    id INTEGER PRIMARY KEY, company_id INTEGER, end_date TEXT, customer_name TEXT, customer_tc_vkn TEXT,
+    plate TEXT, doc_serial TEXT, note TEXT, premium REAL, product_id INTEGER, salesperson_id INTEGER,
+    policy_number TEXT, last_notified_on TEXT, updated_at TEXT, customer_key TEXT, name_key TEXT
+);
+CREATE INDEX IF NOT EXISTS policies_company_id_id ON policies (company_id, id);
+CREATE INDEX IF NOT EXISTS policies_end_date_id ON policies (end_date, id);
+CREATE INDEX IF NOT EXISTS policies_company_customer ON policies (company_id, customer_key);
+CREATE INDEX IF NOT EXISTS policies_customer_name ON policies (name_key, customer_key);
+CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY, name TEXT, commission_percent REAL, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS salespeople (id INTEGER PRIMARY KEY, name TEXT, company_id INTEGER, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS companies (id INTEGER PRIMARY KEY, name TEXT, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS replica_watermarks (
+    table_name TEXT NOT NULL, scope TEXT NOT NULL, updated_at TEXT, last_id INTEGER,
+    synced_at REAL, rows INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, scope)
+);
+"""
+
+# UI'nin beklediği 17 alanlı zenginleştirilmiş poliçe satırı (SupabaseRepository._enriched_tuple ile aynı sıra)
+ENRICHED_SELECT = """
+SELECT p.id, p.end_date, p.customer_name, p.customer_tc_vkn, p.plate, p.doc_serial, p.note, p.premium,
+       p.product_id, COALESCE(pr.name, ''), COALESCE(pr.commission_percent, 0), p.last_notified_on,
+       p.salesperson_id, COALESCE(s.name, ''), p.policy_number, p.company_id, COALESCE(c.name, '')
+FROM policies p
+LEFT JOIN products pr ON pr.id = p.product_id
+LEFT JOIN salespeople s ON s.id = p.salesperson_id
+LEFT JOIN companies c ON c.id = p.company_id
+"""
+
+
+def _scope_key(company_id: Optional[int]) -> str:
+    return ALL_SCOPE if company_id is None else str(company_id)
+
+
+def _rewind(updated_at: Optional[str], seconds: int) -> Optional[str]:
+    """ISO timestamp ``seconds`` earlier (``None`` stays ``None``: nothing synced yet)."""
+    if updated_at is None:
+        return None
+    return (datetime.fromisoformat(updated_at) - timedelta(seconds=seconds)).isoformat()
+
+
+class ReadReplica:
+    """SQLite copy of policies and reference tables, kept current from ``client`` by watermark."""
+
+    def __init__(self, client, path: str, max_lag: int = REPLICA_MAX_LAG,
+                 safety_margin: int = REPLICA_SAFETY_MARGIN):
+        self.client = client
+        self.path = path
+        self.max_lag = max_lag
+        self.safety_margin = safety_margin
+        self._local = threading.local()
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._ready = False
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _lock(self, table: str, scope: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((table, scope), threading.Lock())
+
+    # Senkron
+    def _watermark(self, table: str, scope: str) -> Tuple[Optional[str], Optional[int], Optional[float]]:
+        row = self._connection().execute(
+            'SELECT updated_at, last_id, synced_at FROM replica_watermarks WHERE table_name = ? AND scope = ?',
+            (table, scope)).fetchone()
+        return row if row else (None, None, None)
+
+    def _store(self, table: str, rows: List[Dict[str, Any]], scope: Optional[str] = None,
+               watermark: Optional[Tuple[str, int]] = None) -> None:
+        """Upsert source rows (and advance the scope's watermark) in one transaction."""
+        columns = SYNC_COLUMNS[table]
+        values = [[row.get(c) for c in columns] for row in rows]
+        if table == 'policies':
+            columns = columns + ['customer_key', 'name_key']
+            for value, row in zip(values, rows):
+                value += [customer_key(row.get('customer_name'), row.get('customer_tc_vkn')),
+                          name_key(row.get('customer_name'))]
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                             f"VALUES ({', '.join('?' * len(columns))})", values)
+            if watermark is not None:
+                conn.execute(
+                    'INSERT INTO replica_watermarks (table_name, scope, updated_at, last_id, rows) '
+                    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (table_name, scope) DO UPDATE SET '
+                    'updated_at = excluded.updated_at, last_id = excluded.last_id, rows = rows + excluded.rows',
+                    (table, scope, watermark[0], watermark[1], len(rows)))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _changed(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows whose ``updated_at`` differs from the local copy (re-read margin rows are skipped)."""
+        local = dict(self._connection().execute(
+            f"SELECT id, updated_at FROM {table} WHERE id IN ({', '.join('?' * len(rows))})",
+            [row['id'] for row in rows]).fetchall())
+        return [row for row in rows if local.get(row['id'], object()) != row['updated_at']]
+
+    def _query(self, table: str, company_id: Optional[int]):
+        query = self.client.table(table).select(', '.join(SYNC_COLUMNS[table]))
+        if company_id is not None:
+            query = query.eq('company_id', company_id)
+        return query
+
+    def sync_table(self, table: str, company_id: Optional[int] = None) -> int:
+        """Pull rows changed since the scope's watermark (minus the safety margin); returns the rows copied."""
+        scope = _scope_key(company_id)
+        updated_at = self._watermark(table, scope)[0]
+        if updated_at is None and company_id is not None:
+            # Şirketin ilk senkronu tüm şirketler kopyasının kaldığı yerden başlar
+            updated_at = self._watermark(table, ALL_SCOPE)[0]
+        # (updated_at, id) sırasında kaldığımız yer; ilk sorgu aralığın başını da kapsar (last_id yok)
+        updated_at, last_id = _rewind(updated_at, self.safety_margin), None
+        copied = 0
+        while True:
+            rows = []
+            if last_id is not None:
+                # Önce watermark ile aynı damgayı taşıyan kalan satırlar (id sırasıyla)
+                rows = (self._query(table, company_id).eq('updated_at', updated_at).gt('id', last_id)
+                        .order('id').limit(SYNC_CHUNK_SIZE).execute().data)
+            if not rows:
+                query = self._query(table, company_id)
+                if last_id is not None:
+                    query = query.gt('updated_at', updated_at)
+                elif updated_at is not None:
+                    query = query.gte('updated_at', updated_at)
+                rows = query.order('updated_at').order('id').limit(SYNC_CHUNK_SIZE).execute().data
+                if not rows:
+                    break
+            updated_at, last_id = rows[-1]['updated_at'], rows[-1]['id']
+            changed = self._changed(table, rows)
+            self._store(table, changed, scope, (updated_at, last_id))
+            copied += len(changed)
+
+        self._connection().execute(
+            'INSERT INTO replica_watermarks (table_name, scope, synced_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (table_name, scope) DO UPDATE SET synced_at = excluded.synced_at',
+            (table, scope, time.time()))
+        return copied
+
+    def _is_fresh(self, table: str, scope: str) -> bool:
+        synced_at = self._watermark(table, scope)[2]
+        return synced_at is not None and time.time() - synced_at < self.max_lag
+
+    def _has_synced(self, table: str, scope: str) -> bool:
+        return self._watermark(table, scope)[2] is not None
+
+    @property
+    def ready(self) -> bool:
+        """Every table has been copied once; until then reads must go to the source."""
+        if not self._ready:
+            self._ready = all(self._has_synced(table, ALL_SCOPE) for table in SYNC_COLUMNS)
+        return self._ready
+
+    def _refresh(self, table: str, company_id: Optional[int]) -> None:
+        scope = _scope_key(company_id)
+        # Tüm şirketler kopyası tazeyse şirket kapsamını da karşılar
+        if self._is_fresh(table, scope) or self._is_fresh(table, ALL_SCOPE):
+            return
+        with self._lock(table, scope):
+            if self._is_fresh(table, scope):
+                return  # Bekleyen başka bir istek senkronu tamamladı
+            try:
+                copied = self.sync_table(table, company_id)
+                if copied:
+                    logger.info("Replica synced %s rows of %s (scope %s)", copied, table, scope)
+            except Exception as e:
+                logger.warning("Replica sync of %s (scope %s) failed, serving stale copy: %s", table, scope, e)
+
+    def warm(self) -> Dict[str, int]:
+        """Copy every table (all companies) up to date; the first run is the full copy. Returns rows per table."""
+        copied = {}
+        for table in SYNC_COLUMNS:
+            with self._lock(table, ALL_SCOPE):
+                copied[table] = self.sync_table(table)
+        return copied
+
+    def start_warming(self) -> threading.Thread:
+        """Run ``warm`` on a background thread (instance startup) so no request pays for the first copy."""
+        def run():
+            try:
+                copied = self.warm()
+                logger.info("Replica warmed: %s", copied)
+            except Exception as e:
+                logger.warning("Replica warm-up failed; reads stay on the source until a later sync: %s", e)
+        thread = threading.Thread(target=run, name='replica-warm', daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self, company_id: Optional[int] = None) -> None:
+        """Bring reference tables and the scope's policies within ``max_lag`` of the source (incrementally;
+        only call once ``ready``)."""
+        for table in REFERENCE_TABLES:
+            self._refresh(table, None)
+        self._refresh('policies', company_id)
+
+    def apply_policies(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Copy freshly inserted policy rows without moving any watermark (read-your-writes)."""
+        rows = list(rows)
+        if rows:
+            self._store('policies', rows)
+
+    # Okuma
+    def enriched_policies(self, company_id: Optional[int] = None) -> List[Tuple]:
+        """Enriched policy tuples, newest first."""
+        self.refresh(company_id)
+        if company_id is None:
+            return self._connection().execute(ENRICHED_SELECT + 'ORDER BY p.id DESC').fetchall()
+        return self._connection().execute(
+            ENRICHED_SELECT + 'WHERE p.company_id = ? ORDER BY p.id DESC', (company_id,)).fetchall()
+
+    def renewal_window(self, start: Optional[str], before: str) -> List[Tuple]:
+        """Enriched policy tuples with ``start <= end_date < before`` (no lower bound when ``start`` is None)."""
+        self.refresh(None)
+        if start is None:
+            return self._connection().execute(
+                ENRICHED_SELECT + 'WHERE p.end_date < ? ORDER BY p.end_date, p.id', (before,)).fetchall()
+        return self._connection().execute(
+            ENRICHED_SELECT + 'WHERE p.end_date >= ? AND p.end_date < ? ORDER BY p.end_date, p.id',
+            (start, before)).fetchall()
+
+    def customers(self, company_id: Optional[int] = None) -> List[Tuple[str, Optional[str]]]:
+        """Distinct ``(customer_name, customer_tc_vkn)`` pairs in CustomerIndex order."""
+        self.refresh(company_id)
+        where = "WHERE TRIM(COALESCE(customer_name, '')) <> ''"
+        params: Tuple = ()
+        if company_id is not None:
+            where += ' AND company_id = ?'
+            params = (company_id,)
+        rows = self._connection().execute(
+            f'SELECT customer_key, MAX(customer_name), MAX(name_key) FROM policies {where} '
+            f'GROUP BY customer_key ORDER BY 3, 1', params).fetchall()
+        return [(name, None if key.startswith('ad:') else key) for key, name, _ in rows]
+
+    def freshness(self) -> Dict[str, Dict[str, Any]]:
+        """``{table: {scope: {lag_seconds, synced_at, watermark, rows}}}`` for every synced scope."""
+        now = time.time()
+        report: Dict[str, Dict[str, Any]] = {table: {} for table in SYNC_COLUMNS}
+        for table, scope, updated_at, synced_at, rows in self._connection().execute(
+                'SELECT table_name, scope, updated_at, synced_at, rows FROM replica_watermarks '
+                'ORDER BY table_name, scope'):
+            report.setdefault(table, {})[scope] = {
+                'lag_seconds': round(now - synced_at, 1) if synced_at else None,
+                'synced_at': synced_at,
+                'watermark': updated_at,
+                'rows': rows,
+            }
+        return report
+
+
+def replica_from_env(client, warm: bool = True) -> Optional[ReadReplica]:
+    """READ_REPLICA_PATH tanımlıysa okuma replikasını oluştur (tanımsızsa replika kapalı)
+
+    ``warm`` ile ilk kopya / açılış senkronu arka planda başlatılır.
+    """
+    path = os.environ.get('READ_REPLICA_PATH')
+    if not path:
+        return None
+    replica = ReadReplica(client, path)
+    if warm:
+        replica.start_warming()
+    return replica
+
+
+def main():
+    from structured_logging import configure_logging
+    from supabase_config import get_database_client
+    from query_executor import GuardedClient
+
+    configure_logging()
+    replica = replica_from_env(GuardedClient(get_database_client()), warm=False)
+    if replica is None:
+        raise SystemExit('READ_REPLICA_PATH gerekli')
+    for table, copied in replica.warm().items():
+        logger.info("%s: %s rows copied", table, copied)
+
+
+if __name__ == '__main__':
+    main()
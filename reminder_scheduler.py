@@ -0,0 +1,85 @@
+# Reminder Scheduler - açık çapraz satış hatırlatmaları için tarih sıralı öncelik kuyruğu
+import heapq
+import threading
+from typing import Optional, List, Dict, Any, Iterable
+
+# Şirketin tüm hatırlatmalarını tutan kuyruğun satışçı anahtarı
+ALL_ASSIGNEES = '*'
+
+
+class ReminderScheduler:
+    """Open reminders (``completed = false``) in min-heaps keyed by reminder_date.
+
+    There is one heap per (company, assignee) plus one per company for all
+    assignees; ``None`` is the admin-wide company scope. Completed or
+    rescheduled reminders are dropped lazily when they reach the top.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warm = set()
+        self._open: Dict[Any, Dict[int, Dict[str, Any]]] = {}
+        self._heaps: Dict[tuple, List[tuple]] = {}
+
+    def is_warm(self, company_id: Optional[int]) -> bool:
+        return company_id in self._warm
+
+    def has_warm_scopes(self) -> bool:
+        return bool(self._warm)
+
+    def load(self, company_id: Optional[int], reminders: Iterable[Dict[str, Any]]) -> None:
+        """Build a company's queues from open reminder rows (with ``assigned_to``)."""
+        open_reminders = {r['id']: r for r in reminders if not r.get('completed')}
+        heaps: Dict[tuple, List[tuple]] = {}
+        for reminder in open_reminders.values():
+            entry = (reminder['reminder_date'], reminder['id'])
+            for assignee in (reminder.get('assigned_to'), ALL_ASSIGNEES):
+                heaps.setdefault((company_id, assignee), []).append(entry)
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        with self._lock:
+            self._heaps = {k: v for k, v in self._heaps.items() if k[0] != company_id}
+            self._heaps.update(heaps)
+            self._open[company_id] = open_reminders
+            self._warm.add(company_id)
+
+    def add(self, company_id: Optional[int], reminder: Dict[str, Any]) -> None:
+        """Queue an open reminder (new, reopened or rescheduled) in every warm scope."""
+        if reminder.get('completed'):
+            self.complete(reminder['id'])
+            return
+        entry = (reminder['reminder_date'], reminder['id'])
+        with self._lock:
+            for scope in {company_id, None}:
+                if scope not in self._warm:
+                    continue
+                self._open[scope][reminder['id']] = reminder
+                for assignee in (reminder.get('assigned_to'), ALL_ASSIGNEES):
+                    heapq.heappush(self._heaps.setdefault((scope, assignee), []), entry)
+
+    def complete(self, reminder_id: int) -> None:
+        """Forget a reminder; its heap entries are discarded when they surface."""
+        with self._lock:
+            for open_reminders in self._open.values():
+                open_reminders.pop(reminder_id, None)
+
+    def next_due(self, company_id: Optional[int], assigned_to: Any = ALL_ASSIGNEES,
+                 limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the ``limit`` earliest open reminders, O(limit log n)."""
+        with self._lock:
+            heap = self._heaps.get((company_id, assigned_to), [])
+            open_reminders = self._open.get(company_id, {})
+            due, seen = [], set()
+            while heap and len(due) < limit:
+                reminder_date, reminder_id = heapq.heappop(heap)
+                reminder = open_reminders.get(reminder_id)
+                # Tamamlanmış, yeniden planlanmış ya da başka satışçıya geçmiş kayıtları at
+                if (reminder is None or reminder['reminder_date'] != reminder_date or reminder_id in seen
+                        or assigned_to not in (ALL_ASSIGNEES, reminder.get('assigned_to'))):
+                    continue
+                seen.add(reminder_id)
+                due.append(reminder)
+            for reminder in due:
+                heapq.heappush(heap, (reminder['reminder_date'], reminder['id']))
+            return due
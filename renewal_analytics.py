@@ -0,0 +1,107 @@
+# Renewal Analytics - vade ayı kohortlarına göre yenileme dönüşüm hunisi
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Optional, List, Dict, Any, Iterable
+
+# renewal_status.status değerlerinin huni aşamalarına eşlenmesi
+RENEWED_STATUSES = {'renewed', 'yenilendi'}
+LOST_STATUSES = {'lost', 'kaybedildi', 'iptal'}
+NOT_CONTACTED_STATUSES = {'', 'new', 'pending', 'beklemede', 'yeni'}
+
+# Kohortların kırıldığı boyutlar (policies kolonları); 'all' şirket toplamıdır
+COHORT_DIMENSIONS = ('all', 'salesperson_id', 'product_id')
+FUNNEL_STAGES = ('due', 'contacted', 'renewed', 'lost')
+# Her yenilemede içinde bulunulan ay dahil yeniden hesaplanan son ay sayısı; yenileme durumları
+# vade ayından sonra da değiştiği için önceki ay da güncellenir
+TRAILING_MONTHS = 2
+
+
+def funnel_stage_flags(status: Optional[str]) -> Dict[str, int]:
+    """Which funnel stages a policy with this renewal status has reached."""
+    status = (status or '').strip().casefold()
+    renewed = status in RENEWED_STATUSES
+    lost = status in LOST_STATUSES
+    contacted = renewed or lost or status not in NOT_CONTACTED_STATUSES
+    return {'due': 1, 'contacted': int(contacted), 'renewed': int(renewed), 'lost': int(lost)}
+
+
+def month_bounds(cohort_month: str) -> tuple:
+    """'YYYY-MM' -> ('YYYY-MM-01', first day of the next month)."""
+    year, month = int(cohort_month[:4]), int(cohort_month[5:7])
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return f"{cohort_month}-01", following.isoformat()
+
+
+def compute_cohort(cohort_month: str, policies: Iterable[Dict[str, Any]],
+                   statuses: Dict[int, str], computed_at: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Funnel counts for one cohort month, per company and per dimension value."""
+    counts = defaultdict(lambda: dict.fromkeys(FUNNEL_STAGES, 0))
+    for policy in policies:
+        flags = funnel_stage_flags(statuses.get(policy['id']))
+        for dimension in COHORT_DIMENSIONS:
+            value = 0 if dimension == 'all' else (policy.get(dimension) or 0)
+            bucket = counts[(policy.get('company_id') or 0, dimension, value)]
+            for stage, flag in flags.items():
+                bucket[stage] += flag
+
+    computed_at = computed_at or datetime.now(timezone.utc).isoformat()
+    return [dict(bucket, cohort_month=cohort_month, company_id=company_id, dimension=dimension,
+                 dimension_id=value, computed_at=computed_at)
+            for (company_id, dimension, value), bucket in counts.items()]
+
+
+def with_rates(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Add contact and conversion rates to a funnel row."""
+    due = row['due'] or 0
+    row = dict(row)
+    row['contact_rate'] = round(row['contacted'] / due, 4) if due else 0.0
+    row['renewal_rate'] = round(row['renewed'] / due, 4) if due else 0.0
+    return row
+
+
+class RenewalAnalytics:
+    """Cohort funnels stored in ``renewal_cohorts``; only months never computed
+    and the last ``TRAILING_MONTHS`` months are computed on each refresh."""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def compute_month(self, cohort_month: str, computed_at: Optional[str] = None) -> List[Dict[str, Any]]:
+        start, end = month_bounds(cohort_month)
+        policies = list(self.repository.iter_policies(
+            columns='salesperson_id, product_id, company_id, end_date',
+            filters=[('gte', 'end_date', start), ('lt', 'end_date', end)]
+        ))
+        statuses = self.repository.get_renewal_statuses([p['id'] for p in policies])
+        return compute_cohort(cohort_month, policies, statuses, computed_at)
+
+    def refresh(self, months: List[str], today: Optional[date] = None) -> Dict[str, int]:
+        """Compute the trailing months and any month never computed yet."""
+        today = today or date.today()
+        trailing = set()
+        year, month = today.year, today.month
+        for _ in range(TRAILING_MONTHS):
+            trailing.add(f'{year:04d}-{month:02d}')
+            year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+
+        stored = self.repository.get_stored_cohort_months(months)
+        summary = {}
+        for cohort_month in months:
+            if cohort_month not in trailing and cohort_month in stored:
+                continue
+            computed_at = datetime.now(timezone.utc).isoformat()
+            rows = self.compute_month(cohort_month, computed_at)
+            summary[cohort_month] = self.repository.save_renewal_cohorts(cohort_month, rows, computed_at)
+        return summary
+
+    def funnel(self, company_id: Optional[int], months: List[str], dimension: str = 'all') -> List[Dict[str, Any]]:
+        """Stored funnels for a company (``None`` sums every company), one row per month and dimension value."""
+        rows = self.repository.get_renewal_cohorts(months, dimension, company_id)
+        merged = defaultdict(lambda: dict.fromkeys(FUNNEL_STAGES, 0))
+        for row in rows:
+            bucket = merged[(row['cohort_month'], row['dimension_id'])]
+            for stage in FUNNEL_STAGES:
+                bucket[stage] += row[stage] or 0
+        return [with_rates(dict(bucket, cohort_month=month, dimension=dimension,
+                                dimension_id=None if dimension == 'all' else value))
+                for (month, value), bucket in sorted(merged.items())]
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yenileme hatırlatma dağıtıcısı
+Vadesi yaklaşan ve henüz bildirilmemiş poliçeleri satışçı/şirket bazında özetler,
+seçilen kanaldan (SMTP veya dosya) gönderir ve last_notified_on alanını toplu günceller.
+Özet satışçının e-postasına, satışçı atanmamışsa ya da e-postası yoksa poliçenin şirketindeki
+kullanıcıların e-postalarına gider; alıcısı bulunamayan özet gönderilmez.
+
+Kullanım:
+    python renewal_dispatcher.py --days 30 --sink file --path reminders.jsonl
+    python renewal_dispatcher.py --days 30 --sink smtp --smtp-host localhost --smtp-port 1025
+
+Yerel SMTP test sunucusu: python -m aiosmtpd -n -l localhost:1025
+"""
+
+import argparse
+import json
+import logging
+import os
+import smtplib
+from collections import defaultdict
+from datetime import date
+from email.message import EmailMessage
+from typing import Optional, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class FileSink:
+    """Writes each digest as one JSON line (development, audits)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def send(self, digest: Dict[str, Any]) -> bool:
+        self._file.write(json.dumps(digest, ensure_ascii=False, default=str) + '\n')
+        return True
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class SmtpSink:
+    """Sends each digest as an e-mail to its ``recipients`` over one reused SMTP connection."""
+
+    def __init__(self, host: str = 'localhost', port: int = 1025, sender: str = 'noreply@budun.com',
+                 username: Optional[str] = None, password: Optional[str] = None, use_tls: bool = False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._smtp = None
+
+    def open(self):
+        self._smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            self._smtp.starttls()
+        if self.username:
+            self._smtp.login(self.username, self.password)
+
+    def send(self, digest: Dict[str, Any]) -> bool:
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = ', '.join(digest['recipients'])
+        message['Subject'] = f"Yenileme hatırlatması: {len(digest['policies'])} poliçe - {digest['salesperson_name']}"
+        lines = [f"{digest['company_name']} - {digest['salesperson_name']}", '']
+        for policy in digest['policies']:
+            lines.append(f"{policy['end_date']}  {policy['policy_number'] or '-'}  {policy['customer_name'] or '-'}  "
+                         f"{policy['product_name'] or '-'}  {policy['plate'] or ''}")
+        message.set_content('\n'.join(lines))
+        self._smtp.send_message(message)
+        return True
+
+    def close(self):
+        if self._smtp:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class RenewalReminderDispatcher:
+    """One pass: select due policies, send one digest per salesperson, stamp them."""
+
+    def __init__(self, repository, sink, days: int = 30, renotify_after_days: int = 30):
+        self.repository = repository
+        self.sink = sink
+        self.days = days
+        self.renotify_after_days = renotify_after_days
+
+    def build_digests(self, policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Group policies per (company, salesperson) with names and addresses resolved from one lookup per table."""
+        products = self.repository.get_name_lookup('products')
+        salespeople = self.repository.get_name_lookup('salespeople')
+        companies = self.repository.get_name_lookup('companies')
+        addresses = self.repository.get_reminder_addresses()
+
+        groups = defaultdict(list)
+        for policy in policies:
+            groups[(policy.get('company_id'), policy.get('salesperson_id'))].append(policy)
+
+        digests = []
+        for (company_id, salesperson_id), group in groups.items():
+            group.sort(key=lambda p: p['end_date'])
+            digests.append({
+                'company_id': company_id,
+                'company_name': companies.get(company_id, ''),
+                'salesperson_id': salesperson_id,
+                'salesperson_name': salespeople.get(salesperson_id, 'Atanmamış'),
+                # Yalnızca poliçenin kendi şirketine ait adresler (başka şirkete ya da ortak adrese gitmez)
+                'recipients': addresses.get((company_id, salesperson_id)) or addresses.get((company_id, None), []),
+                'policies': [{
+                    'id': p['id'],
+                    'policy_number': p.get('policy_number'),
+                    'customer_name': p.get('customer_name'),
+                    'plate': p.get('plate'),
+                    'end_date': p.get('end_date'),
+                    'product_name': products.get(p.get('product_id'), ''),
+                    'premium': p.get('premium'),
+                } for p in group]
+            })
+        return digests
+
+    def run(self) -> Dict[str, int]:
+        policies = self.repository.get_due_unnotified_policies(self.days, self.renotify_after_days)
+        summary = {'policies': len(policies), 'digests': 0, 'failed_digests': 0, 'notified': 0}
+        if not policies:
+            return summary
+
+        digests = self.build_digests(policies)
+        notified_ids = []
+        self.sink.open()
+        try:
+            for digest in digests:
+                if not digest['recipients']:
+                    logger.warning("Alıcı bulunamadı: %s / %s", digest['company_name'], digest['salesperson_name'])
+                    summary['failed_digests'] += 1
+                    continue
+                try:
+                    sent = self.sink.send(digest)
+                except Exception as e:
+                    logger.error("Hatırlatma gönderilemedi (%s): %s", digest['salesperson_name'], e)
+                    sent = False
+                if sent:
+                    summary['digests'] += 1
+                    notified_ids.extend(p['id'] for p in digest['policies'])
+                else:
+                    summary['failed_digests'] += 1
+        finally:
+            self.sink.close()
+
+        # Yalnızca gönderilen özetlerdeki poliçeler işaretlenir; kalanlar sonraki çalıştırmada tekrar denenir
+        summary['notified'] = self.repository.mark_policies_notified(notified_ids, date.today().isoformat())
+        return summary
+
+
+def sink_from_env():
+    """RENEWAL_SINK=smtp|file ve ilgili ortam değişkenlerinden kanal oluştur
+
+    SMTP_HOST tanımlı değilse hata verir: sunucusuz ortamda localhost'ta SMTP sunucusu yoktur.
+    """
+    if os.environ.get('RENEWAL_SINK', 'smtp') == 'file':
+        return FileSink(os.environ.get('RENEWAL_FILE_PATH', '/tmp/renewal_reminders.jsonl'))
+    if not os.environ.get('SMTP_HOST'):
+        raise ValueError('SMTP_HOST tanımlı değil; RENEWAL_SINK=smtp için SMTP ayarlarını girin')
+    return SmtpSink(
+        host=os.environ['SMTP_HOST'],
+        port=int(os.environ.get('SMTP_PORT', '587')),
+        sender=os.environ.get('SMTP_SENDER', 'noreply@budun.com'),
+        username=os.environ.get('SMTP_USERNAME'),
+        password=os.environ.get('SMTP_PASSWORD'),
+        use_tls=os.environ.get('SMTP_TLS', '') == '1'
+    )
+
+
+def main():
+    from supabase_repository import SupabaseRepository
+    from structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description='Yenileme hatırlatmalarını gönder')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--renotify-after-days', type=int, default=30)
+    parser.add_argument('--sink', choices=['smtp', 'file'], default='file')
+    parser.add_argument('--path', default='renewal_reminders.jsonl')
+    parser.add_argument('--smtp-host', default='localhost')
+    parser.add_argument('--smtp-port', type=int, default=1025)
+    args = parser.parse_args()
+
+    if args.sink == 'file':
+        sink = FileSink(args.path)
+    else:
+        sink = SmtpSink(args.smtp_host, args.smtp_port)
+
+    configure_logging()
+    dispatcher = RenewalReminderDispatcher(SupabaseRepository(), sink, args.days, args.renotify_after_days)
+    summary = dispatcher.run()
+    logger.info("Yenileme hatırlatmaları tamamlandı", extra=summary)
+
+
+if __name__ == '__main__':
+    main()
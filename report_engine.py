@@ -0,0 +1,208 @@
+# Report Engine - NumPy ile vektörel prim ve komisyon (üretim) raporları
+import re
+import threading
+import time
+from typing import Optional, List, Tuple, Dict, Any, Sequence
+
+import numpy as np
+
+# Gruplanabilir boyutlar -> policies kolonu
+REPORT_DIMENSIONS = {
+    'salesperson': 'salesperson_id',
+    'product': 'product_id',
+    'company': 'company_id',
+    'month': 'month',
+}
+# Üretim ayı bu tarih kolonundan alınır
+PRODUCTION_DATE_COLUMN = 'created_at'
+MISSING_ID = -1
+# Rapor dönemi: tam olarak 'YYYY-MM' ('2024-1' ya da '2024-13' kabul edilmez)
+PERIOD_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def is_period(value: Optional[str]) -> bool:
+    return bool(value and PERIOD_PATTERN.match(value))
+
+
+def month_index(value: Optional[str]) -> int:
+    """'YYYY-MM...' -> months since year 0; -1 when empty."""
+    if not value or len(value) < 7:
+        return MISSING_ID
+    return int(value[:4]) * 12 + int(value[5:7]) - 1
+
+
+def month_label(index: int) -> Optional[str]:
+    if index == MISSING_ID:
+        return None
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def load_columns(policies, commission_by_product: Dict[int, float]) -> Dict[str, np.ndarray]:
+    """Turn policy rows into column arrays; commission is resolved per row via the product table."""
+    salesperson, product, company, month, premium = [], [], [], [], []
+    for policy in policies:
+        salesperson.append(policy.get('salesperson_id') or MISSING_ID)
+        product.append(policy.get('product_id') or MISSING_ID)
+        company.append(policy.get('company_id') or MISSING_ID)
+        month.append(month_index(policy.get(PRODUCTION_DATE_COLUMN)))
+        premium.append(policy.get('premium') or 0)
+
+    columns = {
+        'salesperson_id': np.asarray(salesperson, dtype=np.int64),
+        'product_id': np.asarray(product, dtype=np.int64),
+        'company_id': np.asarray(company, dtype=np.int64),
+        'month': np.asarray(month, dtype=np.int64),
+        'premium': np.asarray(premium, dtype=np.float64),
+    }
+    columns['commission'] = columns['premium'] * commission_rates(columns['product_id'], commission_by_product)
+    return columns
+
+
+def commission_rates(product_ids: np.ndarray, commission_by_product: Dict[int, float]) -> np.ndarray:
+    """Vectorized product_id -> commission fraction lookup (0 for unknown products)."""
+    if not commission_by_product or product_ids.size == 0:
+        return np.zeros(product_ids.shape, dtype=np.float64)
+    known = np.fromiter(commission_by_product.keys(), dtype=np.int64)
+    rates = np.fromiter((float(v or 0) / 100 for v in commission_by_product.values()), dtype=np.float64)
+    order = np.argsort(known)
+    known, rates = known[order], rates[order]
+    positions = np.clip(np.searchsorted(known, product_ids), 0, known.size - 1)
+    return np.where(known[positions] == product_ids, rates[positions], 0.0)
+
+
+def aggregate(columns: Dict[str, np.ndarray], group_by: Sequence[str]) -> List[Dict[str, Any]]:
+    """Group-by with np.unique + np.bincount; returns one dict per group, largest premium first."""
+    size = columns['premium'].size
+    if size == 0:
+        return []
+
+    keys, codes, shape = [], [], []
+    for dimension in group_by:
+        uniques, inverse = np.unique(columns[REPORT_DIMENSIONS[dimension]], return_inverse=True)
+        keys.append(uniques)
+        codes.append(inverse.ravel())
+        shape.append(uniques.size)
+
+    if codes:
+        flat = np.ravel_multi_index(codes, shape)
+        groups, group_codes = np.unique(flat, return_inverse=True)
+        group_codes = group_codes.ravel()
+    else:
+        groups, group_codes = np.zeros(1, dtype=np.int64), np.zeros(size, dtype=np.int64)
+
+    counts = np.bincount(group_codes, minlength=groups.size)
+    premium = np.bincount(group_codes, weights=columns['premium'], minlength=groups.size)
+    commission = np.bincount(group_codes, weights=columns['commission'], minlength=groups.size)
+
+    order = np.argsort(-premium, kind='stable')
+    unravelled = np.unravel_index(groups[order], shape) if codes else []
+    dimension_values = []
+    for dimension, uniques, positions in zip(group_by, keys, unravelled):
+        values = uniques[positions].tolist()
+        if dimension == 'month':
+            dimension_values.append(('month', [month_label(v) for v in values]))
+        else:
+            dimension_values.append((REPORT_DIMENSIONS[dimension], [None if v == MISSING_ID else v for v in values]))
+
+    counts = counts[order].tolist()
+    premium = np.round(premium[order], 2).tolist()
+    commission = np.round(commission[order], 2).tolist()
+    rows = []
+    for i in range(len(order)):
+        row = {column: values[i] for column, values in dimension_values}
+        row['policy_count'] = counts[i]
+        row['premium_total'] = premium[i]
+        row['commission_total'] = commission[i]
+        rows.append(row)
+    return rows
+
+
+class ProductionReportEngine:
+    """Premium and commission totals per company and period, cached for ``ttl`` seconds.
+
+    Column arrays are cached per (company, period) so different groupings of
+    the same period reuse one load; results are cached per grouping, and also
+    in the optional shared ``cache`` so other instances can reuse them. Local
+    entries remember the shared ``reports`` version they were built under and
+    are dropped once another instance invalidates it.
+    """
+
+    def __init__(self, repository, ttl: int = 300, cache=None):
+        self.repository = repository
+        self.ttl = ttl
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._columns: Dict[tuple, Tuple[float, Dict[str, np.ndarray]]] = {}
+        self._results: Dict[tuple, Tuple[float, List[Dict[str, Any]]]] = {}
+
+    def _version(self, company_id: Optional[int]) -> Optional[int]:
+        """Shared invalidation version for a scope (``None`` without a shared cache or when it cannot be read)."""
+        return self.cache.version('reports', company_id) if self.cache is not None else None
+
+    def _cached(self, cache: dict, key: tuple, version: Optional[int] = None):
+        with self._lock:
+            entry = cache.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl and (version is None or entry[2] == version):
+                return entry[1]
+        return None
+
+    def _store(self, cache: dict, key: tuple, value, version: Optional[int] = None) -> None:
+        with self._lock:
+            cache[key] = (time.monotonic(), value, version)
+
+    def invalidate(self, company_id: Optional[int] = None) -> None:
+        """Drop cached data for a company (and the admin-wide view), or everything."""
+        with self._lock:
+            for cache in (self._columns, self._results):
+                for key in [k for k in cache if company_id is None or k[0] in (company_id, None)]:
+                    del cache[key]
+        if self.cache is not None:
+            for scope in {company_id, None}:
+                self.cache.invalidate('reports', scope)
+
+    def columns(self, company_id: Optional[int], date_from: str, date_to: str,
+                version: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Column arrays for policies produced between two 'YYYY-MM' months (inclusive)."""
+        if not (is_period(date_from) and is_period(date_to)):
+            raise ValueError(f"Invalid report period: {date_from} - {date_to}")
+        if version is None:
+            version = self._version(company_id)
+        key = (company_id, date_from, date_to)
+        cached = self._cached(self._columns, key, version)
+        if cached is not None:
+            return cached
+
+        commission_by_product = {p[0]: p[2] for p in self.repository.get_all_products()}
+        last_month = month_index(date_to)
+        end_exclusive = month_label(last_month + 1)
+        policies = self.repository.iter_policies(
+            company_id,
+            columns=f'premium, product_id, salesperson_id, company_id, {PRODUCTION_DATE_COLUMN}',
+            filters=[('gte', PRODUCTION_DATE_COLUMN, f'{date_from}-01'),
+                     ('lt', PRODUCTION_DATE_COLUMN, f'{end_exclusive}-01')]
+        )
+        columns = load_columns(policies, commission_by_product)
+        self._store(self._columns, key, columns, version)
+        return columns
+
+    def production(self, company_id: Optional[int], date_from: str, date_to: str,
+                   group_by: Sequence[str] = ('salesperson',)) -> List[Dict[str, Any]]:
+        unknown = [d for d in group_by if d not in REPORT_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown report dimension(s): {', '.join(unknown)}")
+        key = (company_id, date_from, date_to, tuple(group_by))
+        version = self._version(company_id)
+        cached = self._cached(self._results, key, version)
+        if cached is not None:
+            return cached
+
+        def compute():
+            return aggregate(self.columns(company_id, date_from, date_to, version), group_by)
+
+        if self.cache is not None:
+            rows = self.cache.get_or_load('reports', company_id, f"production:{date_from}:{date_to}:{','.join(group_by)}",
+                                          compute, self.ttl)
+        else:
+            rows = compute()
+        self._store(self._results, key, rows, version)
+        return rows
@@ -0,0 +1,188 @@
+# Request Profiler - seçilen isteklerden yığın örnekleri toplayıp route bazında flamegraph dosyaları üretir
+import atexit
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional, Dict, Callable
+
+# İsteklerin ne kadarı profillenir (0 = kapalı, 1 = hepsi)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+# Yığın örnekleme aralığı (saniye)
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/budun-profiles')
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', '25'))
+# Bu kadar profillenmiş istekte bir dosyalar yeniden yazılır; sunucusuz örnekler her an dondurulabildiğinden
+# varsayılan her istektir (bekleyenler süreç kapanırken de yazılır)
+PROFILE_FLUSH_EVERY = int(os.environ.get('PROFILE_FLUSH_EVERY', '1'))
+
+# Profillenen isteğin (örnekleyici, route) bilgisi; iş parçacığı havuzlarına gönderilen çağrılar bunu taşır
+_profiled: contextvars.ContextVar = contextvars.ContextVar('profiled_request', default=None)
+
+
+def frame_label(frame) -> str:
+    """'package.module:function' with the separators of the collapsed format removed."""
+    module = frame.f_globals.get('__name__') or os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f"{module}:{frame.f_code.co_name}".replace(';', '_').replace(' ', '_')
+
+
+def collapse_stack(frame) -> str:
+    """Root-first ``a;b;c`` stack of a frame (the format flamegraph.pl and speedscope read)."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def route_filename(route: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', route).strip('_') or 'root'
+
+
+def attributed(fn: Callable) -> Callable:
+    """Wrap a call about to be handed to a worker thread so it is sampled under the submitting request's route.
+
+    Returns ``fn`` unchanged when the current request is not being profiled.
+    """
+    current = _profiled.get()
+    if current is None:
+        return fn
+    sampler, route = current
+
+    def run(*args, **kwargs):
+        sampler.attach(route)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sampler.detach()
+    return run
+
+
+class StackSampler:
+    """Samples the stacks of registered request threads from one background thread.
+
+    Worker threads running calls wrapped with ``attributed`` (query and
+    fan-out pools) are sampled under the route of the request that submitted
+    them. Samples are aggregated per route as collapsed stacks. The sampler
+    thread runs only while some thread is registered; files are rewritten at
+    the end of every ``flush_every``-th profiled request and at exit.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR,
+                 top_n: int = PROFILE_TOP_N, flush_every: int = PROFILE_FLUSH_EVERY):
+        self.interval = interval
+        self.directory = directory
+        self.top_n = top_n
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._active: Dict[int, str] = {}
+        self._stacks: Dict[str, Counter] = defaultdict(Counter)
+        self._requests: Counter = Counter()
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def attach(self, route: str) -> None:
+        """Start sampling the calling thread under ``route``."""
+        with self._lock:
+            self._active[threading.get_ident()] = route
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def detach(self) -> Optional[str]:
+        """Stop sampling the calling thread; returns the route it was sampled under."""
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def begin(self, route: str) -> None:
+        """Profile the current request: sample its thread and the worker calls it submits."""
+        _profiled.set((self, route))
+        self.attach(route)
+
+    def end(self) -> None:
+        _profiled.set(None)
+        route = self.detach()
+        if route is None:
+            return
+        with self._lock:
+            self._requests[route] += 1
+            self._pending += 1
+            flush = self._pending >= self.flush_every
+        if flush:
+            self.write()
+
+    def flush(self) -> None:
+        """Write the files if any profiled request finished since the last write."""
+        if self._pending:
+            self.write()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    # Örneklenecek iş parçacığı kalmadı; bir sonraki attach yeniden başlatır
+                    self._thread = None
+                    return
+                active = dict(self._active)
+            frames = sys._current_frames()
+            samples = [(route, collapse_stack(frames[ident])) for ident, route in active.items() if ident in frames]
+            with self._lock:
+                for route, stack in samples:
+                    self._stacks[route][stack] += 1
+
+    def write(self, directory: Optional[str] = None) -> str:
+        """Write ``<route>.collapsed`` files and ``summary.txt``; returns the directory."""
+        directory = directory or self.directory
+        with self._write_lock:
+            with self._lock:
+                stacks = {route: Counter(counter) for route, counter in self._stacks.items()}
+                requests = Counter(self._requests)
+                self._pending = 0
+            self._write_files(directory, stacks, requests)
+        return directory
+
+    def _write_files(self, directory: str, stacks: Dict[str, Counter], requests: Counter) -> None:
+        os.makedirs(directory, exist_ok=True)
+        summary = []
+        for route, counter in sorted(stacks.items()):
+            with open(os.path.join(directory, route_filename(route) + '.collapsed'), 'w', encoding='utf-8') as f:
+                for stack, count in counter.most_common():
+                    f.write(f"{stack} {count}\n")
+            summary.extend(self._route_summary(route, counter, requests[route]))
+        with open(os.path.join(directory, 'summary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(summary) + '\n')
+
+    def _route_summary(self, route: str, counter: Counter, request_count: int):
+        total = sum(counter.values())
+        own, inclusive = Counter(), Counter()
+        for stack, count in counter.items():
+            labels = stack.split(';')
+            own[labels[-1]] += count
+            for label in set(labels):
+                inclusive[label] += count
+
+        lines = [f"== {route}  requests={request_count} samples={total} (~{total * self.interval * 1000:.0f} ms)",
+                 f"{'self%':>7} {'total%':>7}  function (by self time)"]
+        for label, count in own.most_common(self.top_n):
+            lines.append(f"{count / total:7.1%} {inclusive[label] / total:7.1%}  {label}")
+        # Her örnekte bulunan çerçeveler (WSGI/Flask zinciri) kümülatif listede bilgi taşımaz
+        lines.append(f"{'self%':>7} {'total%':>7}  function (by total time)")
+        partial = [(label, count) for label, count in inclusive.most_common() if count < total]
+        for label, count in partial[:self.top_n]:
+            lines.append(f"{own[label] / total:7.1%} {count / total:7.1%}  {label}")
+        lines.append('')
+        return lines
+
+
+def should_profile(header_requested: bool, is_admin: bool, sample_rate: float = PROFILE_SAMPLE_RATE) -> bool:
+    """Profile when an admin asks for it via header, or by random sampling."""
+    if header_requested and is_admin:
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
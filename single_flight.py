@@ -0,0 +1,81 @@
+# Single Flight - aynı anda gelen özdeş okumaların tek sorguda birleştirilmesi
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from query_executor import QueryTimeoutError
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or exception). Nothing is
+    kept after the call returns, so this never serves stale data. Shared
+    results are the same object for every caller and must not be mutated.
+    A leader's timeout belongs to its own request deadline, so a waiting
+    caller whose leader timed out runs the function itself under its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: tuple, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` for ``key`` (whose first item names the operation) or join the call in flight."""
+        with self._lock:
+            stats = self._stats.setdefault(key[0], {'calls': 0, 'executed': 0, 'shared': 0, 'retried': 0})
+            stats['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                stats['executed'] += 1
+            else:
+                stats['shared'] += 1
+
+        if not leader:
+            call.event.wait()
+            if isinstance(call.error, QueryTimeoutError):
+                with self._lock:
+                    stats['retried'] += 1
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-operation ``calls`` / ``executed`` / ``shared`` / ``retried`` counters and the number of calls in flight."""
+        with self._lock:
+            return {'in_flight': len(self._calls),
+                    'operations': {name: dict(counters) for name, counters in self._stats.items()}}
+
+
+def coalesced(method: Callable) -> Callable:
+    """Route a repository read through ``self.single_flight``, keyed by (method, scope, arguments)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return self.single_flight.do(key, lambda: method(self, *args, **kwargs))
+    return wrapper
@@ -58,8 +58,10 @@ function initializeFormValidations() {
 // Load initial data
 async function loadInitialData() {
     try {
-        // Load policies if on policies page
-        if (window.location.pathname.includes('policies')) {
+        // Policies page: first page is server-rendered, further pages load on scroll
+        if (isServerRenderedPolicies()) {
+            initializePolicyScroll();
+        } else if (window.location.pathname.includes('policies')) {
             await loadPolicies();
         }
         
@@ -79,6 +81,10 @@ async function loadPolicies() {
     try {
         const response = await fetch('/api/policies');
         const data = await response.json();
+        if (data.complete === false) {
+            // Liste akışı sunucuda yarıda kesildi
+            throw new Error(data.error.error);
+        }
         
         if (data.policies) {
             policies = data.policies;
@@ -89,6 +95,77 @@ async function loadPolicies() {
     }
 }
 
+// Check whether the policies table was rendered on the server
+function isServerRenderedPolicies() {
+    const tbody = document.getElementById('policiesTable');
+    return Boolean(tbody && tbody.dataset.serverRendered);
+}
+
+// Load next policy page as HTML fragments when the sentinel scrolls into view
+function initializePolicyScroll() {
+    const tbody = document.getElementById('policiesTable');
+    const sentinel = document.getElementById('policiesSentinel');
+    if (!tbody || !sentinel || !tbody.dataset.nextCursor) return;
+    
+    let loading = false;
+    const observer = new IntersectionObserver(async entries => {
+        if (loading || !entries.some(entry => entry.isIntersecting)) return;
+        loading = true;
+        try {
+            const response = await fetch(`/policies/rows?after=${encodeURIComponent(tbody.dataset.nextCursor)}`);
+            if (response.ok && response.status !== 204) {
+                tbody.insertAdjacentHTML('beforeend', await response.text());
+                tbody.dataset.nextCursor = response.headers.get('X-Next-Cursor') || '';
+                filterPolicies();
+            } else {
+                tbody.dataset.nextCursor = '';
+            }
+        } catch (error) {
+            console.error('Policy page loading error:', error);
+        } finally {
+            loading = false;
+        }
+        if (!tbody.dataset.nextCursor) {
+            observer.disconnect();
+            sentinel.classList.add('d-none');
+        }
+    }, { rootMargin: '400px' });
+    observer.observe(sentinel);
+}
+
+// Show/hide server-rendered rows by search term, product and status
+function filterRenderedRows() {
+    const searchTerm = (document.getElementById('searchInput')?.value || '').toLowerCase();
+    const productFilter = document.getElementById('productFilter')?.value;
+    const statusFilter = document.getElementById('statusFilter')?.value;
+    const now = new Date();
+    const thirtyDaysFromNow = new Date();
+    thirtyDaysFromNow.setDate(now.getDate() + 30);
+    
+    document.querySelectorAll('#policiesTable tr[data-search]').forEach(row => {
+        let visible = !searchTerm || row.dataset.search.includes(searchTerm);
+        
+        if (visible && productFilter) {
+            visible = row.dataset.product === productFilter;
+        }
+        
+        if (visible && statusFilter) {
+            const endDate = row.dataset.endDate ? new Date(row.dataset.endDate) : null;
+            if (!endDate) {
+                visible = false;
+            } else if (statusFilter === 'active') {
+                visible = endDate > now;
+            } else if (statusFilter === 'expiring') {
+                visible = endDate <= thirtyDaysFromNow && endDate > now;
+            } else if (statusFilter === 'expired') {
+                visible = endDate <= now;
+            }
+        }
+        
+        row.classList.toggle('d-none', !visible);
+    });
+}
+
 // Load salespeople data
 async function loadSalespeople() {
     try {
@@ -201,6 +278,11 @@ function showNotification(message, type = 'info') {
 
 // Search functionality
 function searchPolicies(searchTerm) {
+    if (isServerRenderedPolicies()) {
+        filterRenderedRows();
+        return;
+    }
+    
     if (!searchTerm) {
         updatePoliciesTable(policies);
         return;
@@ -218,6 +300,11 @@ function searchPolicies(searchTerm) {
 
 // Filter policies
 function filterPolicies() {
+    if (isServerRenderedPolicies()) {
+        filterRenderedRows();
+        return;
+    }
+    
     const productFilter = document.getElementById('productFilter')?.value;
     const statusFilter = document.getElementById('statusFilter')?.value;
     
@@ -265,6 +352,11 @@ function clearFilters() {
     if (productFilter) productFilter.value = '';
     if (statusFilter) statusFilter.value = '';
     
+    if (isServerRenderedPolicies()) {
+        filterRenderedRows();
+        return;
+    }
+    
     updatePoliciesTable(policies);
 }
 
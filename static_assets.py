@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statik dosya derleme adımı
+İçerik hash'li dosya adları, önceden sıkıştırılmış .gz/.br kopyaları ve manifest üretir.
+
+Kullanım: python static_assets.py
+Vercel derlemesi (vercel.json "builds") bu adımı çalıştırmaz: çıktı (static/dist) commit edilir;
+tests/test_static_assets.py kaynak değişip derleme yenilenmediğinde başarısız olur.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # Brotli opsiyonel; yoksa yalnızca .gz üretilir
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Derlenecek kaynaklar (static/ klasörüne göre)
+ASSETS = [
+    'css/style.css',
+    'js/app.js',
+]
+
+# Sıkıştırılmış varyantlar, tercih sırasına göre (Accept-Encoding adı, dosya uzantısı)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def build(static_folder: str = STATIC_FOLDER) -> dict:
+    """Fingerprint every asset, write compressed variants and the manifest; drop older builds."""
+    manifest = {}
+    written = {MANIFEST_NAME}
+    for source in ASSETS:
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            data = f.read()
+
+        digest = content_hash(data)
+        stem, ext = os.path.splitext(source)
+        target = f"{DIST_DIR}/{stem}.{digest}{ext}"
+        target_path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+        with open(target_path, 'wb') as f:
+            f.write(data)
+        with open(target_path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target_path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+
+        manifest[source] = {'file': target, 'hash': digest}
+        written.update(os.path.relpath(target_path + suffix, os.path.join(static_folder, DIST_DIR))
+                       for suffix in ('', '.gz', '.br'))
+        print(f"{source} -> {target}")
+
+    # static/dist commit edilir: eski hash'li kopyalar birikmesin
+    dist = os.path.join(static_folder, DIST_DIR)
+    for root, _, files in os.walk(dist):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, dist) not in written:
+                os.remove(path)
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder: str = STATIC_FOLDER) -> dict:
+    """Return ``{source: fingerprinted_file}`` for assets whose build is current.
+
+    Entries whose source changed since the last build are dropped, so a
+    stale build falls back to the plain file instead of serving old code.
+    """
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    current = {}
+    for source, entry in manifest.items():
+        try:
+            with open(os.path.join(static_folder, source), 'rb') as f:
+                if content_hash(f.read()) != entry['hash']:
+                    continue
+        except OSError:
+            continue
+        if os.path.exists(os.path.join(static_folder, entry['file'])):
+            current[source] = entry['file']
+    return current
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,158 @@
+# Structured Logging - kuyruk tabanlı JSON log, istek korelasyon kimliği ve hata hız sınırı
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Dict, Any
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Kuyruk dolarsa (ör. stdout tıkanırsa) yeni kayıtlar beklemeden atılır
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+# Aynı hata noktasından pencere başına en fazla bu kadar kayıt yazılır; fazlası sayılıp özetlenir
+ERROR_LOG_BURST = int(os.environ.get('ERROR_LOG_BURST', '5'))
+ERROR_LOG_WINDOW = float(os.environ.get('ERROR_LOG_WINDOW', '60'))
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None)
+
+# Kayıtta zaten bulunan standart alanlar; geri kalanlar (extra=...) JSON'a eklenir
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'site', 'suppressed'}
+
+
+def set_request_id(value: Optional[str]):
+    """Bind a correlation id to the current context; returns a reset token."""
+    return _request_id.set(value)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def error_site(record: logging.LogRecord) -> str:
+    """Call site of a record; a shared helper that logs for its caller passes ``extra={'site': ...}``."""
+    return getattr(record, 'site', None) or f"{record.name}:{record.funcName}:{record.lineno}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        if record.levelno >= logging.WARNING:
+            entry['site'] = getattr(record, 'site', error_site(record))
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the request id onto the record in the emitting thread (before it is queued)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class ErrorRateLimiter(logging.Filter):
+    """Counts every WARNING+ per call site and lets at most ``burst`` through per window.
+
+    The first record let through after suppression carries ``suppressed``,
+    the number of records dropped since the previous one.
+    """
+
+    def __init__(self, burst: int = ERROR_LOG_BURST, window: float = ERROR_LOG_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+        self._windows: Dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        site = error_site(record)
+        record.site = site
+        now = time.monotonic()
+        with self._lock:
+            self.counters[site] += 1
+            window = self._windows.get(site)
+            if window is None or now - window[0] >= self.window:
+                # [pencere başlangıcı, penceredeki yazılan, bastırılan]
+                suppressed = window[2] if window else 0
+                self._windows[site] = [now, 1, 0]
+                record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                record.suppressed, window[2] = window[2], 0
+                return True
+            window[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_rate_limiter: Optional[ErrorRateLimiter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """Route the root logger through a queue to a JSON stdout handler on a background thread (idempotent)."""
+    global _handler, _rate_limiter, _listener
+    if _handler is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _rate_limiter = ErrorRateLimiter()
+    _handler.addFilter(ContextFilter())
+    _handler.addFilter(_rate_limiter)
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_stats() -> Dict[str, Any]:
+    """Per-site WARNING+ counts since start, and records dropped on a full queue."""
+    return {
+        'error_sites': dict(_rate_limiter.counters.most_common()) if _rate_limiter else {},
+        'dropped': _handler.dropped if _handler else 0,
+    }
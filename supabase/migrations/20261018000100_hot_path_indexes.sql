@@ -0,0 +1,23 @@
+-- Sık kullanılan filtreler için indeksler
+-- Supabase CLI: supabase db push (migration'lar dosya adındaki sürüm sırasıyla uygulanır)
+
+-- iter_policies / get_policy_page: şirket filtresi + id'ye göre azalan keyset sayfalama
+create index if not exists policies_company_id_id_idx on public.policies (company_id, id desc);
+
+-- Vade pencereleri (due_within_days, overdue, yenileme hatırlatmaları, kohortlar)
+create index if not exists policies_end_date_idx on public.policies (end_date);
+
+-- Müşteri kartı (/api/customers/<tc_vkn>)
+create index if not exists policies_customer_tc_vkn_idx on public.policies (customer_tc_vkn);
+
+-- Giriş, yetki ve kapsam kontrolleri
+create index if not exists users_username_idx on public.users (username);
+create index if not exists user_permissions_user_id_permission_name_idx
+    on public.user_permissions (user_id, permission_name);
+
+-- Çapraz satış fırsatı tekrar kontrolü ve müşteri kartı
+create index if not exists cross_selling_customer_idx
+    on public.cross_selling (customer_name, customer_tc_vkn);
+
+-- Müşteri kartındaki cari hareket birleşimi ve bakiye yükleme
+create index if not exists accounts_policy_id_idx on public.accounts (policy_id);
@@ -0,0 +1,63 @@
+-- Uygulamanın kullandığı ancak şemada garanti edilmeyen tablo ve kısıtlar
+
+-- update_renewal_statuses upsert'ü on_conflict='policy_id' kullanır: poliçe başına tek satır
+-- Mevcut tekrarlardan yalnızca en son güncelleneni kalır; silinenler renewal_status_duplicates tablosuna kopyalanır
+create table if not exists public.renewal_status_duplicates (like public.renewal_status);
+alter table public.renewal_status_duplicates add column if not exists archived_at timestamptz not null default now();
+
+do $$
+declare
+    removed integer;
+begin
+    with duplicates as (
+        delete from public.renewal_status r
+        using public.renewal_status newer
+        where r.policy_id = newer.policy_id
+          and (coalesce(newer.updated_at, 'epoch'), newer.id) > (coalesce(r.updated_at, 'epoch'), r.id)
+        returning r.*
+    )
+    insert into public.renewal_status_duplicates select * from duplicates;
+    get diagnostics removed = row_count;
+    if removed > 0 then
+        raise notice 'renewal_status: % tekrar satır renewal_status_duplicates tablosuna taşındı', removed;
+    end if;
+end $$;
+
+create unique index if not exists renewal_status_policy_id_key on public.renewal_status (policy_id);
+
+-- Yenileme hatırlatma dağıtıcısı
+alter table public.policies add column if not exists last_notified_on date;
+-- Hatırlatma alıcıları: satışçının adresi, yoksa şirketteki kullanıcıların adresleri
+alter table public.salespeople add column if not exists email text;
+alter table public.users add column if not exists email text;
+
+-- Toplu muhasebe kaydı tekrar koruması (Idempotency-Key); anahtar şirket bazında tekil, company_id için 0 = yok.
+-- Satır kayıtlar eklenmeden önce completed = false ile ayrılır, tamamı eklenince true olur.
+create table if not exists public.account_batches (
+    company_id bigint not null default 0,
+    idempotency_key text not null,
+    transaction_count integer not null,
+    completed boolean not null default false,
+    created_at timestamptz not null default now(),
+    primary key (company_id, idempotency_key)
+);
+
+-- Yenileme dönüşüm kohortları (renewal_analytics); company_id/dimension_id için 0 = yok
+create table if not exists public.renewal_cohorts (
+    cohort_month text not null,
+    company_id bigint not null default 0,
+    dimension text not null,
+    dimension_id bigint not null default 0,
+    due integer not null default 0,
+    contacted integer not null default 0,
+    renewed integer not null default 0,
+    lost integer not null default 0,
+    computed_at timestamptz not null,
+    primary key (cohort_month, dimension, company_id, dimension_id)
+);
+
+-- Hesaplanmış kohort ayları (poliçesi olmayan aylar da kaydedilir, her gece yeniden hesaplanmaz)
+create table if not exists public.renewal_cohort_months (
+    cohort_month text primary key,
+    computed_at timestamptz not null
+);
@@ -0,0 +1,64 @@
+-- Ürün/satışçı/şirket adlarıyla zenginleştirilmiş poliçe listeleri (tek sorguda, sunucu tarafı join)
+-- Repository bunları .rpc() ile çağırır; her satır poliçe kolonları + ad alanlarını içeren bir JSON nesnesidir
+
+-- Keyset sayfalı liste: p_company_id null ise tüm şirketler, p_after_id bu id'nin altından devam eder
+-- policies_company_id_id_idx (şirket) ya da birincil anahtar (tüm şirketler) üzerinden okunur
+create or replace function public.policies_enriched(
+    p_company_id bigint default null,
+    p_after_id bigint default null,
+    p_limit integer default 1000
+)
+returns setof jsonb
+language sql
+stable
+as $$
+    select to_jsonb(p) || jsonb_build_object(
+        'product_name', coalesce(pr.name, ''),
+        'commission_percent', coalesce(pr.commission_percent, 0),
+        'salesperson_name', coalesce(s.name, ''),
+        'company_name', coalesce(c.name, '')
+    )
+    from public.policies p
+    left join public.products pr on pr.id = p.product_id
+    left join public.salespeople s on s.id = p.salesperson_id
+    left join public.companies c on c.id = p.company_id
+    where (p_company_id is null or p.company_id = p_company_id)
+      and (p_after_id is null or p.id < p_after_id)
+    order by p.id desc
+    limit least(greatest(p_limit, 1), 1000)
+$$;
+
+-- Vade penceresi: p_from <= end_date < p_before (p_from null ise alt sınır yok), (end_date, id) sıralı;
+-- sonraki sayfa son satırın (end_date, id) değerinden devam eder. policies_end_date_idx üzerinden okunur
+create or replace function public.policies_in_renewal_window(
+    p_from date,
+    p_before date,
+    p_company_id bigint default null,
+    p_after_end_date date default null,
+    p_after_id bigint default null,
+    p_limit integer default 1000
+)
+returns setof jsonb
+language sql
+stable
+as $$
+    select to_jsonb(p) || jsonb_build_object(
+        'product_name', coalesce(pr.name, ''),
+        'commission_percent', coalesce(pr.commission_percent, 0),
+        'salesperson_name', coalesce(s.name, ''),
+        'company_name', coalesce(c.name, '')
+    )
+    from public.policies p
+    left join public.products pr on pr.id = p.product_id
+    left join public.salespeople s on s.id = p.salesperson_id
+    left join public.companies c on c.id = p.company_id
+    where (p_from is null or p.end_date >= p_from)
+      and p.end_date < p_before
+      and (p_company_id is null or p.company_id = p_company_id)
+      and (p_after_end_date is null or (p.end_date, p.id) > (p_after_end_date, p_after_id))
+    order by p.end_date, p.id
+    limit least(greatest(p_limit, 1), 1000)
+$$;
+
+grant execute on function public.policies_enriched(bigint, bigint, integer) to anon, authenticated, service_role;
+grant execute on function public.policies_in_renewal_window(date, date, bigint, date, bigint, integer) to anon, authenticated, service_role;
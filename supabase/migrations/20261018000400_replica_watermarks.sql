@@ -0,0 +1,33 @@
+-- Yerel okuma replikası (read_replica.py) için değişiklik damgaları
+-- Replika her tabloyu (updated_at, id) sırasıyla, son görülen değerden itibaren çeker;
+-- bu yüzden updated_at her insert/update'te güncel ve boş olmamalıdır
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['policies', 'products', 'companies', 'salespeople'] loop
+        execute format('alter table public.%I add column if not exists updated_at timestamptz', t);
+        execute format('update public.%I set updated_at = now() where updated_at is null', t);
+        execute format('alter table public.%I alter column updated_at set default now()', t);
+        execute format('alter table public.%I alter column updated_at set not null', t);
+        execute format('drop trigger if exists %I on public.%I', t || '_set_updated_at', t);
+        execute format('create trigger %I before update on public.%I '
+                       'for each row execute function public.set_updated_at()', t || '_set_updated_at', t);
+        execute format('create index if not exists %I on public.%I (updated_at, id)', t || '_updated_at_id_idx', t);
+    end loop;
+end
+$$;
+
+-- Şirket bazlı replika senkronu: company_id = ? and updated_at > ? order by updated_at, id
+create index if not exists policies_company_id_updated_at_id_idx on public.policies (company_id, updated_at, id);
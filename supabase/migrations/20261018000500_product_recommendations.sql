@@ -0,0 +1,22 @@
+-- Çapraz satış önerileri (cross_sell_recommender.py): portföy birlikteliğinden hesaplanan
+-- "ürün -> önerilen ürün" kuralları; fırsat üreticisi ve öneri listesi bu tablodan okur
+create table if not exists public.product_recommendations (
+    product_id bigint not null,
+    suggested_product_id bigint not null,
+    rank integer not null,
+    support integer not null,
+    confidence double precision not null,
+    lift double precision not null,
+    computed_at timestamptz not null,
+    primary key (product_id, suggested_product_id)
+);
+
+-- Öneri hesabının artımlı durumu (tek satır): ürün birliktelik matrisi, müşteri sayısı ve işlenen son poliçe
+create table if not exists public.cross_sell_state (
+    id integer primary key default 1 check (id = 1),
+    products jsonb not null,
+    cooccurrence jsonb not null,
+    customers integer not null,
+    last_policy_id bigint,
+    computed_at timestamptz not null
+);
@@ -0,0 +1,24 @@
+-- Poliçe numarası şirket bazında tekil: add_policies'in tekrar dizini (duplicate_index.normalize) ile aynı
+-- normalleştirme (boşluklar atılır, büyük harf). Birden çok örnek aynı numarayı aynı anda ekleyemez;
+-- çakışan insert 23505 döner ve API 409 ile reddeder. company_id için 0 = yok.
+do $$
+declare
+    duplicates integer;
+begin
+    select count(*) into duplicates from (
+        select 1 from public.policies
+        where policy_number is not null and btrim(policy_number) <> ''
+        group by coalesce(company_id, 0), upper(regexp_replace(policy_number, '\s', '', 'g'))
+        having count(*) > 1
+    ) d;
+    if duplicates > 0 then
+        raise exception 'policies: % poliçe numarası birden çok kez kayıtlı', duplicates
+            using hint = 'Tekrarları birleştirip silin: select coalesce(company_id, 0), '
+                         'upper(regexp_replace(policy_number, ''\s'', '''', ''g'')), array_agg(id) '
+                         'from policies group by 1, 2 having count(*) > 1';
+    end if;
+end $$;
+
+create unique index if not exists policies_company_policy_number_key on public.policies
+    (coalesce(company_id, 0), upper(regexp_replace(policy_number, '\s', '', 'g')))
+    where policy_number is not null and btrim(policy_number) <> '';
@@ -1,13 +1,112 @@
 # Supabase Repository - PostgreSQL version of PolicyRepository
+import functools
 import hashlib
+import logging
+import math
+from itertools import islice
 from datetime import datetime, date, timedelta
-from typing import Optional, List, Tuple, Dict, Any
-from supabase_config import get_supabase_client
+from typing import Optional, List, Tuple, Dict, Any, Iterator, Iterable, Callable
+from supabase_config import get_database_client
 from supabase import Client
+from customer_index import CustomerIndex, customer_key, name_key
+from balance_engine import BalanceEngine, signed_amount, is_known_transaction_type
+from reminder_scheduler import ReminderScheduler, ALL_ASSIGNEES
+from query_executor import GuardedClient, RepositoryError, QueryFailedError, UNIQUE_VIOLATION, gather
+from cache_backend import cache_from_env
+from read_replica import replica_from_env
+from cross_sell_recommender import rules_by_product, recommend
+from duplicate_index import PolicyDuplicateIndex, REJECT
+from single_flight import SingleFlight, coalesced
+
+logger = logging.getLogger(__name__)
+
+# PostgREST varsayılan max-rows sınırı; tek sayfada bundan fazlası istenmemeli
+POLICY_CHUNK_SIZE = 1000
+# Toplu muhasebe kaydında tek insert isteğine giden satır sayısı
+ACCOUNT_BATCH_CHUNK_SIZE = 500
+# Toplu poliçe aktarımında tek insert isteğine giden satır sayısı
+POLICY_INSERT_CHUNK_SIZE = 500
+# Poliçe eklemede kabul edilen alanlar: policies kolonu -> API'nin eski alan adları
+POLICY_FIELDS = {
+    'customer_name': (), 'customer_tc_vkn': ('customer_tc',), 'plate': ('plate_number',), 'doc_serial': (),
+    'note': ('notes',), 'premium': ('gross_premium',), 'product_id': (), 'salesperson_id': (),
+    'policy_number': (), 'company_id': (), 'end_date': (), 'created_at': (),
+}
+# in_() filtresine tek istekte verilecek en fazla ID (URL uzunluğu sınırı)
+ID_FILTER_CHUNK_SIZE = 500
+# in_() filtresine tek istekte verilecek en fazla müşteri adı (adlar ID'lerden uzun)
+NAME_FILTER_CHUNK_SIZE = 100
+# Paylaşılan önbellekte referans tablolarının (ürün, şirket, satışçı adları) ömrü (saniye)
+REFERENCE_CACHE_TTL = 600
+# renewal_cohorts upsert'lerinde istek başına satır
+COHORT_CHUNK_SIZE = 500
+# product_recommendations upsert'lerinde istek başına satır
+RECOMMENDATION_CHUNK_SIZE = 500
+# Müşteri dizini bu süreden eskiyse (ya da paylaşılan sürüm değiştiyse) yeniden yüklenir (saniye)
+CUSTOMER_INDEX_TTL = 300
+
+
+def fallback(default: Any, message: Optional[str] = None) -> Callable:
+    """Return ``default`` (a factory when callable) from a repository method that fails unexpectedly.
+
+    Backend failures (``RepositoryError``: timeout, open circuit, rejected
+    query) are re-raised so the app answers 503/504 instead of empty data.
+    Other errors are logged with ``message`` (under the method's own site)
+    and swallowed.
+    """
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except RepositoryError:
+                raise
+            except Exception as e:
+                if message:
+                    logger.error("%s: %s", message, e, extra={'site': f'{__name__}:{method.__name__}'})
+                return default() if callable(default) else default
+        return wrapper
+    return decorate
+
+
+class partial_result:
+    """``with`` block of a method that returns what it gathered before an unexpected failure.
+
+    As with ``fallback``, ``RepositoryError`` propagates; other errors are
+    logged with ``message`` (under the calling method's site), passed to
+    ``on_error`` when given, and swallowed.
+    """
+
+    def __init__(self, message: str, on_error: Optional[Callable[[Exception], None]] = None):
+        self.message = message
+        self.on_error = on_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is None or not isinstance(exc, Exception) or isinstance(exc, RepositoryError):
+            return False
+        logger.error("%s: %s", self.message, exc, stacklevel=2)
+        if self.on_error is not None:
+            self.on_error(exc)
+        return True
+
 
 class SupabaseRepository:
     def __init__(self):
-        self.supabase: Client = get_supabase_client()
+        # Sorgular istek süresi, yeniden deneme ve devre kesici altında çalışır
+        self.supabase: Client = GuardedClient(get_database_client())
+        self.customer_index = CustomerIndex()
+        self.balance_engine = BalanceEngine()
+        self.reminder_scheduler = ReminderScheduler()
+        self.duplicate_index = PolicyDuplicateIndex()
+        # Aynı anda gelen özdeş okumalar (vardiya başı yığılmaları) tek sorguda birleşir
+        self.single_flight = SingleFlight()
+        # Sunucusuz örnekler arasında paylaşılan önbellek (CACHE_BACKEND ile seçilir)
+        self.cache = cache_from_env()
+        # Okuma ağırlıklı listeler için yerel SQLite replikası (READ_REPLICA_PATH tanımlıysa)
+        self.replica = replica_from_env(self.supabase)
         self._ensure_default_data()
 
     def _ensure_default_data(self):
@@ -18,324 +117,289 @@ class SupabaseRepository:
             if not result.data:
                 # Create default admin user
                 self.create_user('admin', 'admin123', True, None)
-                print("Default admin user created")
+                logger.info("Default admin user created")
         except Exception as e:
-            print(f"Error ensuring default data: {e}")
+            logger.error("Error ensuring default data: %s", e)
 
     # User Management
+    @fallback(False, "Authentication error")
     def authenticate_user(self, username: str, password: str) -> bool:
         """Authenticate user with username and password"""
-        try:
-            result = self.supabase.table('users').select('password_hash').eq('username', username).execute()
-            if result.data:
-                stored_hash = result.data[0]['password_hash']
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
-                if stored_hash == password_hash:
-                    # Update last login
-                    self.supabase.table('users').update({
-                        'last_login': datetime.now().isoformat()
-                    }).eq('username', username).execute()
-                    return True
-            return False
-        except Exception as e:
-            print(f"Authentication error: {e}")
-            return False
+        result = self.supabase.table('users').select('password_hash').eq('username', username).execute()
+        if result.data:
+            stored_hash = result.data[0]['password_hash']
+            password_hash = hashlib.sha256(password.encode()).hexdigest()
+            if stored_hash == password_hash:
+                # Update last login
+                self.supabase.table('users').update({
+                    'last_login': datetime.now().isoformat()
+                }).eq('username', username).execute()
+                return True
+        return False
 
+    @fallback(False, "Error creating user")
     def create_user(self, username: str, password: str, is_admin: bool = False, company_id: Optional[int] = None) -> bool:
         """Create a new user"""
-        try:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            result = self.supabase.table('users').insert({
-                'username': username,
-                'password_hash': password_hash,
-                'is_admin': is_admin,
-                'company_id': company_id,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error creating user: {e}")
-            return False
-
+        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        result = self.supabase.table('users').insert({
+            'username': username,
+            'password_hash': password_hash,
+            'is_admin': is_admin,
+            'company_id': company_id,
+            'created_at': datetime.now().isoformat()
+        }).execute()
+        return len(result.data) > 0
+
+    @fallback(False)
     def is_user_admin(self, username: str) -> bool:
         """Check if user is admin"""
-        try:
-            result = self.supabase.table('users').select('is_admin').eq('username', username).execute()
-            return result.data[0]['is_admin'] if result.data else False
-        except Exception:
-            return False
+        result = self.supabase.table('users').select('is_admin').eq('username', username).execute()
+        return result.data[0]['is_admin'] if result.data else False
 
+    @fallback(None)
     def get_user_company_id(self, username: str) -> Optional[int]:
         """Get user's company ID"""
-        try:
-            result = self.supabase.table('users').select('company_id').eq('username', username).execute()
-            return result.data[0]['company_id'] if result.data else None
-        except Exception:
-            return None
+        result = self.supabase.table('users').select('company_id').eq('username', username).execute()
+        return result.data[0]['company_id'] if result.data else None
 
+    @fallback(list, "Error getting users")
     def get_all_users(self, current_user: str = None) -> List[Tuple]:
         """Get all users filtered by current user's permissions"""
-        try:
-            if current_user and self.is_user_admin(current_user):
-                # Admin sees all users
-                result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login, company_id').order('username').execute()
-            elif current_user:
-                # Regular users see only their company users
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login, company_id').eq('company_id', user_company_id).order('username').execute()
-                else:
-                    return []
+        if current_user and self.is_user_admin(current_user):
+            # Admin sees all users
+            result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login, company_id').order('username').execute()
+        elif current_user:
+            # Regular users see only their company users
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login, company_id').eq('company_id', user_company_id).order('username').execute()
             else:
                 return []
-            
-            # Convert to tuple format for compatibility
-            users = []
-            for user in result.data:
-                users.append((
-                    user['id'],
-                    user['username'],
-                    user['is_admin'],
-                    user['created_at'],
-                    user['last_login'],
-                    user['company_id']
-                ))
-            return users
-        except Exception as e:
-            print(f"Error getting users: {e}")
+        else:
             return []
-
+        
+        # Convert to tuple format for compatibility
+        users = []
+        for user in result.data:
+            users.append((
+                user['id'],
+                user['username'],
+                user['is_admin'],
+                user['created_at'],
+                user['last_login'],
+                user['company_id']
+            ))
+        return users
+
+    @fallback(False, "Error deleting user")
     def delete_user(self, username: str) -> bool:
         """Delete a user"""
-        try:
-            result = self.supabase.table('users').delete().eq('username', username).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error deleting user: {e}")
-            return False
+        result = self.supabase.table('users').delete().eq('username', username).execute()
+        self.bump_permission_version(username)
+        return len(result.data) > 0
 
+    @fallback(None)
     def get_user_by_id(self, user_id: int) -> Optional[Tuple]:
         """Get user by ID"""
-        try:
-            result = self.supabase.table('users').select('*').eq('id', user_id).execute()
-            if result.data:
-                user = result.data[0]
-                return (user['id'], user['username'], user['is_admin'], user['created_at'], user['last_login'], user['company_id'])
-            return None
-        except Exception:
-            return None
+        result = self.supabase.table('users').select('*').eq('id', user_id).execute()
+        if result.data:
+            user = result.data[0]
+            return (user['id'], user['username'], user['is_admin'], user['created_at'], user['last_login'], user['company_id'])
+        return None
 
     # Company Management
+    @fallback(list, "Error getting companies")
     def get_all_companies(self) -> List[Tuple]:
         """Get all companies"""
-        try:
-            result = self.supabase.table('companies').select('*').order('name').execute()
-            companies = []
-            for company in result.data:
-                companies.append((
-                    company['id'],
-                    company['name'],
-                    company['created_at'],
-                    company['active']
-                ))
-            return companies
-        except Exception as e:
-            print(f"Error getting companies: {e}")
-            return []
+        return self.cache.get_or_load('reference', None, 'companies', self._fetch_companies, REFERENCE_CACHE_TTL)
+
+    @coalesced
+    def _fetch_companies(self) -> List[Tuple]:
+        result = self.supabase.table('companies').select('*').order('name').execute()
+        return [(company['id'], company['name'], company['created_at'], company['active'])
+                for company in result.data]
 
+    @fallback(False, "Error adding company")
     def add_company(self, name: str) -> bool:
         """Add a new company"""
-        try:
-            result = self.supabase.table('companies').insert({
-                'name': name,
-                'created_at': datetime.now().isoformat(),
-                'active': True
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding company: {e}")
-            return False
-
+        result = self.supabase.table('companies').insert({
+            'name': name,
+            'created_at': datetime.now().isoformat(),
+            'active': True
+        }).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
+
+    @fallback(None)
     def get_company_by_id(self, company_id: int) -> Optional[Tuple]:
         """Get company by ID"""
-        try:
-            result = self.supabase.table('companies').select('*').eq('id', company_id).execute()
-            if result.data:
-                company = result.data[0]
-                return (company['id'], company['name'], company['created_at'], company['active'])
-            return None
-        except Exception:
-            return None
+        result = self.supabase.table('companies').select('*').eq('id', company_id).execute()
+        if result.data:
+            company = result.data[0]
+            return (company['id'], company['name'], company['created_at'], company['active'])
+        return None
 
+    @fallback(False, "Error updating company status")
     def update_company_status(self, company_id: int, active: bool) -> bool:
         """Update company active status"""
-        try:
-            result = self.supabase.table('companies').update({'active': active}).eq('id', company_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating company status: {e}")
-            return False
+        result = self.supabase.table('companies').update({'active': active}).eq('id', company_id).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
 
+    @fallback(False, "Error deleting company")
     def delete_company(self, company_id: int) -> bool:
         """Delete a company"""
-        try:
-            result = self.supabase.table('companies').delete().eq('id', company_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error deleting company: {e}")
-            return False
+        result = self.supabase.table('companies').delete().eq('id', company_id).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
 
     # Permission Management
+    @fallback(False)
     def check_permission(self, username: str, permission_name: str) -> bool:
         """Check if user has specific permission"""
-        try:
-            # Get user ID first
-            user_result = self.supabase.table('users').select('id').eq('username', username).execute()
-            if not user_result.data:
-                return False
-            
-            user_id = user_result.data[0]['id']
-            
-            # Check permission
-            result = self.supabase.table('user_permissions').select('permission_value').eq('user_id', user_id).eq('permission_name', permission_name).execute()
-            return result.data[0]['permission_value'] if result.data else False
-        except Exception:
+        # Get user ID first
+        user_result = self.supabase.table('users').select('id').eq('username', username).execute()
+        if not user_result.data:
             return False
-
-    def get_user_permissions(self, username: str) -> Dict[str, bool]:
-        """Get all permissions for a user"""
-        try:
-            # Get user ID first
-            user_result = self.supabase.table('users').select('id').eq('username', username).execute()
-            if not user_result.data:
-                return {}
-            
-            user_id = user_result.data[0]['id']
-            
-            # Get all permissions
-            result = self.supabase.table('user_permissions').select('permission_name, permission_value').eq('user_id', user_id).execute()
-            
-            permissions = {}
-            for perm in result.data:
-                permissions[perm['permission_name']] = perm['permission_value']
-            return permissions
-        except Exception as e:
-            print(f"Error getting user permissions: {e}")
+        
+        user_id = user_result.data[0]['id']
+        
+        # Check permission
+        result = self.supabase.table('user_permissions').select('permission_value').eq('user_id', user_id).eq('permission_name', permission_name).execute()
+        return result.data[0]['permission_value'] if result.data else False
+
+    @fallback(None, "Error getting user permissions")
+    def get_user_permissions(self, username: str) -> Optional[Dict[str, bool]]:
+        """Get all permissions for a user (``None`` when they could not be read)"""
+        # Get user ID first
+        user_result = self.supabase.table('users').select('id').eq('username', username).execute()
+        if not user_result.data:
             return {}
+        
+        user_id = user_result.data[0]['id']
+        
+        # Get all permissions
+        result = self.supabase.table('user_permissions').select('permission_name, permission_value').eq('user_id', user_id).execute()
+        
+        permissions = {}
+        for perm in result.data:
+            permissions[perm['permission_name']] = perm['permission_value']
+        return permissions
+
+    def get_permission_version(self, username: str) -> Optional[int]:
+        """Version of a user's permissions; session snapshots with another version are stale"""
+        return self.cache.version(f'permissions:{username}')
+
+    def bump_permission_version(self, username: str) -> None:
+        """Invalidate every session snapshot of a user's permissions"""
+        self.cache.invalidate(f'permissions:{username}')
 
+    @fallback(False, "Error setting user permissions")
     def set_user_permissions(self, username: str, permissions: Dict[str, bool]) -> bool:
         """Set user permissions"""
-        try:
-            # Get user ID first
-            user_result = self.supabase.table('users').select('id').eq('username', username).execute()
-            if not user_result.data:
-                return False
-            
-            user_id = user_result.data[0]['id']
-            
-            # Update each permission
-            for perm_name, perm_value in permissions.items():
-                # Try to update existing permission
-                existing = self.supabase.table('user_permissions').select('id').eq('user_id', user_id).eq('permission_name', perm_name).execute()
-                
-                if existing.data:
-                    # Update existing
-                    self.supabase.table('user_permissions').update({
-                        'permission_value': perm_value,
-                        'updated_at': datetime.now().isoformat()
-                    }).eq('user_id', user_id).eq('permission_name', perm_name).execute()
-                else:
-                    # Insert new
-                    self.supabase.table('user_permissions').insert({
-                        'user_id': user_id,
-                        'permission_name': perm_name,
-                        'permission_value': perm_value,
-                        'created_at': datetime.now().isoformat(),
-                        'updated_at': datetime.now().isoformat()
-                    }).execute()
-            
-            return True
-        except Exception as e:
-            print(f"Error setting user permissions: {e}")
+        # Get user ID first
+        user_result = self.supabase.table('users').select('id').eq('username', username).execute()
+        if not user_result.data:
             return False
-
-    def set_user_permission(self, username: str, permission_name: str, permission_value: bool) -> bool:
-        """Set single user permission"""
-        try:
-            # Get user ID
-            user_result = self.supabase.table('users').select('id').eq('username', username).execute()
-            if not user_result.data:
-                return False
-            
-            user_id = user_result.data[0]['id']
-            now = datetime.now().isoformat()
-            
-            # Check if permission already exists
-            existing_result = self.supabase.table('user_permissions').select('id').eq('user_id', user_id).eq('permission_name', permission_name).execute()
+        
+        user_id = user_result.data[0]['id']
+        
+        # Update each permission
+        for perm_name, perm_value in permissions.items():
+            # Try to update existing permission
+            existing = self.supabase.table('user_permissions').select('id').eq('user_id', user_id).eq('permission_name', perm_name).execute()
             
-            if existing_result.data:
-                # Update existing permission
+            if existing.data:
+                # Update existing
                 self.supabase.table('user_permissions').update({
-                    'permission_value': permission_value,
-                    'updated_at': now
-                }).eq('user_id', user_id).eq('permission_name', permission_name).execute()
+                    'permission_value': perm_value,
+                    'updated_at': datetime.now().isoformat()
+                }).eq('user_id', user_id).eq('permission_name', perm_name).execute()
             else:
-                # Insert new permission
+                # Insert new
                 self.supabase.table('user_permissions').insert({
                     'user_id': user_id,
-                    'permission_name': permission_name,
-                    'permission_value': permission_value,
-                    'created_at': now,
-                    'updated_at': now
+                    'permission_name': perm_name,
+                    'permission_value': perm_value,
+                    'created_at': datetime.now().isoformat(),
+                    'updated_at': datetime.now().isoformat()
                 }).execute()
-            
-            return True
-        except Exception as e:
-            print(f"Error setting user permission: {e}")
+        
+        self.bump_permission_version(username)
+        return True
+
+    @fallback(False, "Error setting user permission")
+    def set_user_permission(self, username: str, permission_name: str, permission_value: bool) -> bool:
+        """Set single user permission"""
+        # Get user ID
+        user_result = self.supabase.table('users').select('id').eq('username', username).execute()
+        if not user_result.data:
             return False
+        
+        user_id = user_result.data[0]['id']
+        now = datetime.now().isoformat()
+        
+        # Check if permission already exists
+        existing_result = self.supabase.table('user_permissions').select('id').eq('user_id', user_id).eq('permission_name', permission_name).execute()
+        
+        if existing_result.data:
+            # Update existing permission
+            self.supabase.table('user_permissions').update({
+                'permission_value': permission_value,
+                'updated_at': now
+            }).eq('user_id', user_id).eq('permission_name', permission_name).execute()
+        else:
+            # Insert new permission
+            self.supabase.table('user_permissions').insert({
+                'user_id': user_id,
+                'permission_name': permission_name,
+                'permission_value': permission_value,
+                'created_at': now,
+                'updated_at': now
+            }).execute()
+        
+        self.bump_permission_version(username)
+        return True
 
+    @fallback(False, "Error copying user permissions")
     def copy_user_permissions(self, template_username: str, target_username: str) -> bool:
         """Copy permissions from template user to target user"""
-        try:
-            # Get template user's permissions
-            template_user_result = self.supabase.table('users').select('id').eq('username', template_username).execute()
-            if not template_user_result.data:
-                print(f"Template user not found: {template_username}")
-                return False
-            
-            template_user_id = template_user_result.data[0]['id']
-            
-            # Get target user ID
-            target_user_result = self.supabase.table('users').select('id').eq('username', target_username).execute()
-            if not target_user_result.data:
-                print(f"Target user not found: {target_username}")
-                return False
-            
-            target_user_id = target_user_result.data[0]['id']
-            
-            # Get template user's permissions
-            template_permissions = self.supabase.table('user_permissions').select('*').eq('user_id', template_user_id).execute()
-            
-            if not template_permissions.data:
-                print(f"No permissions found for template user: {template_username}")
-                return True  # Not an error, just no permissions to copy
-            
-            # Copy each permission to target user
-            for perm in template_permissions.data:
-                success = self.set_user_permission(
-                    target_username, 
-                    perm['permission_name'], 
-                    perm['permission_value']
-                )
-                if not success:
-                    print(f"Failed to copy permission {perm['permission_name']} to {target_username}")
-                    return False
-            
-            print(f"Successfully copied {len(template_permissions.data)} permissions from {template_username} to {target_username}")
-            return True
-        except Exception as e:
-            print(f"Error copying user permissions: {e}")
+        # Get template user's permissions
+        template_user_result = self.supabase.table('users').select('id').eq('username', template_username).execute()
+        if not template_user_result.data:
+            logger.warning("Template user not found: %s", template_username)
+            return False
+        
+        template_user_id = template_user_result.data[0]['id']
+        
+        # Get target user ID
+        target_user_result = self.supabase.table('users').select('id').eq('username', target_username).execute()
+        if not target_user_result.data:
+            logger.warning("Target user not found: %s", target_username)
             return False
+        
+        target_user_id = target_user_result.data[0]['id']
+        
+        # Get template user's permissions
+        template_permissions = self.supabase.table('user_permissions').select('*').eq('user_id', template_user_id).execute()
+        
+        if not template_permissions.data:
+            logger.warning("No permissions found for template user: %s", template_username)
+            return True  # Not an error, just no permissions to copy
+        
+        # Copy each permission to target user
+        for perm in template_permissions.data:
+            success = self.set_user_permission(
+                target_username, 
+                perm['permission_name'], 
+                perm['permission_value']
+            )
+            if not success:
+                logger.warning("Failed to copy permission %s to %s", perm['permission_name'], target_username)
+                return False
+        
+        logger.info("Successfully copied %s permissions from %s to %s", len(template_permissions.data), template_username, target_username)
+        return True
 
     def apply_role_template(self, username: str, role_name: str) -> bool:
         """Apply role template to user"""
@@ -401,464 +465,772 @@ class SupabaseRepository:
         return False
 
     # Products Management
+    @fallback(list, "Error getting products")
     def get_all_products(self) -> List[Tuple]:
         """Get all products"""
-        try:
-            result = self.supabase.table('products').select('*').order('name').execute()
-            products = []
-            for product in result.data:
-                products.append((
-                    product['id'],
-                    product['name'],
-                    product['commission_percent']
-                ))
-            return products
-        except Exception as e:
-            print(f"Error getting products: {e}")
-            return []
+        return self.cache.get_or_load('reference', None, 'products', self._fetch_products, REFERENCE_CACHE_TTL)
+
+    @coalesced
+    def _fetch_products(self) -> List[Tuple]:
+        result = self.supabase.table('products').select('*').order('name').execute()
+        return [(product['id'], product['name'], product['commission_percent']) for product in result.data]
 
     def get_products(self) -> List[Tuple]:
         """Get all products (alias for compatibility)"""
         return self.get_all_products()
 
     # Policies Management (basic structure - can be expanded)
+    def iter_policies(self, scope: Optional[int] = None, columns: str = '*',
+                      chunk_size: int = POLICY_CHUNK_SIZE,
+                      filters: Optional[List[Tuple[str, str, Any]]] = None,
+                      after_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield policy rows lazily, newest first, in keyset-paged chunks.
+
+        ``scope`` is a company ID; ``None`` scans every company (admin and
+        batch jobs). ``filters`` is a list of ``(operator, column, value)``
+        triples such as ``('gte', 'end_date', '2024-01-01')``. ``after_id``
+        resumes below a previously seen policy ID. Paging stops only on an
+        empty chunk, so a server-side max-rows cap lower than ``chunk_size``
+        cannot silently truncate the scan.
+        """
+        return self._iter_rows('policies', scope, columns, chunk_size, filters, after_id)
+
+    def _iter_rows(self, table: str, scope: Optional[int] = None, columns: str = '*',
+                   chunk_size: int = POLICY_CHUNK_SIZE,
+                   filters: Optional[List[Tuple[str, str, Any]]] = None,
+                   after_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Keyset-paged scan of any table with an ``id`` and ``company_id`` column.
+
+        Each chunk is fetched through ``single_flight``, keyed by the query and
+        its cursor, so concurrent identical scans (e.g. a company's agents
+        opening the dashboard together) share one query per chunk. Rows may be
+        shared between callers and must not be mutated.
+        """
+        parts = [c.strip() for c in columns.split(',')]
+        if '*' not in parts and 'id' not in parts:
+            columns = f"id, {columns}"
+        filter_key = tuple((operator, column, tuple(value) if isinstance(value, list) else value)
+                           for operator, column, value in filters or [])
+
+        def fetch(last_id):
+            query = self.supabase.table(table).select(columns)
+            if scope is not None:
+                query = query.eq('company_id', scope)
+            for operator, column, value in filters or []:
+                query = getattr(query, operator)(column, value)
+            if last_id is not None:
+                query = query.lt('id', last_id)
+            return query.order('id', desc=True).limit(chunk_size).execute().data
+
+        last_id = after_id
+        while True:
+            key = ('_iter_rows', table, scope, columns, filter_key, last_id, chunk_size)
+            data = self.single_flight.do(key, lambda: fetch(last_id))
+            if not data:
+                return
+            for row in data:
+                yield row
+            last_id = data[-1]['id']
+
+    @fallback(lambda: ([], None), "Error getting policy page")
+    def get_policy_page(self, scope: Optional[int] = None, after_id: Optional[int] = None,
+                        limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return one keyset page of policy rows and the cursor for the next page (or ``None``)"""
+        rows = list(islice(self.iter_policies(scope, chunk_size=limit + 1, after_id=after_id), limit + 1))
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1]['id']
+        return rows, None
+
+    def _policy_scope(self, current_user: str = None) -> Tuple[bool, Optional[int]]:
+        """Return ``(allowed, company_id)`` for iter_policies; admins get ``None``."""
+        if current_user and self.is_user_admin(current_user):
+            return True, None
+        if current_user:
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                return True, user_company_id
+        return False, None
+
+    @fallback(list, "Error getting policies")
     def get_all_policies(self, current_user: str = None) -> List[Tuple]:
         """Get all policies filtered by user's company"""
-        try:
-            if current_user and self.is_user_admin(current_user):
-                # Admin sees all policies
-                result = self.supabase.table('policies').select('*').order('id', desc=True).execute()
-            elif current_user:
-                # Regular users see only their company policies
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    result = self.supabase.table('policies').select('*').eq('company_id', user_company_id).order('id', desc=True).execute()
-                else:
-                    return []
-            else:
-                return []
-            
-            # Convert to tuple format for compatibility
-            policies = []
-            for policy in result.data:
-                policies.append((
-                    policy['id'],
-                    policy['end_date'],
-                    policy['customer_name'],
-                    policy['customer_tc_vkn'],
-                    policy['plate'],
-                    policy['doc_serial'],
-                    policy['note'],
-                    policy['premium'],
-                    policy['product_id'],
-                    policy['salesperson_id'],
-                    policy['policy_number'],
-                    policy['company_id'],
-                    policy['last_notified_on']
-                ))
-            return policies
-        except Exception as e:
-            print(f"Error getting policies: {e}")
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
             return []
 
+        # Convert to tuple format for compatibility
+        policies = []
+        for policy in self.iter_policies(company_id):
+            policies.append((
+                policy['id'],
+                policy['end_date'],
+                policy['customer_name'],
+                policy['customer_tc_vkn'],
+                policy['plate'],
+                policy['doc_serial'],
+                policy['note'],
+                policy['premium'],
+                policy['product_id'],
+                policy['salesperson_id'],
+                policy['policy_number'],
+                policy['company_id'],
+                policy['last_notified_on']
+            ))
+        return policies
+
+    @fallback(list, "Error getting enriched policies")
     def get_all_policies_enriched(self, current_user: str | None = None) -> List[Tuple]:
         """Return policies in UI-expected 17-field tuple format with names."""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return []
+        return self._enriched_policies(company_id)
+
+    def _enriched_policies(self, company_id: Optional[int]) -> List[Tuple]:
+        if self.replica is not None and self.replica.ready:
+            return self.replica.enriched_policies(company_id)
+        return [self._enriched_tuple(policy) for policy in self._iter_enriched_policies(company_id)]
+
+    def _iter_enriched_policies(self, company_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Keyset-paged ``policies_enriched`` RPC: policy rows joined with their names, newest first."""
+        after_id = None
+        while True:
+            rows = self.supabase.rpc('policies_enriched', {
+                'p_company_id': company_id, 'p_after_id': after_id, 'p_limit': POLICY_CHUNK_SIZE
+            }, idempotent=True).execute().data
+            if not rows:
+                return
+            yield from rows
+            after_id = rows[-1]['id']
+
+    def _iter_renewal_window(self, start: Optional[str], before: str,
+                             company_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Keyset-paged ``policies_in_renewal_window`` RPC: ``start <= end_date < before``, by end date."""
+        after_end_date = after_id = None
+        while True:
+            rows = self.supabase.rpc('policies_in_renewal_window', {
+                'p_from': start, 'p_before': before, 'p_company_id': company_id,
+                'p_after_end_date': after_end_date, 'p_after_id': after_id, 'p_limit': POLICY_CHUNK_SIZE
+            }, idempotent=True).execute().data
+            if not rows:
+                return
+            yield from rows
+            after_end_date, after_id = rows[-1]['end_date'], rows[-1]['id']
+
+    @staticmethod
+    def _enriched_tuple(policy: Dict[str, Any]) -> Tuple:
+        return (
+            policy.get('id'),
+            policy.get('end_date'),
+            policy.get('customer_name'),
+            policy.get('customer_tc_vkn'),
+            policy.get('plate'),
+            policy.get('doc_serial'),
+            policy.get('note'),
+            policy.get('premium'),
+            policy.get('product_id'),
+            policy.get('product_name', ''),
+            policy.get('commission_percent', 0),
+            policy.get('last_notified_on'),
+            policy.get('salesperson_id'),
+            policy.get('salesperson_name', ''),
+            policy.get('policy_number'),
+            policy.get('company_id'),
+            policy.get('company_name', '')
+        )
+
+    def add_policy(self, policy_data: Dict[str, Any]) -> bool:
+        """Insert a policy unless it duplicates an existing one (see add_policies)"""
+        return self.add_policies([policy_data])['inserted'] == 1
+
+    def _warm_duplicate_index(self, company_id: Optional[int]) -> None:
+        """Load a company's policy numbers and holdings into the duplicate index on first use."""
+        if self.duplicate_index.is_warm(company_id):
+            return
+        # Şirket başına tek yükleme: aynı anda gelen ilk istekler birbirinin ayırdığı anahtarları silmesin
+        with self.duplicate_index.warm_lock(company_id):
+            if self.duplicate_index.is_warm(company_id):
+                return
+            filters = [('is_', 'company_id', 'null')] if company_id is None else None
+            rows = self.iter_policies(company_id, columns='policy_number, customer_tc_vkn, plate, product_id, end_date',
+                                      filters=filters)
+            self.duplicate_index.load(company_id, rows)
+
+    def _salesperson_lookup(self) -> Dict[Tuple[Optional[int], str], int]:
+        """``{(company_id, name_key(name)): id}`` for resolving salesperson names sent by the API"""
+        def fetch():
+            result = self.supabase.table('salespeople').select('id, name, company_id').execute()
+            return {(row['company_id'], name_key(row['name'])): row['id'] for row in result.data}
+
+        return self.cache.get_or_load('reference', None, 'salespeople_by_company', fetch, REFERENCE_CACHE_TTL)
+
+    @staticmethod
+    def _policy_row(policy: Dict[str, Any], product_ids: Dict[str, int], product_names: Dict[int, str],
+                    salesperson_ids: Dict[Tuple[Optional[int], str], int]) -> Dict[str, Any]:
+        """Validated ``policies`` row from an API payload; raises ``ValueError`` with a user-facing message.
+
+        Only ``POLICY_FIELDS`` are kept (legacy API names are mapped to their
+        columns); ``product`` / ``salesperson`` names are resolved to IDs.
+        """
+        if not isinstance(policy, dict):
+            raise ValueError('Poliçe bir nesne olmalıdır')
+        row = {}
+        for column, aliases in POLICY_FIELDS.items():
+            value = next((policy[k] for k in (column,) + aliases if policy.get(k) not in (None, '')), None)
+            if isinstance(value, str):
+                value = value.strip() or None
+            if value is not None:
+                row[column] = value
+
+        if not isinstance(row.get('customer_name'), str):
+            raise ValueError('Müşteri adı gereklidir')
+        for column in ('customer_tc_vkn', 'plate', 'doc_serial', 'note', 'policy_number'):
+            if column in row and not isinstance(row[column], (str, int)):
+                raise ValueError(f'Geçersiz {column}')
+            if column in row:
+                row[column] = str(row[column])
+        for column in ('company_id', 'product_id', 'salesperson_id'):
+            if column in row and (isinstance(row[column], bool) or not isinstance(row[column], int)):
+                raise ValueError(f'Geçersiz {column}')
+        if 'premium' in row:
+            try:
+                row['premium'] = float(row['premium'])
+            except (TypeError, ValueError):
+                raise ValueError('Geçersiz prim') from None
+            if row['premium'] < 0:
+                raise ValueError('Prim negatif olamaz')
+        for column, parse in (('end_date', date.fromisoformat), ('created_at', datetime.fromisoformat)):
+            if column in row:
+                try:
+                    parse(str(row[column]))
+                except ValueError:
+                    raise ValueError(f'Geçersiz tarih: {column}') from None
+
+        if policy.get('product') and 'product_id' not in row:
+            row['product_id'] = product_ids.get(name_key(str(policy['product'])))
+            if row['product_id'] is None:
+                raise ValueError(f"Bilinmeyen ürün: {policy['product']}")
+        elif 'product_id' in row and row['product_id'] not in product_names:
+            raise ValueError(f"Bilinmeyen ürün: {row['product_id']}")
+        if policy.get('salesperson') and 'salesperson_id' not in row:
+            row['salesperson_id'] = salesperson_ids.get((row.get('company_id'), name_key(str(policy['salesperson']))))
+            if row['salesperson_id'] is None:
+                raise ValueError(f"Bilinmeyen satışçı: {policy['salesperson']}")
+        row.setdefault('created_at', datetime.now().isoformat())
+        return row
+
+    def add_policies(self, policies: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Validate and insert policies, skipping duplicates found in the per-company duplicate index.
+
+        Each payload is reduced to ``POLICY_FIELDS`` (see ``_policy_row``);
+        invalid ones are reported in ``errors`` with their index. A policy
+        whose number, or whose (TC/VKN, plate, product) with the same end
+        date, is already known (in the database or earlier in the batch) is
+        rejected; the same holding with another end date is inserted and
+        flagged. A number inserted meanwhile by another instance is rejected
+        by the database's unique index and reported the same way. Rows are
+        inserted in chunks of ``POLICY_INSERT_CHUNK_SIZE``.
+        Returns ``{'success', 'inserted', 'policy_ids', 'rejected', 'flagged', 'errors'}``.
+        """
+        summary = {'success': False, 'inserted': 0, 'policy_ids': [], 'rejected': [], 'flagged': [], 'errors': []}
+        claimed = []
+        inserted_scopes = set()
         try:
-            # Fetch policies per permissions
-            if current_user and self.is_user_admin(current_user):
-                result = self.supabase.table('policies').select('*').order('id', desc=True).execute()
-            elif current_user:
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    result = self.supabase.table('policies').select('*').eq('company_id', user_company_id).order('id', desc=True).execute()
-                else:
-                    return []
-            else:
-                return []
-
-            enriched: List[Tuple] = []
-            for policy in result.data:
-                # Defaults
-                product_name = ""
-                company_name = ""
-                salesperson_name = ""
-                commission_percent = 0
-
+            with partial_result("Error adding policies",
+                                lambda e: summary['errors'].append({'index': None, 'error': str(e)})):
+                # Ad -> ID sözlükleri parti başına bir kez kurulur
+                product_names = self.get_name_lookup('products')
+                product_ids = {name_key(name): pid for pid, name in product_names.items()}
+                salesperson_ids = self._salesperson_lookup() if any(
+                    isinstance(p, dict) and p.get('salesperson') for p in policies) else {}
+                for index, policy in enumerate(policies):
+                    try:
+                        row = self._policy_row(policy, product_ids, product_names, salesperson_ids)
+                    except ValueError as e:
+                        summary['errors'].append({'index': index, 'error': str(e)})
+                        continue
+                    company_id = row.get('company_id')
+                    self._warm_duplicate_index(company_id)
+                    match = self.duplicate_index.claim(company_id, row)
+                    if match and match['action'] == REJECT:
+                        summary['rejected'].append(dict(match, index=index))
+                        continue
+                    if match:
+                        summary['flagged'].append(dict(match, index=index))
+                    claimed.append((index, row, company_id))
+
+                while claimed:
+                    chunk = claimed[:POLICY_INSERT_CHUNK_SIZE]
+                    self._insert_policy_chunk(chunk, summary, inserted_scopes)
+                    del claimed[:len(chunk)]
+
+                summary['success'] = True
+            return summary
+        finally:
+            # Eklenemeyen satırların ayrılmış anahtarları serbest bırakılır (eklenenler zaten onaylandı)
+            for _, row, company_id in claimed:
+                self.duplicate_index.release(company_id, row)
+            # Diğer örneklerin müşteri dizinleri bir sonraki okumada yeniden yüklenir
+            for scope in inserted_scopes | {None} if inserted_scopes else ():
+                self.cache.invalidate('customers', scope)
+                self.customer_index.set_version(scope, self.cache.version('customers', scope))
+
+    def _insert_policy_chunk(self, chunk: List[Tuple[int, Dict[str, Any], Optional[int]]],
+                             summary: Dict[str, Any], inserted_scopes: set) -> None:
+        """Insert claimed rows, recording each one as soon as it is written.
+
+        When the unique (company, policy number) index rejects the chunk, its
+        rows are retried one by one and the conflicting ones are added to
+        ``summary['rejected']``. Rows written before a later failure stay
+        confirmed in the duplicate index and counted in ``summary``.
+        """
+        try:
+            result = self.supabase.table('policies').insert([row for _, row, _ in chunk]).execute()
+        except QueryFailedError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+            for entry in chunk:
+                index, row, company_id = entry
                 try:
-                    if policy.get('product_id'):
-                        pr = self.supabase.table('products').select('name, commission_percent').eq('id', policy['product_id']).execute()
-                        if pr.data:
-                            product_name = pr.data[0].get('name', '')
-                            commission_percent = pr.data[0].get('commission_percent', 0) or 0
-                    if policy.get('company_id'):
-                        cr = self.supabase.table('companies').select('name').eq('id', policy['company_id']).execute()
-                        if cr.data:
-                            company_name = cr.data[0].get('name', '')
-                    if policy.get('salesperson_id'):
-                        sr = self.supabase.table('salespeople').select('name').eq('id', policy['salesperson_id']).execute()
-                        if sr.data:
-                            salesperson_name = sr.data[0].get('name', '')
-                except Exception:
-                    pass
-
-                enriched.append((
-                    policy.get('id'),
-                    policy.get('end_date'),
-                    policy.get('customer_name'),
-                    policy.get('customer_tc_vkn'),
-                    policy.get('plate'),
-                    policy.get('doc_serial'),
-                    policy.get('note'),
-                    policy.get('premium'),
-                    policy.get('product_id'),
-                    product_name,
-                    commission_percent,
-                    policy.get('last_notified_on'),
-                    policy.get('salesperson_id'),
-                    salesperson_name,
-                    policy.get('policy_number'),
-                    policy.get('company_id'),
-                    company_name
-                ))
-            return enriched
-        except Exception as e:
-            print(f"Error getting enriched policies: {e}")
-            return []
+                    result = self.supabase.table('policies').insert(row).execute()
+                except QueryFailedError as e:
+                    if e.code != UNIQUE_VIOLATION:
+                        raise
+                    self.duplicate_index.release(company_id, row)
+                    summary['rejected'].append({'action': REJECT, 'reason': 'policy_number', 'policy_id': None,
+                                                'index': index})
+                    continue
+                self._record_inserted_policies([(entry, result.data[0])], summary, inserted_scopes)
+            return
+        self._record_inserted_policies(list(zip(chunk, result.data)), summary, inserted_scopes)
+
+    def _record_inserted_policies(self, inserted: List[Tuple[tuple, Dict[str, Any]]], summary: Dict[str, Any],
+                                  inserted_scopes: set) -> None:
+        """Confirm written ``(claimed entry, inserted row)`` pairs in the in-process indexes and the summary."""
+        if self.replica is not None:
+            self.replica.apply_policies([policy for _, policy in inserted])
+        for (index, row, company_id), policy in inserted:
+            self.duplicate_index.confirm(company_id, row, policy.get('id'))
+            self.customer_index.add(company_id, row['customer_name'], row.get('customer_tc_vkn'))
+            self.balance_engine.register_policy(company_id, policy.get('id'),
+                                                row['customer_name'], row.get('customer_tc_vkn'))
+            summary['policy_ids'].append(policy.get('id'))
+            summary['inserted'] += 1
+            inserted_scopes.add(company_id)
 
     # Cross-selling methods
+    @fallback(list, "Error getting customers for cross-selling")
     def get_customers_for_cross_selling(self) -> List[Tuple]:
         """Get customers suitable for cross-selling"""
-        try:
-            result = self.supabase.table('policies').select('customer_name, customer_tc_vkn, product_id').execute()
-            customers = []
-            for policy in result.data:
-                customers.append((
-                    policy['customer_name'],
-                    policy['customer_tc_vkn'],
-                    policy['product_id']
-                ))
-            return customers
-        except Exception as e:
-            print(f"Error getting customers for cross-selling: {e}")
-            return []
-
+        customers = []
+        for policy in self.iter_policies(columns='customer_name, customer_tc_vkn, product_id'):
+            customers.append((
+                policy['customer_name'],
+                policy['customer_tc_vkn'],
+                policy['product_id']
+            ))
+        return customers
+
+    @fallback(list, "Error getting cross-selling data")
     def get_cross_selling_data(self, current_user: str = None) -> List[Tuple]:
         """Get cross-selling opportunities"""
-        try:
-            if current_user and self.is_user_admin(current_user):
-                result = self.supabase.table('cross_selling').select('*').order('created_at', desc=True).execute()
-            elif current_user:
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    result = self.supabase.table('cross_selling').select('*').eq('company_id', user_company_id).order('created_at', desc=True).execute()
-                else:
-                    return []
+        if current_user and self.is_user_admin(current_user):
+            result = self.supabase.table('cross_selling').select('*').order('created_at', desc=True).execute()
+        elif current_user:
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                result = self.supabase.table('cross_selling').select('*').eq('company_id', user_company_id).order('created_at', desc=True).execute()
             else:
                 return []
-            
-            opportunities = []
-            for opp in result.data:
-                opportunities.append((
-                    opp['id'],
-                    opp['customer_name'],
-                    opp['customer_tc_vkn'],
-                    opp['phone'],
-                    opp['email'],
-                    opp['product_interest'],
-                    opp['notes'],
-                    opp['priority'],
-                    opp['status'],
-                    opp['created_at'],
-                    opp['assigned_to'],
-                    opp['company_id']
-                ))
-            return opportunities
-        except Exception as e:
-            print(f"Error getting cross-selling data: {e}")
+        else:
             return []
+        
+        opportunities = []
+        for opp in result.data:
+            opportunities.append((
+                opp['id'],
+                opp['customer_name'],
+                opp['customer_tc_vkn'],
+                opp['phone'],
+                opp['email'],
+                opp['product_interest'],
+                opp['notes'],
+                opp['priority'],
+                opp['status'],
+                opp['created_at'],
+                opp['assigned_to'],
+                opp['company_id']
+            ))
+        return opportunities
 
     def get_cross_selling_opportunities(self, current_user: str = None) -> List[Tuple]:
         """Get cross-selling opportunities (alias for compatibility)"""
         return self.get_cross_selling_data(current_user)
 
+    @fallback(False, "Error adding cross-selling opportunity")
     def add_cross_selling_opportunity(self, customer_name: str, customer_tc_vkn: str, phone: str, 
                                     email: str, product_interest: str, notes: str, priority: str, 
                                     assigned_to: int, company_id: int) -> bool:
         """Add cross-selling opportunity"""
-        try:
-            result = self.supabase.table('cross_selling').insert({
-                'customer_name': customer_name,
-                'customer_tc_vkn': customer_tc_vkn,
-                'phone': phone,
-                'email': email,
-                'product_interest': product_interest,
-                'notes': notes,
-                'priority': priority,
-                'status': 'new',
-                'assigned_to': assigned_to,
-                'company_id': company_id,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding cross-selling opportunity: {e}")
-            return False
-
+        result = self.supabase.table('cross_selling').insert({
+            'customer_name': customer_name,
+            'customer_tc_vkn': customer_tc_vkn,
+            'phone': phone,
+            'email': email,
+            'product_interest': product_interest,
+            'notes': notes,
+            'priority': priority,
+            'status': 'new',
+            'assigned_to': assigned_to,
+            'company_id': company_id,
+            'created_at': datetime.now().isoformat()
+        }).execute()
+        return len(result.data) > 0
+
+    @fallback(False, "Error updating cross-selling status")
     def update_cross_selling_status(self, opportunity_id: int, status: str) -> bool:
         """Update cross-selling opportunity status"""
-        try:
-            result = self.supabase.table('cross_selling').update({
-                'status': status,
-                'updated_at': datetime.now().isoformat()
-            }).eq('id', opportunity_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating cross-selling status: {e}")
-            return False
+        result = self.supabase.table('cross_selling').update({
+            'status': status,
+            'updated_at': datetime.now().isoformat()
+        }).eq('id', opportunity_id).execute()
+        return len(result.data) > 0
 
+    @fallback(list, "Error getting cross-selling reminders")
     def get_cross_selling_reminders(self) -> List[Tuple]:
         """Get cross-selling reminders"""
-        try:
-            result = self.supabase.table('cross_selling_reminders').select('*').order('reminder_date').execute()
-            reminders = []
-            for reminder in result.data:
-                reminders.append((
-                    reminder['id'],
-                    reminder['cross_selling_id'],
-                    reminder['reminder_date'],
-                    reminder['reminder_type'],
-                    reminder['notes'],
-                    reminder['completed'],
-                    reminder['created_at']
-                ))
-            return reminders
-        except Exception as e:
-            print(f"Error getting cross-selling reminders: {e}")
-            return []
-
+        result = self.supabase.table('cross_selling_reminders').select('*').order('reminder_date').execute()
+        reminders = []
+        for reminder in result.data:
+            reminders.append((
+                reminder['id'],
+                reminder['cross_selling_id'],
+                reminder['reminder_date'],
+                reminder['reminder_type'],
+                reminder['notes'],
+                reminder['completed'],
+                reminder['created_at']
+            ))
+        return reminders
+
+    @fallback(False, "Error adding cross-selling reminder")
     def add_cross_selling_reminder(self, cross_selling_id: int, reminder_date: str, 
                                  reminder_type: str, notes: str) -> bool:
         """Add cross-selling reminder"""
-        try:
-            result = self.supabase.table('cross_selling_reminders').insert({
-                'cross_selling_id': cross_selling_id,
-                'reminder_date': reminder_date,
-                'reminder_type': reminder_type,
-                'notes': notes,
-                'completed': False,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding cross-selling reminder: {e}")
+        result = self.supabase.table('cross_selling_reminders').insert({
+            'cross_selling_id': cross_selling_id,
+            'reminder_date': reminder_date,
+            'reminder_type': reminder_type,
+            'notes': notes,
+            'completed': False,
+            'created_at': datetime.now().isoformat()
+        }).execute()
+        if not result.data:
             return False
+        self._schedule_reminder(result.data[0])
+        return True
 
+    @fallback(False, "Error updating reminder status")
     def update_reminder_status(self, reminder_id: int, completed: bool) -> bool:
         """Update reminder completion status"""
-        try:
-            result = self.supabase.table('cross_selling_reminders').update({
-                'completed': completed,
-                'updated_at': datetime.now().isoformat()
-            }).eq('id', reminder_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating reminder status: {e}")
+        result = self.supabase.table('cross_selling_reminders').update({
+            'completed': completed,
+            'updated_at': datetime.now().isoformat()
+        }).eq('id', reminder_id).execute()
+        if not result.data:
             return False
+        if completed:
+            self.reminder_scheduler.complete(reminder_id)
+        else:
+            self._schedule_reminder(result.data[0])
+        return True
+
+    def _schedule_reminder(self, reminder: Dict[str, Any]) -> None:
+        """Queue a written reminder in warm schedulers (looks up its opportunity once)."""
+        if not self.reminder_scheduler.has_warm_scopes():
+            return
+        opportunity = self.supabase.table('cross_selling').select('company_id, assigned_to').eq('id', reminder['cross_selling_id']).execute()
+        if not opportunity.data:
+            return
+        self.reminder_scheduler.add(opportunity.data[0]['company_id'],
+                                    dict(reminder, assigned_to=opportunity.data[0]['assigned_to']))
+
+    def _warm_reminders(self, company_id: Optional[int]) -> None:
+        """Load a company's open reminders into the scheduler on first use."""
+        if self.reminder_scheduler.is_warm(company_id):
+            return
+        filters = [('eq', 'completed', False)]
+        if company_id is not None:
+            filters.append(('eq', 'cross_selling.company_id', company_id))
+        rows = self._iter_rows('cross_selling_reminders', columns='*, cross_selling!inner(company_id, assigned_to)',
+                               filters=filters)
+        self.reminder_scheduler.load(company_id, (
+            dict(row, assigned_to=(row.get('cross_selling') or {}).get('assigned_to')) for row in rows
+        ))
+
+    @fallback(list, "Error getting next due reminders")
+    def get_next_due_reminders(self, current_user: str, assigned_to: Optional[int] = None,
+                               limit: int = 10) -> List[Tuple]:
+        """Get the next open reminders by date for the caller's company (optionally one assignee)"""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return []
+        self._warm_reminders(company_id)
+        due = self.reminder_scheduler.next_due(
+            company_id, ALL_ASSIGNEES if assigned_to is None else assigned_to, limit)
+        return [(
+            reminder['id'],
+            reminder['cross_selling_id'],
+            reminder['reminder_date'],
+            reminder['reminder_type'],
+            reminder['notes'],
+            reminder['completed'],
+            reminder['created_at']
+        ) for reminder in due]
 
     # Salespeople methods
+    @fallback(list, "Error getting salespeople")
     def get_all_salespeople(self, current_user: str = None) -> List[Tuple]:
         """Get all salespeople filtered by company"""
-        try:
-            if current_user and self.is_user_admin(current_user):
-                result = self.supabase.table('salespeople').select('*').order('name').execute()
-            elif current_user:
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    result = self.supabase.table('salespeople').select('*').eq('company_id', user_company_id).order('name').execute()
-                else:
-                    return []
+        if current_user and self.is_user_admin(current_user):
+            result = self.supabase.table('salespeople').select('*').order('name').execute()
+        elif current_user:
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                result = self.supabase.table('salespeople').select('*').eq('company_id', user_company_id).order('name').execute()
             else:
                 return []
-            
-            salespeople = []
-            for person in result.data:
-                salespeople.append((
-                    person['id'],
-                    person['name'],
-                    person['active'],
-                    person['created_at'],
-                    person['company_id']
-                ))
-            return salespeople
-        except Exception as e:
-            print(f"Error getting salespeople: {e}")
+        else:
             return []
-
+        
+        salespeople = []
+        for person in result.data:
+            salespeople.append((
+                person['id'],
+                person['name'],
+                person['active'],
+                person['created_at'],
+                person['company_id']
+            ))
+        return salespeople
+
+    @fallback(False, "Error adding salesperson")
     def add_salesperson(self, name: str, company_id: int = None) -> bool:
         """Add a new salesperson"""
-        try:
-            result = self.supabase.table('salespeople').insert({
-                'name': name,
-                'active': True,
-                'company_id': company_id,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding salesperson: {e}")
-            return False
-
+        result = self.supabase.table('salespeople').insert({
+            'name': name,
+            'active': True,
+            'company_id': company_id,
+            'created_at': datetime.now().isoformat()
+        }).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
+
+    @fallback(list, "Error getting salespeople from users")
     def get_salespeople_from_users(self, current_user: str = None) -> List[Tuple]:
         """Get users with salesperson role as salespeople"""
-        try:
-            # Satışçı rolü olan kullanıcıları bul (policies_add yetkisi olanlar)
-            if current_user and self.is_user_admin(current_user):
-                # Admin tüm satışçıları görebilir
-                users_result = self.supabase.table('users').select('id, username, company_id').execute()
-            elif current_user:
-                # Normal kullanıcı sadece kendi şirketindeki satışçıları görebilir
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    users_result = self.supabase.table('users').select('id, username, company_id').eq('company_id', user_company_id).execute()
-                else:
-                    return []
+        # Satışçı rolü olan kullanıcıları bul (policies_add yetkisi olanlar)
+        if current_user and self.is_user_admin(current_user):
+            # Admin tüm satışçıları görebilir
+            users_result = self.supabase.table('users').select('id, username, company_id').execute()
+        elif current_user:
+            # Normal kullanıcı sadece kendi şirketindeki satışçıları görebilir
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                users_result = self.supabase.table('users').select('id, username, company_id').eq('company_id', user_company_id).execute()
             else:
                 return []
-            
-            salespeople = []
-            for user in users_result.data:
-                # Bu kullanıcının policies_add yetkisi var mı kontrol et
-                if self.check_permission(user['username'], 'policies_add'):
-                    salespeople.append((
-                        user['id'],
-                        user['username'],
-                        True,  # active
-                        None,  # created_at
-                        user['company_id']
-                    ))
-            
-            return salespeople
-        except Exception as e:
-            print(f"Error getting salespeople from users: {e}")
+        else:
             return []
+        
+        salespeople = []
+        for user in users_result.data:
+            # Bu kullanıcının policies_add yetkisi var mı kontrol et
+            if self.check_permission(user['username'], 'policies_add'):
+                salespeople.append((
+                    user['id'],
+                    user['username'],
+                    True,  # active
+                    None,  # created_at
+                    user['company_id']
+                ))
+        
+        return salespeople
 
+    @fallback(list, "Error getting combined salespeople")
     def get_all_salespeople_combined(self, current_user: str = None) -> List[Tuple]:
         """Get salespeople from both users table and salespeople table"""
-        try:
-            all_salespeople = []
-            
-            # 1. Kullanıcı tablosundan satışçıları al (policies_add yetkisi olanlar)
-            user_salespeople = self.get_salespeople_from_users(current_user)
-            all_salespeople.extend(user_salespeople)
-            
-            # 2. Salespeople tablosundan da satışçıları al
-            if current_user and self.is_user_admin(current_user):
-                # Admin tüm satışçıları görebilir
-                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).execute()
-            elif current_user:
-                # Normal kullanıcı sadece kendi şirketindeki satışçıları görebilir
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', user_company_id).execute()
-                else:
-                    salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).is_('company_id', 'null').execute()
+        all_salespeople = []
+        
+        # 1. Kullanıcı tablosundan satışçıları al (policies_add yetkisi olanlar)
+        user_salespeople = self.get_salespeople_from_users(current_user)
+        all_salespeople.extend(user_salespeople)
+        
+        # 2. Salespeople tablosundan da satışçıları al
+        if current_user and self.is_user_admin(current_user):
+            # Admin tüm satışçıları görebilir
+            salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).execute()
+        elif current_user:
+            # Normal kullanıcı sadece kendi şirketindeki satışçıları görebilir
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', user_company_id).execute()
             else:
-                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).execute()
-            
-            # Salespeople tablosundan gelen verileri ekle
-            for sp in salespeople_result.data:
-                # ID çakışmasını önlemek için salespeople tablosundan gelenlere 10000 ekle
-                salespeople_id = sp['id'] + 10000
-                all_salespeople.append((
-                    salespeople_id,
-                    sp['name'],
-                    sp.get('active', True),
-                    sp.get('created_at'),
-                    sp.get('company_id')
-                ))
-            
-            # Aynı isimli satışçıları filtrele (kullanıcı tablosundaki öncelikli)
-            seen_names = set()
-            unique_salespeople = []
-            for sp in all_salespeople:
-                name = sp[1]
-                if name not in seen_names:
-                    seen_names.add(name)
-                    unique_salespeople.append(sp)
-            
-            return unique_salespeople
-            
-        except Exception as e:
-            print(f"Error getting combined salespeople: {e}")
-            return []
+                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).is_('company_id', 'null').execute()
+        else:
+            salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).execute()
+        
+        # Salespeople tablosundan gelen verileri ekle
+        for sp in salespeople_result.data:
+            # ID çakışmasını önlemek için salespeople tablosundan gelenlere 10000 ekle
+            salespeople_id = sp['id'] + 10000
+            all_salespeople.append((
+                salespeople_id,
+                sp['name'],
+                sp.get('active', True),
+                sp.get('created_at'),
+                sp.get('company_id')
+            ))
+        
+        # Aynı isimli satışçıları filtrele (kullanıcı tablosundaki öncelikli)
+        seen_names = set()
+        unique_salespeople = []
+        for sp in all_salespeople:
+            name = sp[1]
+            if name not in seen_names:
+                seen_names.add(name)
+                unique_salespeople.append(sp)
+        
+        return unique_salespeople
+        
 
+    @fallback(list, "Error getting salespeople from table")
     def get_salespeople_only_from_table(self, current_user: str = None) -> List[Tuple]:
         """Get salespeople only from salespeople table (cleaner approach)"""
-        try:
-            # Sadece salespeople tablosundan satışçıları al
-            if current_user and self.is_user_admin(current_user):
-                # Admin tüm aktif satışçıları görebilir
-                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).order('name').execute()
-            elif current_user:
-                # Normal kullanıcı: company_id biliniyorsa sadece o şirketin satışçılarını göster
-                user_company_id = self.get_user_company_id(current_user)
-                if user_company_id:
-                    salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', user_company_id).order('name').execute()
-                else:
-                    # company_id yoksa hiç satışçı gösterme (güvenlik)
-                    salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', -999).order('name').execute()
+        # Sadece salespeople tablosundan satışçıları al
+        if current_user and self.is_user_admin(current_user):
+            # Admin tüm aktif satışçıları görebilir
+            salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).order('name').execute()
+        elif current_user:
+            # Normal kullanıcı: company_id biliniyorsa sadece o şirketin satışçılarını göster
+            user_company_id = self.get_user_company_id(current_user)
+            if user_company_id:
+                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', user_company_id).order('name').execute()
             else:
-                # Oturum yoksa tüm aktifleri göster (güvenli taraf)
-                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).order('name').execute()
-            
-            # Salespeople tablosundan gelen verileri formatla
-            salespeople = []
-            for sp in salespeople_result.data:
-                salespeople.append((
-                    sp['id'],
-                    sp['name'],
-                    sp.get('active', True),
-                    sp.get('created_at'),
-                    sp.get('company_id')
-                ))
-            
-            return salespeople
-            
-        except Exception as e:
-            print(f"Error getting salespeople from table: {e}")
-            return []
+                # company_id yoksa hiç satışçı gösterme (güvenlik)
+                salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).eq('company_id', -999).order('name').execute()
+        else:
+            # Oturum yoksa tüm aktifleri göster (güvenli taraf)
+            salespeople_result = self.supabase.table('salespeople').select('*').eq('active', True).order('name').execute()
+        
+        # Salespeople tablosundan gelen verileri formatla
+        salespeople = []
+        for sp in salespeople_result.data:
+            salespeople.append((
+                sp['id'],
+                sp['name'],
+                sp.get('active', True),
+                sp.get('created_at'),
+                sp.get('company_id')
+            ))
+        
+        return salespeople
+        
 
     # Insurance companies methods
+    @fallback(list, "Error getting insurance companies")
     def get_all_insurance_companies(self) -> List[Tuple]:
         """Get all insurance companies"""
-        try:
-            result = self.supabase.table('insurance_companies').select('*').order('name').execute()
-            companies = []
-            for company in result.data:
-                companies.append((
-                    company['id'],
-                    company['name'],
-                    company['active'],
-                    company['created_at']
-                ))
-            return companies
-        except Exception as e:
-            print(f"Error getting insurance companies: {e}")
-            return []
+        result = self.supabase.table('insurance_companies').select('*').order('name').execute()
+        companies = []
+        for company in result.data:
+            companies.append((
+                company['id'],
+                company['name'],
+                company['active'],
+                company['created_at']
+            ))
+        return companies
 
     # Customer methods for reports
-    def get_all_customers(self) -> List[Tuple]:
-        """Get all unique customers from policies"""
-        try:
-            result = self.supabase.table('policies').select('customer_name, customer_tc_vkn').execute()
-            # Remove duplicates
-            customers_set = set()
-            for policy in result.data:
-                customers_set.add((policy['customer_name'], policy['customer_tc_vkn']))
-            return list(customers_set)
-        except Exception as e:
-            print(f"Error getting customers: {e}")
-            return []
+    def _warm_customer_index(self, company_id: Optional[int]) -> None:
+        """Load a company's customers into the index on first use, and again once stale."""
+        version = self.cache.version('customers', company_id)
+        if self.customer_index.is_warm(company_id, version, CUSTOMER_INDEX_TTL):
+            return
+        rows = ((p['customer_name'], p['customer_tc_vkn'])
+                for p in self.iter_policies(company_id, columns='customer_name, customer_tc_vkn'))
+        self.customer_index.load(company_id, rows, version)
+
+    @fallback(list, "Error getting customers")
+    def get_all_customers(self, current_user: str = None) -> List[Tuple]:
+        """Get all unique customers from policies (company-scoped when a user is given)"""
+        if current_user:
+            allowed, company_id = self._policy_scope(current_user)
+            if not allowed:
+                return []
+        else:
+            company_id = None
+        if self.replica is not None and self.replica.ready:
+            return self.replica.customers(company_id)
+        self._warm_customer_index(company_id)
+        customers, _ = self.customer_index.page(company_id, limit=None)
+        return customers
+
+    @fallback(lambda: ([], 0), "Error searching customers")
+    def search_customers(self, current_user: str, prefix: str = '', offset: int = 0,
+                         limit: int = 50) -> Tuple[List[Tuple], int]:
+        """Paginated, prefix-searchable customer listing from the customer index"""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return [], 0
+        self._warm_customer_index(company_id)
+        return self.customer_index.page(company_id, prefix, offset, limit)
+
+    def get_customer_overview(self, customer_tc_vkn: str, company_id: Optional[int] = None) -> Dict[str, Any]:
+        """Policies, ledger, cross-selling opportunities and reminders of one customer.
+
+        The four lookups are filtered by TC/VKN on the server and run
+        concurrently; ``company_id`` of ``None`` covers every company.
+        """
+        def scoped(builder, column='company_id'):
+            return builder if company_id is None else builder.eq(column, company_id)
+
+        def fetch_policies():
+            return scoped(self.supabase.table('policies').select('*')
+                          .eq('customer_tc_vkn', customer_tc_vkn)).order('end_date').execute().data
+
+        def fetch_transactions():
+            # Muhasebe kayıtları poliçe üzerinden müşteriye bağlanır (inner join ile sunucuda süzülür)
+            return scoped(self.supabase.table('accounts')
+                          .select('id, policy_id, transaction_type, amount, description, transaction_date, '
+                                  'policies!inner(customer_tc_vkn)')
+                          .eq('policies.customer_tc_vkn', customer_tc_vkn)
+                          ).order('transaction_date', desc=True).execute().data
+
+        def fetch_opportunities():
+            return scoped(self.supabase.table('cross_selling').select('*')
+                          .eq('customer_tc_vkn', customer_tc_vkn)).order('created_at', desc=True).execute().data
+
+        def fetch_reminders():
+            return scoped(self.supabase.table('cross_selling_reminders')
+                          .select('*, cross_selling!inner(customer_tc_vkn, company_id)')
+                          .eq('cross_selling.customer_tc_vkn', customer_tc_vkn),
+                          'cross_selling.company_id').order('reminder_date').execute().data
+
+        policies, transactions, opportunities, reminders = gather(
+            fetch_policies, fetch_transactions, fetch_opportunities, fetch_reminders)
+        for row in transactions:
+            row.pop('policies', None)
+        for row in reminders:
+            row.pop('cross_selling', None)
+        return {
+            'policies': policies,
+            'transactions': transactions,
+            'balance': round(sum(signed_amount(t['transaction_type'], t['amount']) for t in transactions), 2),
+            'cross_selling': opportunities,
+            'reminders': reminders,
+        }
 
     def get_salespeople(self, current_user: str = None) -> List[Tuple]:
         """Get salespeople (alias for compatibility)"""
@@ -873,400 +1245,676 @@ class SupabaseRepository:
         return self.get_all_policies(current_user)
 
     # Policy renewal methods
+    @fallback(list, "Error getting policies due within days")
     def due_within_days(self, days: int) -> List[Tuple]:
         """Get policies due for renewal within specified days"""
-        try:
-            from datetime import datetime, timedelta
-            today = datetime.now().date()
-            end_date = (datetime.now() + timedelta(days=days)).date()
-            
-            result = self.supabase.table('policies').select('*').gte('end_date', today.isoformat()).lte('end_date', end_date.isoformat()).order('end_date').execute()
-            
-            policies = []
-            for policy in result.data:
-                # Get product and company names
-                product_name = ""
-                company_name = ""
-                salesperson_name = ""
-                
-                try:
-                    # Get product name
-                    if policy['product_id']:
-                        product_result = self.supabase.table('products').select('name').eq('id', policy['product_id']).execute()
-                        if product_result.data:
-                            product_name = product_result.data[0]['name']
-                    
-                    # Get company name
-                    if policy['company_id']:
-                        company_result = self.supabase.table('companies').select('name').eq('id', policy['company_id']).execute()
-                        if company_result.data:
-                            company_name = company_result.data[0]['name']
-                    
-                    # Get salesperson name
-                    if policy['salesperson_id']:
-                        salesperson_result = self.supabase.table('salespeople').select('name').eq('id', policy['salesperson_id']).execute()
-                        if salesperson_result.data:
-                            salesperson_name = salesperson_result.data[0]['name']
-                except:
-                    pass
-                
-                policies.append((
-                    policy['id'],
-                    policy['end_date'],
-                    policy['customer_name'],
-                    policy['customer_tc_vkn'],
-                    policy['plate'],
-                    policy['doc_serial'],
-                    policy['note'],
-                    policy['premium'],
-                    policy['product_id'],
-                    product_name,
-                    policy.get('commission_percent', 0),
-                    policy['last_notified_on'],
-                    policy['salesperson_id'],
-                    salesperson_name,
-                    policy['policy_number'],
-                    policy['company_id'],
-                    company_name
-                ))
-            return policies
-        except Exception as e:
-            print(f"Error getting policies due within {days} days: {e}")
-            return []
-
+        today = date.today()
+        before = (today + timedelta(days=days + 1)).isoformat()
+        if self.replica is not None and self.replica.ready:
+            return self.replica.renewal_window(today.isoformat(), before)
+        return [self._enriched_tuple(policy) for policy in self._iter_renewal_window(today.isoformat(), before)]
+
+    @fallback(list, "Error getting unnotified due policies")
+    def get_due_unnotified_policies(self, days: int, renotify_after_days: int = 30) -> List[Dict[str, Any]]:
+        """Policies ending within ``days`` that have not been notified in the last ``renotify_after_days``"""
+        today = date.today()
+        cutoff = (today - timedelta(days=renotify_after_days)).isoformat()
+        window = [('gte', 'end_date', today.isoformat()),
+                  ('lte', 'end_date', (today + timedelta(days=days)).isoformat())]
+        columns = ('customer_name, customer_tc_vkn, plate, policy_number, premium, end_date, '
+                   'product_id, salesperson_id, company_id, last_notified_on')
+        # Hiç bildirilmemiş ve son bildirimi eşikten eski olanlar: iki ayrık filtre, sunucu tarafında
+        policies = list(self.iter_policies(columns=columns, filters=window + [('is_', 'last_notified_on', 'null')]))
+        policies.extend(self.iter_policies(columns=columns, filters=window + [('lt', 'last_notified_on', cutoff)]))
+        return policies
+
+    @fallback(dict, "Error getting reminder addresses")
+    def get_reminder_addresses(self) -> Dict[Tuple[Optional[int], Optional[int]], List[str]]:
+        """Reminder e-mail addresses: ``(company_id, salesperson_id)`` -> the salesperson's address,
+        ``(company_id, None)`` -> the addresses of the company's users"""
+        addresses: Dict[Tuple[Optional[int], Optional[int]], List[str]] = {}
+        for row in self.supabase.table('salespeople').select('id, company_id, email').execute().data:
+            if row.get('email'):
+                addresses[(row['company_id'], row['id'])] = [row['email']]
+        for row in self.supabase.table('users').select('company_id, email').execute().data:
+            if row.get('email') and row.get('company_id') is not None:
+                addresses.setdefault((row['company_id'], None), []).append(row['email'])
+        return addresses
+
+    def mark_policies_notified(self, policy_ids: List[int], notified_on: Optional[str] = None) -> int:
+        """Stamp last_notified_on for many policies with one update per ID chunk"""
+        notified_on = notified_on or date.today().isoformat()
+        updated = 0
+        with partial_result("Error marking policies notified"):
+            for start in range(0, len(policy_ids), ID_FILTER_CHUNK_SIZE):
+                chunk = policy_ids[start:start + ID_FILTER_CHUNK_SIZE]
+                result = self.supabase.table('policies').update({'last_notified_on': notified_on}).in_('id', chunk).execute()
+                updated += len(result.data)
+        return updated
+
+    @fallback(dict, "Error getting reference names")
+    def get_name_lookup(self, table: str) -> Dict[int, str]:
+        """Return ``{id: name}`` for a small reference table in one query"""
+        def fetch():
+            result = self.supabase.table(table).select('id, name').execute()
+            return {row['id']: row['name'] for row in result.data}
+
+        return self.cache.get_or_load('reference', None, f'names:{table}', fetch, REFERENCE_CACHE_TTL)
+
+    @fallback(None)
     def get_renewal_status(self, policy_id: int) -> Optional[str]:
         """Get renewal status for a policy"""
-        try:
-            result = self.supabase.table('renewal_status').select('status').eq('policy_id', policy_id).execute()
-            return result.data[0]['status'] if result.data else None
-        except Exception:
-            return None
+        result = self.supabase.table('renewal_status').select('status').eq('policy_id', policy_id).execute()
+        return result.data[0]['status'] if result.data else None
+
+    def get_renewal_statuses(self, policy_ids: List[int]) -> Dict[int, str]:
+        """Get renewal statuses for many policies with one in_() query per ID chunk"""
+        statuses = {}
+        with partial_result("Error getting renewal statuses"):
+            policy_ids = list(dict.fromkeys(policy_ids))
+            for start in range(0, len(policy_ids), ID_FILTER_CHUNK_SIZE):
+                chunk = policy_ids[start:start + ID_FILTER_CHUNK_SIZE]
+                result = self.supabase.table('renewal_status').select('policy_id, status').in_('policy_id', chunk).execute()
+                for row in result.data:
+                    statuses[row['policy_id']] = row['status']
+        return statuses
 
     def update_renewal_status(self, policy_id: int, status: str) -> bool:
         """Update renewal status for a policy"""
-        try:
-            # Try to update existing status
-            existing = self.supabase.table('renewal_status').select('policy_id').eq('policy_id', policy_id).execute()
-            
-            if existing.data:
-                result = self.supabase.table('renewal_status').update({
-                    'status': status,
-                    'updated_at': datetime.now().isoformat()
-                }).eq('policy_id', policy_id).execute()
-            else:
-                result = self.supabase.table('renewal_status').insert({
-                    'policy_id': policy_id,
-                    'status': status,
-                    'updated_at': datetime.now().isoformat()
-                }).execute()
-            
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating renewal status: {e}")
-            return False
+        return self.update_renewal_statuses({policy_id: status}) == 1
+
+    @fallback(0, "Error updating renewal statuses")
+    def update_renewal_statuses(self, statuses: Dict[int, str]) -> int:
+        """Upsert renewal statuses on policy_id in a single request; returns rows written"""
+        if not statuses:
+            return 0
+        now = datetime.now().isoformat()
+        result = self.supabase.table('renewal_status').upsert([
+            {'policy_id': policy_id, 'status': status, 'updated_at': now}
+            for policy_id, status in statuses.items()
+        ], on_conflict='policy_id').execute()
+        return len(result.data)
+
+    def filter_policy_ids(self, policy_ids: List[int], company_id: Optional[int] = None) -> List[int]:
+        """Return the given policy IDs that exist (within ``company_id`` unless it is ``None``)"""
+        found = []
+        with partial_result("Error filtering policy IDs"):
+            policy_ids = list(dict.fromkeys(policy_ids))
+            for start in range(0, len(policy_ids), ID_FILTER_CHUNK_SIZE):
+                query = self.supabase.table('policies').select('id').in_('id', policy_ids[start:start + ID_FILTER_CHUNK_SIZE])
+                if company_id is not None:
+                    query = query.eq('company_id', company_id)
+                found.extend(row['id'] for row in query.execute().data)
+        return found
+
+    # Renewal analytics storage
+    @fallback(set, "Error getting stored cohort months")
+    def get_stored_cohort_months(self, months: List[str]) -> set:
+        """Return which of the given 'YYYY-MM' cohort months were already computed (including empty ones)"""
+        result = self.supabase.table('renewal_cohort_months').select('cohort_month').in_('cohort_month', months).execute()
+        return {row['cohort_month'] for row in result.data}
+
+    @fallback(0, "Error saving renewal cohorts")
+    def save_renewal_cohorts(self, cohort_month: str, rows: List[Dict[str, Any]], computed_at: str) -> int:
+        """Replace a cohort month's stored funnel rows computed at ``computed_at``
+
+        Rows are upserted on the primary key before rows left over from older
+        runs are deleted, so readers never see the month empty.
+        """
+        saved = 0
+        for start in range(0, len(rows), COHORT_CHUNK_SIZE):
+            result = self.supabase.table('renewal_cohorts').upsert(
+                rows[start:start + COHORT_CHUNK_SIZE],
+                on_conflict='cohort_month,dimension,company_id,dimension_id').execute()
+            saved += len(result.data)
+        # Bu hesapta çıkmayan (artık poliçesi olmayan) kırılımlar
+        (self.supabase.table('renewal_cohorts').delete()
+         .eq('cohort_month', cohort_month).lt('computed_at', computed_at).execute())
+        self.supabase.table('renewal_cohort_months').upsert(
+            {'cohort_month': cohort_month, 'computed_at': computed_at}, on_conflict='cohort_month').execute()
+        return saved
+
+    @fallback(list, "Error getting renewal cohorts")
+    def get_renewal_cohorts(self, months: List[str], dimension: str = 'all',
+                            company_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get stored funnel rows for cohort months (all companies when ``company_id`` is None)"""
+        query = self.supabase.table('renewal_cohorts').select('*').in_('cohort_month', months).eq('dimension', dimension)
+        if company_id is not None:
+            query = query.eq('company_id', company_id)
+        return query.execute().data
+
+    @fallback(0, "Error saving product recommendations")
+    def save_product_recommendations(self, rows: List[Dict[str, Any]], computed_at: str) -> int:
+        """Replace the stored cross-selling rules with ``rows`` computed at ``computed_at``
+
+        Rules are upserted on (product_id, suggested_product_id) before the
+        ones left over from older runs are deleted, so readers never see the
+        table empty.
+        """
+        saved = 0
+        for start in range(0, len(rows), RECOMMENDATION_CHUNK_SIZE):
+            result = self.supabase.table('product_recommendations').upsert(
+                rows[start:start + RECOMMENDATION_CHUNK_SIZE], on_conflict='product_id,suggested_product_id').execute()
+            saved += len(result.data)
+        # Bu hesapta çıkmayan (artık eşiği geçmeyen) kurallar
+        self.supabase.table('product_recommendations').delete().lt('computed_at', computed_at).execute()
+        self.cache.invalidate('recommendations')
+        return saved
+
+    @fallback(None, "Error getting cross-sell state")
+    def get_cross_sell_state(self) -> Optional[Dict[str, Any]]:
+        """Persisted co-occurrence counts of the recommender, or ``None`` before the first full build"""
+        result = self.supabase.table('cross_sell_state').select('*').eq('id', 1).execute()
+        return result.data[0] if result.data else None
+
+    def save_cross_sell_state(self, state: Dict[str, Any]) -> None:
+        self.supabase.table('cross_sell_state').upsert({'id': 1, **state}, on_conflict='id').execute()
+
+    def get_customer_products(self, customers: Iterable[str], max_policy_id: int) -> Dict[str, set]:
+        """Product IDs held by each customer key (``customer_key``) in policies up to ``max_policy_id``
+
+        Not wrapped in ``fallback``: an empty answer on failure would count
+        the customers' existing products as new.
+        """
+        customers = set(customers)
+        tc_vkns = sorted(c for c in customers if not c.startswith('ad:'))
+        names = sorted(c[3:] for c in customers if c.startswith('ad:'))
+        lookups = [('customer_tc_vkn', tc_vkns[i:i + ID_FILTER_CHUNK_SIZE])
+                   for i in range(0, len(tc_vkns), ID_FILTER_CHUNK_SIZE)]
+        lookups += [('customer_name', names[i:i + NAME_FILTER_CHUNK_SIZE])
+                    for i in range(0, len(names), NAME_FILTER_CHUNK_SIZE)]
+
+        held: Dict[str, set] = {}
+        for column, values in lookups:
+            for policy in self.iter_policies(columns='customer_name, customer_tc_vkn, product_id',
+                                             filters=[('in_', column, values), ('lte', 'id', max_policy_id)]):
+                key = customer_key(policy.get('customer_name'), policy.get('customer_tc_vkn'))
+                if key in customers and policy.get('product_id'):
+                    held.setdefault(key, set()).add(policy['product_id'])
+        return held
+
+    @fallback(dict, "Error getting product recommendations")
+    def get_product_recommendations(self) -> Dict[int, List[Dict[str, Any]]]:
+        """Stored cross-selling rules grouped by product, best suggestion first"""
+        def fetch():
+            result = self.supabase.table('product_recommendations').select('*').execute()
+            return rules_by_product(result.data)
+
+        return self.cache.get_or_load('recommendations', None, 'rules', fetch, REFERENCE_CACHE_TTL)
 
     # Customer debt methods
+    @fallback(list, "Error getting customer debts")
     def get_customer_debts(self) -> List[Tuple]:
         """Get customer debt information from accounts"""
-        try:
-            result = self.supabase.table('accounts').select('*').order('transaction_date', desc=True).execute()
-            debts = []
-            for account in result.data:
-                debts.append((
-                    account['id'],
-                    account['policy_id'],
-                    account['transaction_type'],
-                    account['amount'],
-                    account['description'],
-                    account['transaction_date'],
-                    account['company_id']
-                ))
-            return debts
-        except Exception as e:
-            print(f"Error getting customer debts: {e}")
-            return []
-
+        result = self.supabase.table('accounts').select('*').order('transaction_date', desc=True).execute()
+        debts = []
+        for account in result.data:
+            debts.append((
+                account['id'],
+                account['policy_id'],
+                account['transaction_type'],
+                account['amount'],
+                account['description'],
+                account['transaction_date'],
+                account['company_id']
+            ))
+        return debts
+
+    @fallback(False, "Error adding account transaction")
     def add_account_transaction(self, policy_id: int, transaction_type: str, amount: float, 
                               description: str, transaction_date: str, company_id: int) -> bool:
         """Add account transaction"""
+        result = self.supabase.table('accounts').insert({
+            'policy_id': policy_id,
+            'transaction_type': transaction_type,
+            'amount': amount,
+            'description': description,
+            'transaction_date': transaction_date,
+            'company_id': company_id,
+            'created_at': datetime.now().isoformat()
+        }).execute()
+        if not result.data:
+            return False
+        self._post_to_balances(company_id, policy_id, transaction_type, amount)
+        return True
+
+    def add_account_transactions(self, transactions: List[Dict[str, Any]], company_id: Optional[int] = None,
+                                 idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Post a batch of account transactions.
+
+        Every ``policy_id`` is validated in a single lookup (restricted to
+        ``company_id`` unless it is ``None``), every amount must be a finite
+        number and every type a known one; if any row is invalid nothing is
+        posted. Warm balance books are updated only once the batch is written. Rows are inserted in chunks of ``ACCOUNT_BATCH_CHUNK_SIZE``.
+        An ``idempotency_key`` (unique per ``company_id``) is reserved in
+        ``account_batches`` before anything is posted, so concurrent retries
+        cannot both post; the reservation is dropped if posting fails. A key
+        already posted returns ``duplicate`` without posting again; one still
+        being posted by another request returns ``duplicate`` with an error.
+        Returns ``{'success', 'posted', 'duplicate', 'errors'}``.
+        """
+        summary = {'success': False, 'posted': 0, 'duplicate': False, 'errors': []}
+        reserved = False
+        batch_scope = company_id if company_id is not None else 0
+        posted_ids = []
         try:
-            result = self.supabase.table('accounts').insert({
-                'policy_id': policy_id,
-                'transaction_type': transaction_type,
-                'amount': amount,
-                'description': description,
-                'transaction_date': transaction_date,
-                'company_id': company_id,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return len(result.data) > 0
+            with partial_result("Error adding account transactions batch",
+                                lambda e: summary['errors'].append({'index': None, 'error': str(e)})):
+                # Tüm poliçe ID'lerini tek sorguda doğrula
+                policy_ids = list({tx.get('policy_id') for tx in transactions if tx.get('policy_id') is not None})
+                policies = {}
+                if policy_ids:
+                    query = self.supabase.table('policies').select('id, company_id, customer_name, customer_tc_vkn').in_('id', policy_ids)
+                    if company_id is not None:
+                        query = query.eq('company_id', company_id)
+                    policies = {p['id']: p for p in query.execute().data}
+
+                now = datetime.now().isoformat()
+                rows = []
+                for index, tx in enumerate(transactions):
+                    policy = policies.get(tx.get('policy_id'))
+                    if policy is None:
+                        summary['errors'].append({'index': index, 'error': f"Unknown policy_id: {tx.get('policy_id')}"})
+                        continue
+                    if not tx.get('transaction_type') or tx.get('amount') in (None, ''):
+                        summary['errors'].append({'index': index, 'error': 'transaction_type and amount are required'})
+                        continue
+                    if not isinstance(tx['transaction_type'], str) or not is_known_transaction_type(tx['transaction_type']):
+                        summary['errors'].append({'index': index, 'error': f"Unknown transaction_type: {tx['transaction_type']}"})
+                        continue
+                    amount = self._parse_amount(tx['amount'])
+                    if amount is None:
+                        summary['errors'].append({'index': index, 'error': f"Invalid amount: {tx['amount']}"})
+                        continue
+                    rows.append({
+                        'policy_id': policy['id'],
+                        'transaction_type': tx['transaction_type'],
+                        'amount': amount,
+                        'description': tx.get('description'),
+                        'transaction_date': tx.get('transaction_date') or date.today().isoformat(),
+                        'company_id': policy['company_id'],
+                        'created_at': now
+                    })
+                if summary['errors'] or not rows:
+                    return summary
+
+                if idempotency_key:
+                    # Anahtar kayıtlardan önce ayrılır; çakışma aynı partinin tekrar gönderildiğini gösterir
+                    reservation = self.supabase.table('account_batches').upsert({
+                        'company_id': batch_scope,
+                        'idempotency_key': idempotency_key,
+                        'transaction_count': len(rows),
+                        'completed': False,
+                        'created_at': now
+                    }, on_conflict='company_id,idempotency_key', ignore_duplicates=True).execute()
+                    if not reservation.data:
+                        existing = (self.supabase.table('account_batches').select('transaction_count, completed')
+                                    .eq('company_id', batch_scope).eq('idempotency_key', idempotency_key).execute())
+                        summary['duplicate'] = True
+                        if existing.data and existing.data[0]['completed']:
+                            summary.update(success=True, posted=existing.data[0]['transaction_count'])
+                        else:
+                            summary['errors'].append({'index': None, 'error': 'Batch with this idempotency key is still being posted'})
+                        return summary
+                    reserved = True
+
+                for start in range(0, len(rows), ACCOUNT_BATCH_CHUNK_SIZE):
+                    chunk = rows[start:start + ACCOUNT_BATCH_CHUNK_SIZE]
+                    result = self.supabase.table('accounts').insert(chunk).execute()
+                    posted_ids.extend(row['id'] for row in result.data)
+                    summary['posted'] += len(chunk)
+
+                if reserved:
+                    (self.supabase.table('account_batches').update({'completed': True})
+                     .eq('company_id', batch_scope).eq('idempotency_key', idempotency_key).execute())
+                    reserved = False
+                # Parti yazıldı: bundan sonraki bir hata sonucu başarısız göstermemeli (anahtarsız tekrar çift yazar)
+                summary['success'] = True
+
+            if summary['success']:
+                with partial_result("Error posting account batch to balances"):
+                    for row in rows:
+                        policy = policies[row['policy_id']]
+                        self.balance_engine.register_policy(policy['company_id'], policy['id'],
+                                                            policy['customer_name'], policy['customer_tc_vkn'])
+                        self.balance_engine.apply(row['company_id'], row['policy_id'], row['transaction_type'],
+                                                  row['amount'])
+            return summary
+        finally:
+            if reserved and self._release_account_batch(batch_scope, idempotency_key, posted_ids):
+                summary['posted'] = 0
+
+    @staticmethod
+    def _parse_amount(value: Any) -> Optional[float]:
+        """A finite numeric amount as float, ``None`` for anything else (bools, text, NaN, inf)"""
+        if isinstance(value, bool):
+            return None
+        try:
+            amount = float(value)
+        except (TypeError, ValueError):
+            return None
+        return amount if math.isfinite(amount) else None
+
+    def _release_account_batch(self, batch_scope: int, idempotency_key: str, posted_ids: List[int]) -> bool:
+        """Undo a failed batch's posted chunks and drop its idempotency reservation, so the client can retry.
+
+        If the posted rows cannot be removed the reservation is kept: a retry
+        then reports the batch as still being posted instead of posting twice.
+        """
+        try:
+            for start in range(0, len(posted_ids), ID_FILTER_CHUNK_SIZE):
+                self.supabase.table('accounts').delete().in_('id', posted_ids[start:start + ID_FILTER_CHUNK_SIZE]).execute()
+            (self.supabase.table('account_batches').delete()
+             .eq('company_id', batch_scope).eq('idempotency_key', idempotency_key).execute())
+            return True
         except Exception as e:
-            print(f"Error adding account transaction: {e}")
+            logger.error("Error releasing idempotency key %s: %s", idempotency_key, e)
             return False
 
+    # Balance methods
+    def _warm_balances(self, company_id: Optional[int]) -> None:
+        """Compute a company's balances from the ledger on first use."""
+        if self.balance_engine.is_warm(company_id):
+            return
+        policies = self.iter_policies(company_id, columns='customer_name, customer_tc_vkn')
+        transactions = self._iter_rows('accounts', company_id, columns='policy_id, transaction_type, amount')
+        self.balance_engine.load(company_id, policies, transactions)
+        unknown = self.balance_engine.unknown_transaction_types(company_id)
+        if unknown:
+            logger.warning("Unknown transaction types booked as debits (company %s): %s", company_id, ', '.join(unknown))
+
+    def _post_to_balances(self, company_id: Optional[int], policy_id: int,
+                          transaction_type: str, amount: float) -> None:
+        """Keep warm balance books in step with a written transaction."""
+        for scope in {company_id, None}:
+            if self.balance_engine.is_warm(scope) and not self.balance_engine.knows_policy(scope, policy_id):
+                # Defter yüklendikten sonra eklenen poliçe - müşterisini bir kez öğren
+                policy = self.supabase.table('policies').select('customer_name, customer_tc_vkn').eq('id', policy_id).execute()
+                if policy.data:
+                    self.balance_engine.register_policy(company_id, policy_id,
+                                                        policy.data[0]['customer_name'],
+                                                        policy.data[0]['customer_tc_vkn'])
+                break
+        self.balance_engine.apply(company_id, policy_id, transaction_type, amount)
+
+    @fallback(0.0, "Error getting policy balance")
+    def get_policy_balance(self, current_user: str, policy_id: int) -> float:
+        """Get outstanding balance (debits minus credits) of a policy"""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return 0.0
+        self._warm_balances(company_id)
+        return self.balance_engine.policy_balance(company_id, policy_id)
+
+    @fallback(0.0, "Error getting customer balance")
+    def get_customer_balance(self, current_user: str, customer_name: str, customer_tc_vkn: Optional[str]) -> float:
+        """Get outstanding balance of a customer across all their policies"""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return 0.0
+        self._warm_balances(company_id)
+        return self.balance_engine.customer_balance(company_id, customer_name, customer_tc_vkn)
+
+    @fallback(lambda: ([], 0), "Error getting customers with debt")
+    def get_customers_with_debt(self, current_user: str, offset: int = 0,
+                                limit: int = 50) -> Tuple[List[Tuple], int]:
+        """Paginated customers with outstanding debt in the caller's company, largest first"""
+        allowed, company_id = self._policy_scope(current_user)
+        if not allowed:
+            return [], 0
+        self._warm_balances(company_id)
+        return self.balance_engine.debtors(company_id, offset, limit)
+
+    @fallback(0, "Otomatik fırsat oluşturma hatası")
     def auto_generate_cross_selling_opportunities(self) -> int:
         """Otomatik olarak çapraz satış fırsatları oluştur."""
-        try:
-            now = datetime.now().isoformat()
+        now = datetime.now().isoformat()
+        
+        # Mevcut poliçeleri getir (son 60 gün içinde)
+        policies_iter = self.iter_policies(
+            columns='customer_name, customer_tc_vkn, product_id',
+            filters=[('gte', 'end_date', (datetime.now() - timedelta(days=60)).date().isoformat())]
+        )
+
+        customers = {}
+        for policy in policies_iter:
+            if policy['customer_name'] and policy['customer_name'].strip():
+                key = (policy['customer_name'], policy['customer_tc_vkn'])
+                if key not in customers:
+                    customers[key] = {
+                        'customer_name': policy['customer_name'],
+                        'customer_tc_vkn': policy['customer_tc_vkn'],
+                        'product_id': policy['product_id'],
+                        'held': set()
+                    }
+                if policy['product_id']:
+                    customers[key]['held'].add(policy['product_id'])
+
+        # Öneriler product_recommendations tablosundan (cross_sell_recommender) okunur
+        product_names = self.get_name_lookup('products')
+        product_ids = {name: product_id for product_id, name in product_names.items()}
+        rules = self.get_product_recommendations()
+        
+        opportunities_created = 0
+        
+        for customer_data in customers.values():
+            customer_name = customer_data['customer_name']
+            customer_tc_vkn = customer_data['customer_tc_vkn']
+            product_id = customer_data['product_id']
+            current_product = product_names.get(product_id)
             
-            # Mevcut poliçeleri getir (son 60 gün içinde)
-            policies_result = self.supabase.table('policies').select('''
-                customer_name, customer_tc_vkn, product_id,
-                products(name)
-            ''').gte('end_date', (datetime.now() - timedelta(days=60)).date().isoformat()).execute()
+            if not current_product:
+                continue
             
-            customers = {}
-            for policy in policies_result.data:
-                if policy['customer_name'] and policy['customer_name'].strip():
-                    key = (policy['customer_name'], policy['customer_tc_vkn'])
-                    if key not in customers:
-                        customers[key] = {
-                            'customer_name': policy['customer_name'],
-                            'customer_tc_vkn': policy['customer_tc_vkn'],
-                            'product_id': policy['product_id'],
-                            'current_product': policy['products']['name'] if policy['products'] else None
-                        }
+            # Bu müşteri için zaten çapraz satış fırsatı var mı kontrol et
+            existing_result = self.supabase.table('cross_selling').select('id').eq('customer_name', customer_name).eq('customer_tc_vkn', customer_tc_vkn).execute()
             
-            opportunities_created = 0
+            if existing_result.data:
+                continue  # Zaten fırsat var
             
-            for customer_data in customers.values():
-                customer_name = customer_data['customer_name']
-                customer_tc_vkn = customer_data['customer_tc_vkn']
-                product_id = customer_data['product_id']
-                current_product = customer_data['current_product']
-                
-                if not current_product:
+            # Müşterinin sahip olmadığı ürünler, birliktelik lift'ine göre sıralı
+            suggestions = [suggested_id for suggested_id, _ in recommend(customer_data['held'], rules)]
+            if not suggestions:
+                suggestions = [product_ids[name] for name in self.get_cross_selling_suggestions(current_product)
+                               if name in product_ids and product_ids[name] not in customer_data['held']]
+            
+            # Her öneri için fırsat oluştur
+            for suggested_product_id in suggestions[:3]:  # En fazla 3 öneri
+                suggested_product = product_names.get(suggested_product_id)
+                if not suggested_product:
                     continue
                 
-                # Bu müşteri için zaten çapraz satış fırsatı var mı kontrol et
-                existing_result = self.supabase.table('cross_selling').select('id').eq('customer_name', customer_name).eq('customer_tc_vkn', customer_tc_vkn).execute()
-                
-                if existing_result.data:
-                    continue  # Zaten fırsat var
+                # Öncelik belirle (ürün türüne göre)
+                priority = 2  # Orta öncelik
+                if suggested_product in ["FERDİ KAZA", "KONUT", "İŞYERİ"]:
+                    priority = 3  # Yüksek öncelik
+                elif suggested_product in ["TSS", "FFL"]:
+                    priority = 1  # Düşük öncelik
                 
-                # Çapraz satış önerilerini al
-                suggestions = self.get_cross_selling_suggestions(current_product)
+                # Fırsatı ekle
+                self.supabase.table('cross_selling').insert({
+                    'customer_name': customer_name,
+                    'customer_tc_vkn': customer_tc_vkn,
+                    'current_product_id': product_id,
+                    'suggested_product_id': suggested_product_id,
+                    'priority': priority,
+                    'status': 'pending',
+                    'notes': f"Otomatik öneri: {current_product} → {suggested_product}",
+                    'created_at': now,
+                    'updated_at': now
+                }).execute()
                 
-                # Her öneri için fırsat oluştur
-                for suggested_product in suggestions[:3]:  # En fazla 3 öneri
-                    # Önerilen ürünün ID'sini bul
-                    product_result = self.supabase.table('products').select('id').eq('name', suggested_product).execute()
-                    
-                    if product_result.data:
-                        suggested_product_id = product_result.data[0]['id']
-                        
-                        # Öncelik belirle (ürün türüne göre)
-                        priority = 2  # Orta öncelik
-                        if suggested_product in ["FERDİ KAZA", "KONUT", "İŞYERİ"]:
-                            priority = 3  # Yüksek öncelik
-                        elif suggested_product in ["TSS", "FFL"]:
-                            priority = 1  # Düşük öncelik
-                        
-                        # Fırsatı ekle
-                        self.supabase.table('cross_selling').insert({
-                            'customer_name': customer_name,
-                            'customer_tc_vkn': customer_tc_vkn,
-                            'current_product_id': product_id,
-                            'suggested_product_id': suggested_product_id,
-                            'priority': priority,
-                            'status': 'pending',
-                            'notes': f"Otomatik öneri: {current_product} → {suggested_product}",
-                            'created_at': now,
-                            'updated_at': now
-                        }).execute()
-                        
-                        opportunities_created += 1
-            
-            return opportunities_created
-            
-        except Exception as e:
-            print(f"Otomatik fırsat oluşturma hatası: {e}")
-            return 0
+                opportunities_created += 1
+        
+        return opportunities_created
+        
 
+    @fallback(list, "Error getting companies")
     def get_companies(self) -> List[Tuple]:
         """Get all companies"""
-        try:
-            result = self.supabase.table('companies').select('*').order('name').execute()
-            companies = []
-            for company in result.data:
-                companies.append((
-                    company['id'],
-                    company['name'],
-                    company['created_at'],
-                    company['active']
-                ))
-            return companies
-        except Exception as e:
-            print(f"Error getting companies: {e}")
-            return []
-
+        return self.cache.get_or_load('reference', None, 'companies', self._fetch_companies, REFERENCE_CACHE_TTL)
+
+    @coalesced
+    def get_active_companies(self) -> List[Dict[str, Any]]:
+        """Active company rows"""
+        return self.supabase.table('companies').select('*').eq('active', True).execute().data
+
+    @coalesced
+    def get_active_salespeople(self, company_id: Optional[int]) -> List[Dict[str, Any]]:
+        """Active salesperson rows of a company (every company when ``company_id`` is None)"""
+        query = self.supabase.table('salespeople').select('*').eq('active', True)
+        if company_id is not None:
+            query = query.eq('company_id', company_id)
+        return query.execute().data
+
+    @fallback(0, "Error getting user count")
     def get_user_count_by_company(self, company_id: int) -> int:
         """Get user count for a company"""
-        try:
-            result = self.supabase.table('users').select('id').eq('company_id', company_id).execute()
-            return len(result.data)
-        except Exception as e:
-            print(f"Error getting user count: {e}")
-            return 0
+        result = self.supabase.table('users').select('id').eq('company_id', company_id).execute()
+        return len(result.data)
 
+    @fallback(list, "Error getting users by company")
     def get_users_by_company(self, company_id: int) -> List[Tuple]:
         """Get all users for a company"""
-        try:
-            result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login').eq('company_id', company_id).order('username').execute()
-            users = []
-            for user in result.data:
-                users.append((
-                    user['id'],
-                    user['username'],
-                    user['is_admin'],
-                    user['created_at'],
-                    user['last_login']
-                ))
-            return users
-        except Exception as e:
-            print(f"Error getting users by company: {e}")
-            return []
-
+        result = self.supabase.table('users').select('id, username, is_admin, created_at, last_login').eq('company_id', company_id).order('username').execute()
+        users = []
+        for user in result.data:
+            users.append((
+                user['id'],
+                user['username'],
+                user['is_admin'],
+                user['created_at'],
+                user['last_login']
+            ))
+        return users
+
+    @coalesced
+    @fallback("", "Error getting company name")
     def get_company_name(self, company_id: int) -> str:
         """Get company name by ID"""
-        try:
-            result = self.supabase.table('companies').select('name').eq('id', company_id).execute()
-            if result.data:
-                return result.data[0]['name']
-            return ""
-        except Exception as e:
-            print(f"Error getting company name: {e}")
-            return ""
+        result = self.supabase.table('companies').select('name').eq('id', company_id).execute()
+        if result.data:
+            return result.data[0]['name']
+        return ""
 
+    @fallback(list, "Error getting products")
     def get_products(self) -> List[Tuple]:
         """Get all products (basic version)"""
-        try:
-            result = self.supabase.table('products').select('*').order('name').execute()
-            products = []
-            for product in result.data:
-                products.append((
-                    product['id'],
-                    product['name'],
-                    product.get('commission_percent', 15.0)
-                ))
-            return products
-        except Exception as e:
-            print(f"Error getting products: {e}")
-            return []
-
+        result = self.supabase.table('products').select('*').order('name').execute()
+        products = []
+        for product in result.data:
+            products.append((
+                product['id'],
+                product['name'],
+                product.get('commission_percent', 15.0)
+            ))
+        return products
+
+    @fallback(False, "Error adding product")
     def add_product(self, name: str, commission_percent: float) -> bool:
         """Add a new product (basic version)"""
-        try:
-            now = datetime.now().isoformat()
-            result = self.supabase.table('products').insert({
-                'name': name,
-                'commission_percent': commission_percent,
-                'created_at': now,
-                'updated_at': now
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding product: {e}")
-            return False
-
+        now = datetime.now().isoformat()
+        result = self.supabase.table('products').insert({
+            'name': name,
+            'commission_percent': commission_percent,
+            'created_at': now,
+            'updated_at': now
+        }).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
+
+    @fallback(False, "Error deleting product")
     def delete_product(self, product_id: int) -> bool:
         """Delete a product"""
-        try:
-            result = self.supabase.table('products').delete().eq('id', product_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error deleting product: {e}")
-            return False
+        result = self.supabase.table('products').delete().eq('id', product_id).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
 
+    @fallback(False, "Error deleting all products")
     def delete_all_products(self) -> bool:
         """Delete all products from the database"""
-        try:
-            # Get all products first
-            all_products = self.supabase.table('products').select('id').execute()
-            if all_products.data:
-                # Delete all products
-                result = self.supabase.table('products').delete().neq('id', 0).execute()
-                print(f"Deleted {len(all_products.data)} products")
-                return True
-            else:
-                print("No products found to delete")
-                return True
-        except Exception as e:
-            print(f"Error deleting all products: {e}")
-            return False
+        # Get all products first
+        all_products = self.supabase.table('products').select('id').execute()
+        if all_products.data:
+            # Delete all products
+            result = self.supabase.table('products').delete().neq('id', 0).execute()
+            self.cache.invalidate('reference')
+            logger.info("Deleted %s products", len(all_products.data))
+            return True
+        else:
+            logger.info("No products found to delete")
+            return True
 
+    @fallback(False, "Error updating product")
     def update_product(self, product_id: int, name: str, commission_percent: float) -> bool:
         """Update a product (basic version)"""
-        try:
-            now = datetime.now().isoformat()
-            result = self.supabase.table('products').update({
-                'name': name,
-                'commission_percent': commission_percent,
-                'updated_at': now
-            }).eq('id', product_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating product: {e}")
-            return False
-
+        now = datetime.now().isoformat()
+        result = self.supabase.table('products').update({
+            'name': name,
+            'commission_percent': commission_percent,
+            'updated_at': now
+        }).eq('id', product_id).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
+
+    @fallback(list, "Error getting enhanced products")
     def get_products_enhanced(self) -> List[Tuple]:
         """Get all products with enhanced information"""
-        try:
-            result = self.supabase.table('products').select('*').order('name').execute()
-            products = []
-            for product in result.data:
-                products.append((
-                    product['id'],
-                    product['name'],
-                    product.get('commission_percent', 15.0),
-                    product.get('category', ''),
-                    product.get('active', True),
-                    product.get('description', ''),
-                    product.get('created_at', ''),
-                    product.get('updated_at', '')
-                ))
-            return products
-        except Exception as e:
-            print(f"Error getting enhanced products: {e}")
-            return []
-
+        result = self.supabase.table('products').select('*').order('name').execute()
+        products = []
+        for product in result.data:
+            products.append((
+                product['id'],
+                product['name'],
+                product.get('commission_percent', 15.0),
+                product.get('category', ''),
+                product.get('active', True),
+                product.get('description', ''),
+                product.get('created_at', ''),
+                product.get('updated_at', '')
+            ))
+        return products
+
+    @fallback(False, "Error adding enhanced product")
     def add_product_enhanced(self, name: str, commission_percent: float, category: str = "", active: bool = True, description: str = "") -> bool:
         """Add a new product with enhanced information"""
-        try:
-            now = datetime.now().isoformat()
-            result = self.supabase.table('products').insert({
-                'name': name,
-                'commission_percent': commission_percent,
-                'category': category,
-                'active': active,
-                'description': description,
-                'created_at': now,
-                'updated_at': now
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error adding enhanced product: {e}")
-            return False
-
+        now = datetime.now().isoformat()
+        result = self.supabase.table('products').insert({
+            'name': name,
+            'commission_percent': commission_percent,
+            'category': category,
+            'active': active,
+            'description': description,
+            'created_at': now,
+            'updated_at': now
+        }).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
+
+    @fallback(False, "Error updating enhanced product")
     def update_product_enhanced(self, product_id: int, name: str, commission_percent: float, category: str = "", active: bool = True, description: str = "") -> bool:
         """Update a product with enhanced information"""
-        try:
-            now = datetime.now().isoformat()
-            result = self.supabase.table('products').update({
-                'name': name,
-                'commission_percent': commission_percent,
-                'category': category,
-                'active': active,
-                'description': description,
-                'updated_at': now
-            }).eq('id', product_id).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            print(f"Error updating enhanced product: {e}")
-            return False
+        now = datetime.now().isoformat()
+        result = self.supabase.table('products').update({
+            'name': name,
+            'commission_percent': commission_percent,
+            'category': category,
+            'active': active,
+            'description': description,
+            'updated_at': now
+        }).eq('id', product_id).execute()
+        self.cache.invalidate('reference')
+        return len(result.data) > 0
 
     def get_cross_selling_suggestions(self, current_product: str) -> List[str]:
-        """Mevcut ürüne göre çapraz satış önerileri getir."""
+        """Mevcut ürüne göre çapraz satış önerileri getir (portföy birlikteliği; veri yoksa sabit liste)."""
+        names = self.get_name_lookup('products')
+        product_ids = [product_id for product_id, name in names.items() if name == current_product]
+        if product_ids:
+            suggested = recommend(product_ids, self.get_product_recommendations())
+            if suggested:
+                return [names[product_id] for product_id, _ in suggested if product_id in names]
+
         suggestions_map = {
             "TRAFİK": ["KASKO", "FERDİ KAZA", "KONUT"],
             "KASKO": ["TRAFİK", "FERDİ KAZA", "KONUT"],
@@ -1283,71 +1931,15 @@ class SupabaseRepository:
         return suggestions_map.get(current_product, ["FERDİ KAZA", "KONUT", "KASKO"])
 
     # Test connection
+    @fallback(list, "Error getting overdue policies")
     def overdue(self) -> List[Tuple]:
         """Get policies that are overdue for renewal"""
-        try:
-            from datetime import datetime
-            today = datetime.now().date()
-            
-            result = self.supabase.table('policies').select('*').lt('end_date', today.isoformat()).order('end_date').execute()
-            
-            policies = []
-            for policy in result.data:
-                # Get product and company names
-                product_name = ""
-                company_name = ""
-                salesperson_name = ""
-                
-                try:
-                    # Get product name
-                    if policy['product_id']:
-                        product_result = self.supabase.table('products').select('name').eq('id', policy['product_id']).execute()
-                        if product_result.data:
-                            product_name = product_result.data[0]['name']
-                    
-                    # Get company name
-                    if policy['company_id']:
-                        company_result = self.supabase.table('companies').select('name').eq('id', policy['company_id']).execute()
-                        if company_result.data:
-                            company_name = company_result.data[0]['name']
-                    
-                    # Get salesperson name
-                    if policy['salesperson_id']:
-                        salesperson_result = self.supabase.table('salespeople').select('name').eq('id', policy['salesperson_id']).execute()
-                        if salesperson_result.data:
-                            salesperson_name = salesperson_result.data[0]['name']
-                except:
-                    pass
-                
-                policies.append((
-                    policy['id'],
-                    policy['end_date'],
-                    policy['customer_name'],
-                    policy['customer_tc_vkn'],
-                    policy['plate'],
-                    policy['doc_serial'],
-                    policy['note'],
-                    policy['premium'],
-                    policy['product_id'],
-                    product_name,
-                    policy.get('commission_percent', 0),
-                    policy['last_notified_on'],
-                    policy['salesperson_id'],
-                    salesperson_name,
-                    policy['policy_number'],
-                    policy['company_id'],
-                    company_name
-                ))
-            return policies
-        except Exception as e:
-            print(f"Error getting overdue policies: {e}")
-            return []
+        if self.replica is not None and self.replica.ready:
+            return self.replica.renewal_window(None, date.today().isoformat())
+        return [self._enriched_tuple(policy) for policy in self._iter_renewal_window(None, date.today().isoformat())]
 
+    @fallback(False, "Connection test failed")
     def test_connection(self) -> bool:
         """Test database connection"""
-        try:
-            result = self.supabase.table('companies').select('*').limit(1).execute()
-            return True
-        except Exception as e:
-            print(f"Connection test failed: {e}")
-            return False
+        result = self.supabase.table('companies').select('*').limit(1).execute()
+        return True
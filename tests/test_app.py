@@ -0,0 +1,83 @@
+import logging
+import types
+import zlib
+
+import pytest
+
+import app as app_module
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        return FakeTable([row for row in self.rows if row.get(column) == value])
+
+    def execute(self):
+        return types.SimpleNamespace(data=self.rows)
+
+
+class FakeRepository:
+    def __init__(self, permissions=None, fail=False):
+        self.permissions = permissions
+        self.fail = fail
+        self.loads = 0
+
+    def get_permission_version(self, username):
+        if self.fail:
+            raise RuntimeError('cache down')
+        return 3
+
+    def get_user_permissions(self, username):
+        self.loads += 1
+        return self.permissions
+
+
+@pytest.fixture
+def login(monkeypatch):
+    users = [{'id': 1, 'username': 'ayse', 'password': 'pw', 'is_admin': False, 'company_id': 7}]
+    monkeypatch.setattr(app_module, 'supabase', types.SimpleNamespace(table=lambda name: FakeTable(users)))
+    client = app_module.app.test_client()
+
+    def post(repository):
+        monkeypatch.setattr(app_module, '_repository', repository)
+        client.post('/login', data={'username': 'ayse', 'password': 'pw'})
+        with client.session_transaction() as session:
+            return dict(session)
+    return post
+
+
+def test_login_stores_the_permission_snapshot(login):
+    session = login(FakeRepository({'view_reports': True, 'edit_policies': False}))
+    assert session['user_id'] == 1 and session['company_id'] == 7
+    assert session['permissions']['v'] == 3 and session['permissions']['granted'] == ['view_reports']
+
+
+def test_failed_snapshot_load_leaves_no_session(login):
+    session = login(FakeRepository({'view_reports': True}, fail=True))
+    assert 'user_id' not in session and 'permissions' not in session
+
+
+def test_unreadable_permissions_are_not_cached(login):
+    repository = FakeRepository(None)
+    snapshot = login(repository)['permissions']
+    assert snapshot['v'] is None and snapshot['granted'] == []
+    repository.permissions = {'view_reports': True}
+    with app_module.app.test_request_context():
+        app_module.session.update(username='ayse', permissions=snapshot)
+        assert app_module.has_permission('view_reports')
+    assert repository.loads == 2
+
+
+def test_streamed_compression_cost_is_logged(caplog):
+    chunks = ['{"policies":[', '{"id": 1}' * 200, '],"complete":true}']
+    with caplog.at_level(logging.INFO, logger='app'):
+        body = b''.join(app_module._compress_stream(iter(chunks), 'gzip', 'req-1'))
+    assert zlib.decompress(body, 31).decode() == ''.join(chunks)
+    record = next(r for r in caplog.records if r.getMessage() == 'compress')
+    assert record.bytes_in == len(''.join(chunks)) and record.bytes_out == len(body)
+    assert record.request_id == 'req-1' and record.compress_ms >= 0
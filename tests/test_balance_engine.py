@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from balance_engine import BalanceEngine, signed_amount, is_known_transaction_type
+from customer_index import customer_key
+
+CREDITS = ['tahsilat', 'TAHSİLAT', 'TAHSILAT', 'Tahsilat ', 'ödeme', 'ÖDEME', 'odeme', 'alacak', 'İADE', 'IADE', 'iade']
+DEBITS = ['borç', 'BORÇ', 'borc', 'BORC', 'tahakkuk', 'TAHAKKUK']
+
+POLICIES = [
+    {'id': 1, 'customer_name': 'Ayşe Yılmaz', 'customer_tc_vkn': '11111111111'},
+    {'id': 2, 'customer_name': 'Ayşe Yılmaz', 'customer_tc_vkn': '11111111111'},
+    {'id': 3, 'customer_name': 'IŞIL Kaya', 'customer_tc_vkn': None},
+    {'id': 4, 'customer_name': 'Çağlar Öz', 'customer_tc_vkn': '44444444444'},
+    {'id': 5, 'customer_name': 'Zeynep Ünal', 'customer_tc_vkn': '55555555555'},
+]
+
+
+def ledger(count=400, seed=3):
+    rng = random.Random(seed)
+    return [{'policy_id': rng.choice(POLICIES)['id'],
+             'transaction_type': rng.choice(CREDITS + DEBITS),
+             'amount': round(rng.uniform(1, 500), 2)} for _ in range(count)]
+
+
+def original_balances(transactions):
+    """Balances the way a report over get_customer_debts' raw ledger rows adds up: debits minus credits."""
+    owners = {p['id']: customer_key(p['customer_name'], p['customer_tc_vkn']) for p in POLICIES}
+    policies, customers = {}, {}
+    for tx in transactions:
+        credit = tx['transaction_type'].strip().replace('İ', 'i').replace('I', 'ı').lower() in {
+            'tahsilat', 'tahsılat', 'ödeme', 'odeme', 'alacak', 'iade', 'ıade'}
+        delta = -tx['amount'] if credit else tx['amount']
+        policies[tx['policy_id']] = policies.get(tx['policy_id'], 0.0) + delta
+        key = owners[tx['policy_id']]
+        customers[key] = customers.get(key, 0.0) + delta
+    return policies, customers
+
+
+@pytest.mark.parametrize('transaction_type', CREDITS)
+def test_credit_types_are_negative_in_any_turkish_case(transaction_type):
+    assert is_known_transaction_type(transaction_type)
+    assert signed_amount(transaction_type, 100) == -100
+
+
+@pytest.mark.parametrize('transaction_type', DEBITS)
+def test_debit_types_are_positive_in_any_turkish_case(transaction_type):
+    assert is_known_transaction_type(transaction_type)
+    assert signed_amount(transaction_type, '100.5') == 100.5
+
+
+def test_unknown_types_are_booked_as_debits_and_reported():
+    engine = BalanceEngine()
+    engine.load(7, POLICIES, [{'policy_id': 1, 'transaction_type': 'Virman', 'amount': 40},
+                              {'policy_id': 1, 'transaction_type': 'TAHSİLAT', 'amount': 15}])
+    assert not is_known_transaction_type('Virman')
+    assert engine.policy_balance(7, 1) == 25
+    assert engine.unknown_transaction_types(7) == ['Virman']
+
+
+def test_loaded_balances_match_the_ledger():
+    transactions = ledger()
+    engine = BalanceEngine()
+    engine.load(7, POLICIES, transactions)
+    policies, customers = original_balances(transactions)
+    for policy in POLICIES:
+        assert engine.policy_balance(7, policy['id']) == pytest.approx(policies.get(policy['id'], 0.0), abs=0.01)
+        key = customer_key(policy['customer_name'], policy['customer_tc_vkn'])
+        assert engine.customer_balance(7, policy['customer_name'], policy['customer_tc_vkn']) == \
+            pytest.approx(customers.get(key, 0.0), abs=0.01)
+    assert engine.unknown_transaction_types(7) == []
+
+
+def test_applying_writes_matches_a_fresh_load():
+    transactions = ledger()
+    live, fresh = BalanceEngine(), BalanceEngine()
+    live.load(7, POLICIES, transactions[:100])
+    live.load(None, POLICIES, transactions[:100])
+    for tx in transactions[100:]:
+        live.apply(7, tx['policy_id'], tx['transaction_type'], tx['amount'])
+    fresh.load(7, POLICIES, transactions)
+    for scope in (7, None):
+        assert live.debtors(scope, limit=10) == fresh.debtors(7, limit=10)
+        for policy in POLICIES:
+            assert live.policy_balance(scope, policy['id']) == fresh.policy_balance(7, policy['id'])
+
+
+def test_apply_skips_cold_books():
+    engine = BalanceEngine()
+    engine.load(7, POLICIES, [])
+    engine.apply(8, 1, 'borç', 100)
+    assert not engine.is_warm(8)
+    assert engine.policy_balance(7, 1) == 0
+    assert engine.policy_balance(8, 1) == 0
+
+
+def test_debtors_are_ranked_largest_first_and_paginated():
+    engine = BalanceEngine()
+    engine.load(7, POLICIES, [
+        {'policy_id': 1, 'transaction_type': 'borç', 'amount': 100},
+        {'policy_id': 2, 'transaction_type': 'BORÇ', 'amount': 50},
+        {'policy_id': 3, 'transaction_type': 'tahakkuk', 'amount': 300},
+        {'policy_id': 4, 'transaction_type': 'borç', 'amount': 80},
+        {'policy_id': 4, 'transaction_type': 'TAHSİLAT', 'amount': 80},
+        {'policy_id': 5, 'transaction_type': 'borc', 'amount': 20},
+        {'policy_id': 5, 'transaction_type': 'İADE', 'amount': 70},
+    ])
+    assert engine.debtors(7, 0, 10) == ([('IŞIL Kaya', None, 300.0), ('Ayşe Yılmaz', '11111111111', 150.0)], 2)
+    assert engine.debtors(7, 1, 1) == ([('Ayşe Yılmaz', '11111111111', 150.0)], 2)
+
+    # Sıralama bir sonraki okumada yeni bakiyeyle yenilenir
+    engine.apply(7, 4, 'borç', 500)
+    assert engine.debtors(7, 0, 1) == ([('Çağlar Öz', '44444444444', 500.0)], 3)
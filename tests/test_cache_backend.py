@@ -0,0 +1,104 @@
+import types
+
+import pytest
+
+import cache_backend
+from cache_backend import CacheSerializer, SharedCache, cache_from_env
+from report_engine import ProductionReportEngine
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis client; instances built from the same URL share one store."""
+
+    stores = {}
+
+    def __init__(self, store):
+        self._store = store
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(cls.stores.setdefault(url, {}))
+
+    def get(self, key):
+        return self._store.get(key)
+
+    def set(self, key, value, ex=None):
+        self._store[key] = value
+
+    def delete(self, key):
+        self._store.pop(key, None)
+
+    def incr(self, key):
+        value = int(self._store.get(key, b'0')) + 1
+        self._store[key] = str(value).encode()
+        return value
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    FakeRedis.stores = {}
+    monkeypatch.setattr(cache_backend, 'redis', types.SimpleNamespace(Redis=FakeRedis))
+    monkeypatch.setenv('CACHE_BACKEND', 'redis')
+    monkeypatch.setenv('CACHE_URL', 'redis://cache:6379/0')
+    monkeypatch.setenv('SECRET_KEY', 'test-secret')
+    return FakeRedis.stores
+
+
+@pytest.mark.parametrize('backend', ['redis', 'sqlite'])
+def test_shared_backend_requires_secret_key(fake_redis, monkeypatch, tmp_path, backend):
+    monkeypatch.setenv('CACHE_BACKEND', backend)
+    if backend == 'sqlite':
+        monkeypatch.setenv('CACHE_URL', str(tmp_path / 'cache.sqlite'))
+    monkeypatch.delenv('SECRET_KEY')
+    with pytest.raises(RuntimeError):
+        cache_from_env()
+
+
+def test_memory_backend_starts_without_secret_key(monkeypatch):
+    monkeypatch.delenv('CACHE_BACKEND', raising=False)
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    cache = cache_from_env()
+    assert cache.get_or_load('companies', None, 'all', lambda: [1, 2]) == [1, 2]
+
+
+def test_instances_share_values_and_invalidation(fake_redis):
+    first, second = cache_from_env(), cache_from_env()
+    assert first.get_or_load('companies', 7, 'all', lambda: ['a']) == ['a']
+    assert second.get_or_load('companies', 7, 'all', lambda: ['b']) == ['a']
+
+    second.invalidate('companies', 7)
+    assert first.version('companies', 7) == 1
+    assert first.get_or_load('companies', 7, 'all', lambda: ['c']) == ['c']
+
+
+def test_entry_signed_with_another_key_is_a_miss(fake_redis):
+    honest = cache_from_env()
+    honest.get_or_load('companies', 7, 'all', lambda: ['a'])
+    forged = SharedCache(honest.backend, CacheSerializer('budun-secret-key-2024-default'))
+    forged.backend.set(next(iter(fake_redis['redis://cache:6379/0'])), forged.serializer.dumps(['evil']))
+    assert honest.get_or_load('companies', 7, 'all', lambda: ['reloaded']) == ['reloaded']
+
+
+class FakeReportRepository:
+    def __init__(self, premium):
+        self.premium = premium
+
+    def get_all_products(self):
+        return [(1, 'Kasko', 10)]
+
+    def iter_policies(self, company_id=None, columns='*', filters=None):
+        return iter([{'salesperson_id': 3, 'product_id': 1, 'company_id': 7,
+                      'created_at': '2026-09-15', 'premium': self.premium}])
+
+
+def test_report_invalidated_on_another_instance_is_not_served_stale(fake_redis):
+    repository = FakeReportRepository(100)
+    first = ProductionReportEngine(repository, cache=cache_from_env())
+    second = ProductionReportEngine(repository, cache=cache_from_env())
+    assert second.production(7, '2026-09', '2026-09')[0]['premium_total'] == 100
+    assert second.production(None, '2026-09', '2026-09')[0]['premium_total'] == 100
+
+    repository.premium = 250
+    first.invalidate(7)
+    assert second.production(7, '2026-09', '2026-09')[0]['premium_total'] == 250
+    assert second.production(None, '2026-09', '2026-09')[0]['premium_total'] == 250
@@ -0,0 +1,54 @@
+import numpy as np
+
+from cross_sell_recommender import CrossSellRecommender
+from customer_index import customer_key
+
+
+class FakeRepository:
+    def __init__(self, policies):
+        self.policies = policies
+
+    def iter_policies(self, columns='*', filters=None):
+        after = filters[0][2] if filters else 0
+        return iter([p for p in self.policies if p['id'] > after])
+
+    def get_customer_products(self, customers, max_policy_id):
+        held = {}
+        for p in self.policies:
+            key = customer_key(p['customer_name'], p['customer_tc_vkn'])
+            if p['id'] <= max_policy_id and key in customers:
+                held.setdefault(key, set()).add(p['product_id'])
+        return held
+
+
+def policy(policy_id, customer, product_id):
+    return {'id': policy_id, 'customer_name': customer, 'customer_tc_vkn': None, 'product_id': product_id}
+
+
+def counts(recommender):
+    products = recommender._products.tolist()
+    return {(products[i], products[j]): int(recommender._cooc[i, j])
+            for i, j in zip(*np.nonzero(recommender._cooc))}
+
+
+def test_held_product_sorting_before_the_new_one_gets_the_pair():
+    recommender = CrossSellRecommender(FakeRepository([]))
+    recommender._apply([('a', 9)], {})
+    recommender._apply([('b', 9)], {'b': {1}})
+    assert counts(recommender) == {(9, 9): 2, (1, 9): 1, (9, 1): 1}
+
+
+def test_incremental_update_matches_a_full_rebuild():
+    first = [policy(1, 'Ayşe', 20), policy(2, 'Can', 20), policy(3, 'Ayşe', 30)]
+    later = [policy(4, 'Can', 10), policy(5, 'Deniz', 30), policy(6, 'Ayşe', 5), policy(7, 'Can', 20)]
+    repository = FakeRepository(first)
+    incremental = CrossSellRecommender(repository)
+    incremental._rebuild()
+    repository.policies = first + later
+    incremental._update()
+
+    full = CrossSellRecommender(FakeRepository(first + later))
+    full._rebuild()
+    assert incremental._products.tolist() == full._products.tolist()
+    assert counts(incremental) == counts(full)
+    assert incremental._customers == full._customers == 3
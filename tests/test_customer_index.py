@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+import customer_index
+from cache_backend import cache_from_env
+from customer_index import CustomerIndex, name_key
+from supabase_repository import SupabaseRepository
+
+NAMES = ['Ayşe Yılmaz', 'IŞIL Kaya', 'ışık Demir', 'İsmail Er', 'iris Ak', 'Çağlar Öz', 'Zeynep Ünal', 'Can Ilgaz']
+
+
+def policies(count=300, seed=7):
+    """Policy rows: each customer keeps one name; some have no TC/VKN, some rows have a blank name."""
+    rng = random.Random(seed)
+    customers = [(f'{name} {i}', f'{10000000000 + i * 7919}' if i % 4 else None)
+                 for i, name in enumerate(NAMES * 5)]
+    rows = [rng.choice(customers) for _ in range(count)]
+    return rows + [('  ', '99999999999'), (None, None)]
+
+
+def original_customers(rows):
+    """get_all_customers before the index: distinct (name, TC/VKN) over every policy row, blank names dropped."""
+    return {(name, tc_vkn) for name, tc_vkn in rows if name and name.strip()}
+
+
+@pytest.fixture
+def index():
+    index = CustomerIndex()
+    index.load(7, policies())
+    return index
+
+
+def test_listing_matches_the_original_dedup(index):
+    items, total = index.page(7, limit=None)
+    assert set(items) == original_customers(policies())
+    assert total == len(items) == len(set(items))
+
+
+@pytest.mark.parametrize('prefix', ['ı', 'I', 'ış', 'IŞ', 'i', 'İ', 'is', 'çağ', 'ÇAĞ', 'z', 'x'])
+def test_name_prefix_search_is_turkish_case_insensitive(index, prefix):
+    expected = sorted((name_key(n), n) for n, _ in original_customers(policies())
+                      if name_key(n).startswith(name_key(prefix)))
+    items, total = index.page(7, prefix, limit=None)
+    assert [name for name, _ in items] == [name for _, name in expected]
+    assert total == len(expected)
+
+
+def test_turkish_dotted_and_dotless_i_stay_apart(index):
+    names = {name.split()[0] for name, _ in index.page(7, 'ı', limit=None)[0]}
+    assert names == {'IŞIL', 'ışık'}
+    names = {name.split()[0] for name, _ in index.page(7, 'i', limit=None)[0]}
+    assert names == {'İsmail', 'iris'}
+
+
+def test_tc_prefix_search_and_pagination(index):
+    everyone = sorted(tc for _, tc in original_customers(policies()) if tc and tc.startswith('1000000'))
+    first, total = index.page(7, '1000000', offset=0, limit=3)
+    second, _ = index.page(7, '1000000', offset=3, limit=3)
+    assert total == len(everyone)
+    assert [tc for _, tc in first + second] == everyone[:6]
+
+
+def test_add_reaches_warm_scopes_only():
+    index = CustomerIndex()
+    index.load(7, [])
+    index.load(None, [])
+    index.add(7, 'Yeni Müşteri', '12345678901')
+    index.add(8, 'Başka Şirket', '22222222222')
+    assert index.page(7)[0] == [('Yeni Müşteri', '12345678901')]
+    assert index.page(None, limit=None)[1] == 2
+    assert index.page(8) == ([], 0)
+    # Aynı TC/VKN yeni adla: tek kayıt, ad güncellenir
+    index.add(7, 'Yeni Müşteri A.Ş.', '12345678901')
+    assert index.page(7, 'yeni')[0] == [('Yeni Müşteri A.Ş.', '12345678901')]
+
+
+def test_index_goes_stale_on_version_change_or_ttl(index, monkeypatch):
+    index.load(7, policies(), version=3)
+    assert index.is_warm(7, 3, ttl=300)
+    assert not index.is_warm(7, 4, ttl=300)
+    index.set_version(7, 4)
+    assert index.is_warm(7, 4, ttl=300)
+
+    now = customer_index.time.monotonic()
+    monkeypatch.setattr(customer_index.time, 'monotonic', lambda: now + 301)
+    assert not index.is_warm(7, 4, ttl=300)
+
+
+def test_write_on_another_instance_reloads_the_index(monkeypatch):
+    monkeypatch.delenv('CACHE_BACKEND', raising=False)
+    shared = cache_from_env()
+    rows = [{'customer_name': 'Ayşe', 'customer_tc_vkn': '1'}]
+
+    class Repository(SupabaseRepository):
+        def __init__(self):
+            self.cache = shared
+            self.customer_index = CustomerIndex()
+            self.loads = 0
+
+        def iter_policies(self, *args, **kwargs):
+            self.loads += 1
+            return iter(list(rows))
+
+    reader, writer = Repository(), Repository()
+    reader._warm_customer_index(7)
+    reader._warm_customer_index(7)
+    assert reader.loads == 1
+
+    rows.append({'customer_name': 'Can', 'customer_tc_vkn': '2'})
+    writer.cache.invalidate('customers', 7)
+    reader._warm_customer_index(7)
+    assert reader.loads == 2
+    assert reader.customer_index.page(7)[1] == 2
@@ -0,0 +1,110 @@
+import threading
+import types
+
+from balance_engine import BalanceEngine
+from customer_index import CustomerIndex
+from duplicate_index import FLAG, REJECT, PolicyDuplicateIndex
+from query_executor import QueryFailedError, UNIQUE_VIOLATION
+from supabase_repository import SupabaseRepository
+
+POLICY = {'policy_number': 'AB 1', 'customer_tc_vkn': '123', 'plate': '34 ABC 1', 'product_id': 2,
+          'end_date': '2027-01-01', 'customer_name': 'Ayşe'}
+
+
+def test_same_number_or_same_holding_and_end_date_is_rejected():
+    index = PolicyDuplicateIndex()
+    index.load(7, [dict(POLICY, id=1)])
+    assert index.claim(7, {'policy_number': 'ab1'})['action'] == REJECT
+    assert index.claim(7, dict(POLICY, policy_number=None))['reason'] == 'same_holding_and_end_date'
+    renewal = index.claim(7, dict(POLICY, policy_number='AB 2', end_date='2028-01-01'))
+    assert renewal == {'action': FLAG, 'reason': 'same_holding', 'policy_id': 1}
+    assert index.claim(8, POLICY) is None
+
+
+def test_load_keeps_claims_made_while_warming():
+    index = PolicyDuplicateIndex()
+    assert index.claim(7, POLICY) is None
+    index.load(7, [{'id': 5, 'policy_number': 'X9'}])
+    assert index.claim(7, dict(POLICY, policy_number=None))['action'] == REJECT
+    assert index.claim(7, {'policy_number': 'x 9'})['policy_id'] == 5
+
+
+def test_company_is_warmed_once_under_concurrent_first_requests():
+    loads, started = [], threading.Barrier(4)
+
+    class Repository(SupabaseRepository):
+        def __init__(self):
+            self.duplicate_index = PolicyDuplicateIndex()
+
+        def iter_policies(self, *args, **kwargs):
+            loads.append(1)
+            return iter([dict(POLICY, id=1)])
+
+    repository = Repository()
+
+    def warm():
+        started.wait()
+        repository._warm_duplicate_index(7)
+    threads = [threading.Thread(target=warm) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+
+
+class FakeInsert:
+    def __init__(self, table):
+        self.table, self.rows = table, None
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        return self.table.execute(self.rows)
+
+
+class FakePolicies:
+    """Rejects multi-row inserts with a unique violation; single rows succeed until ``fail_at``."""
+
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+        self.written = []
+
+    def execute(self, rows):
+        if isinstance(rows, list):
+            raise QueryFailedError('duplicate key', UNIQUE_VIOLATION)
+        if len(self.written) == self.fail_at:
+            raise QueryFailedError('connection reset')
+        self.written.append(rows)
+        return types.SimpleNamespace(data=[dict(rows, id=len(self.written))])
+
+
+def test_rows_written_before_a_failed_retry_stay_confirmed():
+    repository = SupabaseRepository.__new__(SupabaseRepository)
+    table = FakePolicies(fail_at=1)
+    repository.supabase = types.SimpleNamespace(table=lambda name: FakeInsert(table))
+    repository.replica = None
+    repository.duplicate_index = PolicyDuplicateIndex()
+    repository.customer_index = CustomerIndex()
+    repository.balance_engine = BalanceEngine()
+    repository.duplicate_index.load(7, [])
+
+    rows = [dict(POLICY, policy_number=f'N{i}', plate=f'34 ABC {i}') for i in range(3)]
+    chunk = [(i, row, 7) for i, row in enumerate(rows)]
+    for _, row, _ in chunk:
+        assert repository.duplicate_index.claim(7, row) is None
+    summary = {'inserted': 0, 'policy_ids': [], 'rejected': []}
+    scopes = set()
+    try:
+        repository._insert_policy_chunk(chunk, summary, scopes)
+    except QueryFailedError:
+        pass
+    for _, row, company_id in chunk[1:]:
+        repository.duplicate_index.release(company_id, row)
+
+    assert summary['inserted'] == 1 and summary['policy_ids'] == [1] and scopes == {7}
+    assert repository.duplicate_index.claim(7, {'policy_number': 'N0'}) == \
+        {'action': REJECT, 'reason': 'policy_number', 'policy_id': 1}
+    assert repository.duplicate_index.claim(7, {'policy_number': 'N1'}) is None
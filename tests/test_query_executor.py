@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from query_executor import (BackendUnavailableError, CircuitBreaker, QueryExecutor, QueryTimeoutError,
+                            request_deadline)
+
+
+class Builder:
+    def __init__(self, result=None, release=None):
+        self.result = result
+        self.release = release
+
+    def execute(self):
+        if self.release is not None:
+            self.release.wait(5)
+        return self.result
+
+
+@pytest.fixture
+def executor():
+    executor = QueryExecutor(max_workers=2, breaker=CircuitBreaker(failure_threshold=1, cooldown=0))
+    executor.breaker.record_failure()
+    assert executor.breaker.state == 'half-open'
+    return executor
+
+
+def test_half_open_probe_cut_short_by_the_request_deadline_is_released(executor):
+    release = threading.Event()
+    with request_deadline(0.05):
+        with pytest.raises(QueryTimeoutError):
+            executor.execute(Builder(release=release))
+    release.set()
+    assert executor.breaker.state == 'half-open'
+    assert executor.execute(Builder('ok')) == 'ok'
+    assert executor.breaker.state == 'closed'
+
+
+def test_half_open_probe_started_after_the_deadline_is_released(executor):
+    with request_deadline(0):
+        with pytest.raises(QueryTimeoutError):
+            executor.execute(Builder('never'))
+    assert executor.execute(Builder('ok')) == 'ok'
+
+
+def test_only_one_probe_runs_while_half_open(executor):
+    release = threading.Event()
+    probe = threading.Thread(target=executor.execute, args=(Builder('probe', release),), daemon=True)
+    probe.start()
+    try:
+        while not executor.breaker._probing:
+            pass
+        with pytest.raises(BackendUnavailableError):
+            executor.execute(Builder('second'))
+        # Başka bir iş parçacığının sonuçsuz çıkışı süren denemeyi bırakmaz
+        executor.breaker.release_probe()
+        with pytest.raises(BackendUnavailableError):
+            executor.execute(Builder('third'))
+    finally:
+        release.set()
+        probe.join()
+    assert executor.breaker.state == 'closed'
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from reminder_scheduler import ReminderScheduler, ALL_ASSIGNEES
+
+
+def reminders(count=200, seed=5):
+    rng = random.Random(seed)
+    return [{'id': i, 'reminder_date': f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+             'assigned_to': rng.choice([10, 11, 12, None]), 'completed': rng.random() < 0.3}
+            for i in range(1, count + 1)]
+
+
+def original_due(rows, assigned_to=ALL_ASSIGNEES, limit=10):
+    """get_cross_selling_reminders ordered by reminder_date, keeping the open ones (ties by id)."""
+    rows = [r for r in rows if not r['completed'] and assigned_to in (ALL_ASSIGNEES, r['assigned_to'])]
+    return sorted(rows, key=lambda r: (r['reminder_date'], r['id']))[:limit]
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = ReminderScheduler()
+    scheduler.load(7, reminders())
+    return scheduler
+
+
+@pytest.mark.parametrize('assigned_to', [ALL_ASSIGNEES, 10, 11, None, 99])
+def test_next_due_matches_the_date_ordered_query(scheduler, assigned_to):
+    expected = original_due(reminders(), assigned_to, limit=25)
+    assert scheduler.next_due(7, assigned_to, limit=25) == expected
+    # Okuma kuyruğu tüketmez; tekrar sorgu aynı sonucu verir
+    assert scheduler.next_due(7, assigned_to, limit=25) == expected
+
+
+def test_complete_and_reschedule_drop_stale_entries(scheduler):
+    rows = {r['id']: dict(r) for r in reminders()}
+    first, second = scheduler.next_due(7, limit=2)
+
+    scheduler.complete(first['id'])
+    rows[first['id']]['completed'] = True
+    moved = dict(second, reminder_date='2027-01-01')
+    scheduler.add(7, moved)
+    rows[second['id']] = moved
+
+    due = scheduler.next_due(7, limit=500)
+    assert due == original_due(rows.values(), limit=500)
+    assert [r['id'] for r in due].count(second['id']) == 1
+    assert due[-1]['id'] == second['id']
+
+
+def test_reschedule_back_to_an_earlier_date_is_listed_once(scheduler):
+    first = scheduler.next_due(7, limit=1)[0]
+    scheduler.add(7, dict(first, reminder_date='2027-06-01'))
+    scheduler.add(7, dict(first, reminder_date='2025-01-01'))
+    due = scheduler.next_due(7, limit=500)
+    assert due[0]['id'] == first['id'] and due[0]['reminder_date'] == '2025-01-01'
+    assert [r['id'] for r in due].count(first['id']) == 1
+
+
+def test_reassigned_reminder_moves_between_assignee_queues(scheduler):
+    reminder = scheduler.next_due(7, 10, limit=1)[0]
+    scheduler.add(7, dict(reminder, assigned_to=11))
+    assert reminder['id'] not in [r['id'] for r in scheduler.next_due(7, 10, limit=500)]
+    assert reminder['id'] in [r['id'] for r in scheduler.next_due(7, 11, limit=500)]
+
+
+def test_add_with_completed_flag_completes(scheduler):
+    first = scheduler.next_due(7, limit=1)[0]
+    scheduler.add(7, dict(first, completed=True))
+    assert first['id'] not in [r['id'] for r in scheduler.next_due(7, limit=500)]
+
+
+def test_new_reminders_reach_warm_scopes_only():
+    scheduler = ReminderScheduler()
+    scheduler.load(7, [])
+    scheduler.load(None, [])
+    scheduler.add(7, {'id': 1, 'reminder_date': '2026-03-01', 'assigned_to': 10, 'completed': False})
+    scheduler.add(8, {'id': 2, 'reminder_date': '2026-02-01', 'assigned_to': 10, 'completed': False})
+    assert [r['id'] for r in scheduler.next_due(7)] == [1]
+    assert [r['id'] for r in scheduler.next_due(None)] == [2, 1]
+    assert not scheduler.is_warm(8)
+    assert scheduler.next_due(8) == []
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from query_executor import QueryFailedError, QueryTimeoutError
+from single_flight import SingleFlight
+
+
+def run_with_follower(flight, leader_fn, follower_fn):
+    """Start a leader blocked on ``release``, join a follower to its call, then let the leader finish."""
+    started, release, results = threading.Event(), threading.Event(), {}
+
+    def leader():
+        def fn():
+            started.set()
+            release.wait()
+            return leader_fn()
+        try:
+            results['leader'] = flight.do(('op', 1), fn)
+        except Exception as e:
+            results['leader'] = e
+
+    def follower():
+        try:
+            results['follower'] = flight.do(('op', 1), follower_fn)
+        except Exception as e:
+            results['follower'] = e
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    while flight.stats()['operations']['op']['shared'] == 0:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_follower_shares_the_leaders_result():
+    flight = SingleFlight()
+    results = run_with_follower(flight, lambda: ['rows'], lambda: pytest.fail('follower must not run'))
+    assert results['leader'] is results['follower']
+    assert flight.stats()['operations']['op'] == {'calls': 2, 'executed': 1, 'shared': 1, 'retried': 0}
+
+
+def test_follower_reruns_after_the_leaders_timeout():
+    def timed_out():
+        raise QueryTimeoutError('deadline')
+    flight = SingleFlight()
+    results = run_with_follower(flight, timed_out, lambda: ['own rows'])
+    assert isinstance(results['leader'], QueryTimeoutError)
+    assert results['follower'] == ['own rows']
+    assert flight.stats()['operations']['op']['retried'] == 1
+
+
+def test_follower_gets_the_leaders_other_errors():
+    def failed():
+        raise QueryFailedError('boom')
+    results = run_with_follower(SingleFlight(), failed, lambda: pytest.fail('follower must not run'))
+    assert results['follower'] is results['leader']
@@ -0,0 +1,24 @@
+import os
+
+import static_assets
+
+
+def test_committed_build_matches_the_sources():
+    # Vercel derlemesi static_assets.py'yi çalıştırmaz; kaynak değiştiyse `python static_assets.py` çalıştırıp commit edin
+    assert set(static_assets.load_manifest()) == set(static_assets.ASSETS)
+
+
+def test_build_replaces_older_fingerprints(tmp_path):
+    for source in static_assets.ASSETS:
+        path = tmp_path / source
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('v1')
+    old = static_assets.build(str(tmp_path))
+    (tmp_path / 'css' / 'style.css').write_text('v2')
+    new = static_assets.build(str(tmp_path))
+
+    assert new['css/style.css']['hash'] != old['css/style.css']['hash']
+    assert not os.path.exists(tmp_path / old['css/style.css']['file'])
+    assert os.path.exists(tmp_path / new['css/style.css']['file'])
+    assert os.path.exists(tmp_path / new['js/app.js']['file'])
+    assert static_assets.load_manifest(str(tmp_path)) == {s: e['file'] for s, e in new.items()}